@@ -1,3 +1,3 @@
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("pennylane_support.app:app", host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run("pennylane_support.main:app", host="0.0.0.0", port=8000, reload=True)
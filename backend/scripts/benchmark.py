@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Script to benchmark every API route in-process.
+
+Requests go through an ASGI client straight into the app, so the numbers
+measure the application and database rather than the network. Each
+scenario is run ``--requests`` times, ``--concurrency`` at a time, and
+reports throughput plus p50/p95/p99 latency. Results are saved as JSON;
+pass an earlier result as ``--baseline`` to flag regressions.
+
+The write scenarios modify the database, so run against a generated copy::
+
+    python scripts/generate_data.py --scale 100 --output-dir generated
+    python scripts/load_db.py --database-url sqlite:///bench.db \\
+        --challenges generated/challenges.json --conversations generated/conversations-*.json
+    python scripts/benchmark.py --database-url sqlite:///bench.db --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import httpx
+from sqlalchemy import func, select
+
+# Set up logging
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+from pennylane_support.app import app
+from pennylane_support.database import (
+    create_async_database_engine, create_database_engine, create_session_makers, engine, settings_for,
+)
+from pennylane_support import dependencies
+from pennylane_support.dependencies import SessionRouter, get_user
+from pennylane_support.migrations import migrate
+from pennylane_support.models.challenge import Challenge, ChallengeTag
+from pennylane_support.models.conversation import Conversation, Post
+from pennylane_support.models.user import User, UserRole
+
+BENCH_USER = User(user_id=0, username="bench_agent", email="bench_agent@example.com", role=UserRole.SUPPORT)
+
+# Routes that are not request/response and so cannot be timed per request
+SKIPPED_ROUTES = {
+    ("GET", "/conversations/{conversation_id}/events"): "long-lived event stream",
+    ("GET", "/conversations/inbox/events"): "long-lived event stream",
+}
+
+
+@dataclass
+class Context:
+    """Existing rows the scenarios pick their targets from."""
+    rng: random.Random
+    conversation_ids: List[int]
+    challenge_ids: List[str]
+    challenge_pks: List[int]
+    posts: List[tuple]
+    words: List[str]
+    tags: List[str]
+
+    def conversation_id(self) -> int:
+        return self.rng.choice(self.conversation_ids)
+
+    def challenge_id(self) -> str:
+        return self.rng.choice(self.challenge_ids)
+
+    def tag_filter(self) -> List[str]:
+        return self.rng.sample(self.tags, min(2, len(self.tags)))
+
+    def new_conversation(self) -> Dict[str, Any]:
+        return {"challenge_id": self.rng.choice(self.challenge_pks), "topic": "Benchmark", "category": "Benchmark"}
+
+
+Request = Callable[[httpx.AsyncClient, Context, Any], Awaitable[httpx.Response]]
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    route: str
+    request: Request
+    expect: int = 200
+    # Untimed setup whose result is passed to ``request``, and untimed cleanup
+    prepare: Optional[Callable[[httpx.AsyncClient, Context], Awaitable[Any]]] = None
+    cleanup: Optional[Callable[[httpx.AsyncClient, Context, httpx.Response], Awaitable[None]]] = None
+    # Fraction of ``--requests`` to run, for expensive routes
+    weight: float = 1.0
+
+
+async def new_conversation(client: httpx.AsyncClient, ctx: Context) -> int:
+    response = await client.post("/conversations/", json=ctx.new_conversation())
+    return response.json()["id"]
+
+
+def challenge_body(challenge_id: str, points: int = 10) -> Dict[str, Any]:
+    return {
+        "challenge_id": challenge_id, "title": "Benchmark", "description": "Benchmark challenge",
+        "category": "Benchmark", "difficulty": "Beginner", "points": points,
+    }
+
+
+async def new_challenge(client: httpx.AsyncClient, ctx: Context) -> str:
+    challenge_id = f"BENCH_{ctx.rng.getrandbits(48):012x}"
+    await client.post("/challenges/", json=challenge_body(challenge_id))
+    return challenge_id
+
+
+async def new_post(client: httpx.AsyncClient, ctx: Context) -> tuple:
+    conversation_id = ctx.conversation_id()
+    response = await client.post(f"/conversations/{conversation_id}/posts", json={"content": "Benchmark reply"})
+    return conversation_id, response.json()["id"]
+
+
+async def claimed(client: httpx.AsyncClient, ctx: Context) -> Optional[int]:
+    response = await client.post("/queue/claim")
+    return response.json()["id"] if response.status_code == 200 else None
+
+
+async def release(client: httpx.AsyncClient, ctx: Context, response: httpx.Response) -> None:
+    if response.status_code == 200:
+        await client.post(f"/queue/{response.json()['id']}/release")
+
+
+def scenarios() -> List[Scenario]:
+    return [
+        Scenario("health", "GET", "/api/health", lambda c, x, _: c.get("/api/health")),
+        Scenario("metrics", "GET", "/metrics", lambda c, x, _: c.get("/metrics")),
+        Scenario("user", "GET", "/user/", lambda c, x, _: c.get("/user/")),
+        Scenario("list_challenges", "GET", "/challenges/", lambda c, x, _: c.get("/challenges/")),
+        Scenario("list_challenges_by_tag", "GET", "/challenges/",
+                 lambda c, x, _: c.get("/challenges/", params={"tags": x.tag_filter()})),
+        Scenario("challenge_tags", "GET", "/challenges/tags",
+                 lambda c, x, _: c.get("/challenges/tags", params={"tags": x.tag_filter()})),
+        Scenario("read_challenge", "GET", "/challenges/{challenge_id}",
+                 lambda c, x, _: c.get(f"/challenges/{x.challenge_id()}")),
+        Scenario("create_challenge", "POST", "/challenges/",
+                 lambda c, x, _: c.post("/challenges/", json=challenge_body(f"BENCH_{x.rng.getrandbits(48):012x}")),
+                 expect=201, weight=0.25),
+        Scenario("update_challenge", "PATCH", "/challenges/{challenge_id}",
+                 lambda c, x, challenge_id: c.patch(f"/challenges/{challenge_id}", json=challenge_body(challenge_id, 20)),
+                 prepare=new_challenge, weight=0.25),
+        Scenario("delete_challenge", "DELETE", "/challenges/{challenge_id}",
+                 lambda c, x, challenge_id: c.delete(f"/challenges/{challenge_id}"),
+                 expect=204, prepare=new_challenge, weight=0.25),
+        Scenario("challenge_conversations", "GET", "/challenges/{challenge_id}/conversations",
+                 lambda c, x, _: c.get(f"/challenges/{x.challenge_id()}/conversations")),
+        Scenario("list_conversations", "GET", "/conversations/", lambda c, x, _: c.get("/conversations/")),
+        Scenario("list_conversations_filtered", "GET", "/conversations/",
+                 lambda c, x, _: c.get("/conversations/", params={"status": "OPEN", "limit": 100})),
+        Scenario("list_conversations_deep", "GET", "/conversations/",
+                 lambda c, x, _: c.get("/conversations/", params={"offset": 5000, "include_total": False})),
+        Scenario("inbox", "GET", "/inbox",
+                 lambda c, x, _: c.get("/inbox", params={
+                     "status": ["OPEN", "IN_PROGRESS"], "assignee": ["unassigned", BENCH_USER.username],
+                 })),
+        Scenario("list_user_conversations", "GET", "/conversations/user",
+                 lambda c, x, _: c.get("/conversations/user")),
+        Scenario("create_conversation", "POST", "/conversations/",
+                 lambda c, x, _: c.post("/conversations/", json=x.new_conversation()), expect=201),
+        Scenario("read_conversation", "GET", "/conversations/{conversation_id}",
+                 lambda c, x, _: c.get(f"/conversations/{x.conversation_id()}")),
+        Scenario("update_conversation", "PATCH", "/conversations/{conversation_id}",
+                 lambda c, x, _: c.patch(f"/conversations/{x.conversation_id()}",
+                                         json={"priority": x.rng.randint(0, 3)})),
+        Scenario("delete_conversation", "DELETE", "/conversations/{conversation_id}",
+                 lambda c, x, conversation_id: c.delete(f"/conversations/{conversation_id}"),
+                 expect=204, prepare=new_conversation, weight=0.25),
+        Scenario("create_post", "POST", "/conversations/{conversation_id}/posts",
+                 lambda c, x, _: c.post(f"/conversations/{x.conversation_id()}/posts",
+                                        json={"content": "Benchmark reply"}), expect=201),
+        Scenario("list_posts", "GET", "/conversations/{conversation_id}/posts",
+                 lambda c, x, _: c.get(f"/conversations/{x.conversation_id()}/posts")),
+        Scenario("read_post", "GET", "/conversations/{conversation_id}/posts/{post_id}",
+                 lambda c, x, _: c.get("/conversations/{}/posts/{}".format(*x.rng.choice(x.posts)))),
+        Scenario("delete_post", "DELETE", "/conversations/{conversation_id}/posts/{post_id}",
+                 lambda c, x, post: c.delete("/conversations/{}/posts/{}".format(*post)),
+                 expect=204, prepare=new_post, weight=0.25),
+        Scenario("batch_update", "PATCH", "/conversations/batch",
+                 lambda c, x, _: c.patch("/conversations/batch", json={
+                     "ids": x.rng.sample(x.conversation_ids, min(50, len(x.conversation_ids))),
+                     "changes": {"priority": x.rng.randint(0, 3)},
+                 }), weight=0.25),
+        Scenario("batch_posts", "POST", "/conversations/batch/posts",
+                 lambda c, x, _: c.post("/conversations/batch/posts", json={"posts": [
+                     {"conversation_id": x.conversation_id(), "content": "Benchmark reply"} for _ in range(50)
+                 ]}), weight=0.25),
+        Scenario("export", "GET", "/export/conversations",
+                 lambda c, x, _: c.get("/export/conversations", params={"challenge_id": x.challenge_id()}),
+                 weight=0.1),
+        Scenario("queue_claim", "POST", "/queue/claim", lambda c, x, _: c.post("/queue/claim"),
+                 cleanup=release),
+        Scenario("queue_renew", "POST", "/queue/{conversation_id}/renew",
+                 lambda c, x, conversation_id: c.post(f"/queue/{conversation_id}/renew"),
+                 prepare=claimed, cleanup=release),
+        Scenario("queue_release", "POST", "/queue/{conversation_id}/release",
+                 lambda c, x, conversation_id: c.post(f"/queue/{conversation_id}/release"),
+                 expect=204, prepare=claimed),
+        Scenario("search", "GET", "/search/",
+                 lambda c, x, _: c.get("/search/", params={"q": x.rng.choice(x.words)})),
+    ]
+
+
+def percentile(quantiles: List[float], p: int) -> float:
+    return quantiles[p - 1] if quantiles else 0.0
+
+
+async def run_scenario(client: httpx.AsyncClient, ctx: Context, scenario: Scenario, requests: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            prepared = await scenario.prepare(client, ctx) if scenario.prepare else None
+            started = time.perf_counter()
+            response = await scenario.request(client, ctx, prepared)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != scenario.expect:
+                errors += 1
+            if scenario.cleanup:
+                await scenario.cleanup(client, ctx, response)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "method": scenario.method,
+        "route": scenario.route,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(quantiles, 50) * 1000,
+        "p95_ms": percentile(quantiles, 95) * 1000,
+        "p99_ms": percentile(quantiles, 99) * 1000,
+    }
+
+
+def uncovered_routes(selected: List[Scenario]) -> List[str]:
+    """Routes of the app that no scenario (or skip entry) covers."""
+    covered = {(scenario.method, scenario.route) for scenario in selected} | set(SKIPPED_ROUTES)
+    return [
+        f"{method.upper()} {path}"
+        for path, operations in app.openapi()["paths"].items()
+        for method in operations
+        if (method.upper(), path) not in covered
+    ]
+
+
+def load_context(database_url: str, seed: int) -> tuple:
+    db = create_database_engine(settings_for(database_url))
+    migrate(db)
+    with db.connect() as connection:
+        sample = lambda query: list(connection.execute(query.order_by(func.random()).limit(1000)))
+        conversation_ids = [row[0] for row in sample(select(Conversation.id))]
+        challenges = sample(select(Challenge.challenge_id, Challenge.id))
+        posts = [tuple(row) for row in sample(select(Post.conversation_id, Post.id))]
+        topics = [row[0] for row in sample(select(Conversation.topic))]
+        tags = list(connection.scalars(select(ChallengeTag.tag).distinct()))
+        counts = {
+            "challenges": connection.scalar(select(func.count()).select_from(Challenge)),
+            "conversations": connection.scalar(select(func.count()).select_from(Conversation)),
+            "posts": connection.scalar(select(func.count()).select_from(Post)),
+        }
+    db.dispose()
+
+    if not conversation_ids or not posts:
+        raise SystemExit("The database has no conversations; load a dataset first")
+    words = [word for topic in topics for word in topic.split() if len(word) > 3]
+    return Context(
+        random.Random(seed), conversation_ids, [row[0] for row in challenges], [row[1] for row in challenges], posts, words, tags,
+    ), counts
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    ctx, counts = load_context(args.database_url, args.seed)
+    selected = [s for s in scenarios() if not args.only or s.name in args.only]
+
+    # A full run must cover every route; a targeted one only reports the gaps
+    missing = uncovered_routes(scenarios())
+    if missing and not args.only:
+        raise SystemExit(f"Routes without a benchmark scenario: {', '.join(missing)}")
+    if missing:
+        logger.warning(f"Routes without a benchmark scenario: {', '.join(missing)}")
+
+    pool = dict(pool_size=args.concurrency, max_overflow=args.concurrency)
+    bench_settings = settings_for(args.database_url, **pool)
+    async_engine = create_async_database_engine(bench_settings)
+    read_session_maker, write_session_maker = create_session_makers(async_engine)
+    replica_engine = create_async_database_engine(settings_for(args.replica_url, **pool)) if args.replica_url else None
+    dependencies.sessions = SessionRouter(
+        read_session_maker,
+        write_session_maker,
+        create_session_makers(replica_engine)[0] if replica_engine else None,
+        asyncio.Lock() if bench_settings.is_sqlite else None,
+    )
+    app.dependency_overrides[get_user] = lambda: BENCH_USER
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for scenario in selected:
+                requests = max(1, int(args.requests * scenario.weight))
+                # Warm up caches and connections before timing
+                await run_scenario(client, ctx, scenario, min(args.warmup, requests), 1)
+                results[scenario.name] = await run_scenario(client, ctx, scenario, requests, args.concurrency)
+                result = results[scenario.name]
+                logger.info(
+                    f"{scenario.name:30} {result['throughput']:8.1f} req/s  p50 {result['p50_ms']:7.1f}ms  "
+                    f"p95 {result['p95_ms']:7.1f}ms  p99 {result['p99_ms']:7.1f}ms  errors {result['errors']}"
+                )
+    finally:
+        app.dependency_overrides.clear()
+        await async_engine.dispose()
+        if replica_engine is not None:
+            await replica_engine.dispose()
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "database": counts,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "skipped": {f"{method} {route}": reason for (method, route), reason in SKIPPED_ROUTES.items()},
+        },
+        "results": results,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """Scenarios whose p95 latency or throughput got worse by more than ``threshold``."""
+    regressions = []
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if not before:
+            continue
+        if before["p95_ms"] and result["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {before['p95_ms']:.1f}ms -> {result['p95_ms']:.1f}ms")
+        if result["throughput"] < before["throughput"] * (1 - threshold):
+            regressions.append(f"{name}: {before['throughput']:.1f} -> {result['throughput']:.1f} req/s")
+    return regressions
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark every API route in-process.")
+    parser.add_argument("--database-url", default=engine.url.render_as_string(hide_password=False), help="database to benchmark against")
+    parser.add_argument("--replica-url", default=None, help="read replica of the database, for GET requests")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent requests")
+    parser.add_argument("--warmup", type=int, default=5, help="untimed requests before each scenario")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for picking targets")
+    parser.add_argument("--only", nargs="*", default=None, help="scenario names to run")
+    parser.add_argument("--output", type=Path, default=Path("bench-results.json"), help="file to write results to")
+    parser.add_argument("--baseline", type=Path, default=None, help="earlier results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative change reported as a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Main function to run the benchmark."""
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+    args.output.write_text(json.dumps(results, indent=2) + "\n")
+    logger.info(f"Results written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(json.loads(args.baseline.read_text()), results, args.threshold)
+        for regression in regressions:
+            logger.warning(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Script to compare the fast and validated serialization of list responses.
+
+Each list endpoint is requested for 100-item and for 1-item pages, one
+request at a time, with ``SERIALIZATION_MODE`` validate and then fast. The
+per-row cost is the difference in mean latency between the two page sizes
+divided by the difference in rows, which removes the fixed cost of a
+request. The requests go through an ASGI client straight into the app, as
+in ``benchmark.py``; the database work is the same in both modes apart
+from loading rows instead of ORM objects.
+
+Usage::
+
+    python scripts/benchmark_serialization.py --database-url sqlite:///bench.db --output serialization.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import httpx
+from sqlalchemy import func, select
+
+# Set up logging
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+from pennylane_support import dependencies, serialization
+from pennylane_support.app import app
+from pennylane_support.database import create_async_database_engine, create_database_engine, create_session_makers, engine, settings_for
+from pennylane_support.dependencies import SessionRouter, get_user
+from pennylane_support.migrations import migrate
+from pennylane_support.models.conversation import Post
+from pennylane_support.models.user import User, UserRole
+
+BENCH_USER = User(user_id=0, username="bench_agent", email="bench_agent@example.com", role=UserRole.SUPPORT)
+PAGE_SIZES = (1, 100)
+MODES = {"validate": False, "fast": True}
+
+
+def page_urls(database_url: str) -> Dict[str, str]:
+    """URL templates of the list endpoints, taking the page size as ``{limit}``."""
+    db = create_database_engine(settings_for(database_url))
+    migrate(db)
+    with db.connect() as connection:
+        busiest = connection.scalar(
+            select(Post.conversation_id).group_by(Post.conversation_id).order_by(func.count().desc()).limit(1)
+        )
+    db.dispose()
+
+    if busiest is None:
+        raise SystemExit("The database has no posts; load a dataset first")
+    return {
+        "list_challenges": "/challenges/?limit={limit}&include_total=false",
+        "list_conversations": "/conversations/?limit={limit}&include_total=false",
+        "list_posts": f"/conversations/{busiest}/posts?limit={{limit}}&include_total=false",
+    }
+
+
+async def time_page(client: httpx.AsyncClient, url: str, requests: int, warmup: int) -> Dict[str, Any]:
+    for _ in range(warmup):
+        (await client.get(url)).raise_for_status()
+
+    latencies: List[float] = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = await client.get(url)
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+
+    return {"rows": len(response.json()["items"]), "mean_ms": statistics.fmean(latencies) * 1000}
+
+
+async def time_mode(client: httpx.AsyncClient, url: str, requests: int, warmup: int) -> Dict[str, Any]:
+    small, large = [
+        await time_page(client, url.format(limit=limit), requests, warmup) for limit in PAGE_SIZES
+    ]
+    rows = large["rows"] - small["rows"]
+    return {
+        "rows": large["rows"],
+        "mean_ms": large["mean_ms"],
+        "per_row_us": (large["mean_ms"] - small["mean_ms"]) / rows * 1000 if rows else 0.0,
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    urls = page_urls(args.database_url)
+    async_engine = create_async_database_engine(settings_for(args.database_url))
+    read_session_maker, write_session_maker = create_session_makers(async_engine)
+    dependencies.sessions = SessionRouter(read_session_maker, write_session_maker)
+    app.dependency_overrides[get_user] = lambda: BENCH_USER
+
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        # Uncompressed, so that only serialization differs
+        headers = {"Accept-Encoding": "identity"}
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+            for name, url in urls.items():
+                results[name] = {"url": url}
+                for mode, fast in MODES.items():
+                    serialization.FAST = fast
+                    results[name][mode] = await time_mode(client, url, args.requests, args.warmup)
+    finally:
+        app.dependency_overrides.clear()
+        await async_engine.dispose()
+
+    for name, result in results.items():
+        before, after = result["validate"], result["fast"]
+        logger.info(
+            f"{name:20} {after['rows']:3} rows  "
+            f"validate {before['per_row_us']:6.1f}us/row {before['mean_ms']:6.2f}ms/page  "
+            f"fast {after['per_row_us']:6.1f}us/row {after['mean_ms']:6.2f}ms/page"
+        )
+    return results
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare fast and validated serialization of list pages.")
+    parser.add_argument("--database-url", default=engine.url.render_as_string(hide_password=False), help="database to benchmark against")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per endpoint and mode")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed requests before each measurement")
+    parser.add_argument("--output", type=Path, default=None, help="file to write results to")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Main function to run the serialization benchmark."""
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+        logger.info(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
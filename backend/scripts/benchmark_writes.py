@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Script to compare group commit with a commit per request for post writes.
+
+``--requests`` posts are created with ``--concurrency`` requests in
+flight, first with every write committing on its own
+(``WRITE_COALESCING=false``) and then with the write coalescer, and the
+writes per second, latency and commits of both runs are reported. The
+requests go through an ASGI client straight into the app, as in
+``benchmark.py``. The posts are added to the database benchmarked against.
+
+Usage::
+
+    python scripts/benchmark_writes.py --database-url sqlite:///bench.db --concurrency 32 --output writes.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import httpx
+from sqlalchemy import func, select
+
+# Set up logging
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+from pennylane_support import dependencies
+from pennylane_support.app import app
+from pennylane_support.coalescer import WRITE_COALESCE_DELAY_MS, WRITE_COALESCE_MAX_BATCH
+from pennylane_support.database import create_async_database_engine, create_database_engine, create_session_makers, engine, settings_for
+from pennylane_support.dependencies import SessionRouter, get_user
+from pennylane_support.migrations import migrate
+from pennylane_support.models.conversation import Conversation
+from pennylane_support.models.user import User, UserRole
+
+BENCH_USER = User(user_id=0, username="bench_agent", email="bench_agent@example.com", role=UserRole.SUPPORT)
+MODES = {"per_request": False, "coalesced": True}
+
+
+def conversation_ids(database_url: str) -> List[int]:
+    db = create_database_engine(settings_for(database_url))
+    migrate(db)
+    with db.connect() as connection:
+        ids = list(connection.scalars(select(Conversation.id).order_by(func.random()).limit(1000)))
+    db.dispose()
+
+    if not ids:
+        raise SystemExit("The database has no conversations; load a dataset first")
+    return ids
+
+
+async def time_writes(client: httpx.AsyncClient, ids: List[int], rng: random.Random, requests: int, concurrency: int) -> Dict[str, Any]:
+    coalescer = dependencies.sessions.coalescer
+    batches = coalescer.batches
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in remaining:
+            started = time.perf_counter()
+            response = await client.post(f"/conversations/{rng.choice(ids)}/posts", json={"content": f"Benchmark write {i}"})
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 201:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    commits = coalescer.batches - batches
+    return {
+        "writes": len(latencies),
+        "errors": errors,
+        "commits": commits,
+        "writes_per_commit": len(latencies) / commits if commits else 0.0,
+        "writes_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": quantiles[49] * 1000 if quantiles else 0.0,
+        "p99_ms": quantiles[98] * 1000 if quantiles else 0.0,
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    ids = conversation_ids(args.database_url)
+    pool = dict(pool_size=args.concurrency, max_overflow=args.concurrency)
+    bench_settings = settings_for(args.database_url, **pool)
+    async_engine = create_async_database_engine(bench_settings)
+    read_session_maker, write_session_maker = create_session_makers(async_engine)
+    dependencies.sessions = SessionRouter(
+        read_session_maker, write_session_maker, lock=asyncio.Lock() if bench_settings.is_sqlite else None,
+    )
+    coalescer = dependencies.sessions.coalescer
+    coalescer.max_delay_ms = args.delay_ms
+    coalescer.max_batch = args.max_batch
+    app.dependency_overrides[get_user] = lambda: BENCH_USER
+
+    rng = random.Random(args.seed)
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for mode, enabled in MODES.items():
+                coalescer.enabled = enabled
+                # Warm up connections before timing
+                await time_writes(client, ids, rng, args.warmup, 1)
+                results[mode] = await time_writes(client, ids, rng, args.requests, args.concurrency)
+                result = results[mode]
+                logger.info(
+                    f"{mode:12} {result['writes_per_second']:8.1f} writes/s  {result['writes_per_commit']:5.1f} writes/commit  "
+                    f"p50 {result['p50_ms']:7.1f}ms  p99 {result['p99_ms']:7.1f}ms  errors {result['errors']}"
+                )
+    finally:
+        app.dependency_overrides.clear()
+        await async_engine.dispose()
+
+    before, after = results["per_request"], results["coalesced"]
+    if before["writes_per_second"]:
+        logger.info(f"Group commit: {after['writes_per_second'] / before['writes_per_second']:.2f}x writes/s")
+    return {
+        "meta": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "delay_ms": args.delay_ms,
+            "max_batch": args.max_batch,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare group commit with a commit per request for post writes.")
+    parser.add_argument("--database-url", default=engine.url.render_as_string(hide_password=False), help="database to benchmark against")
+    parser.add_argument("--requests", type=int, default=1000, help="timed writes per mode")
+    parser.add_argument("--concurrency", type=int, default=32, help="writes in flight")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed writes before each measurement")
+    parser.add_argument("--delay-ms", type=float, default=WRITE_COALESCE_DELAY_MS, help="how long a batch waits for more writes")
+    parser.add_argument("--max-batch", type=int, default=WRITE_COALESCE_MAX_BATCH, help="most writes committed together")
+    parser.add_argument("--seed", type=int, default=0, help="seed for choosing conversations")
+    parser.add_argument("--output", type=Path, default=None, help="file to write results to")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Main function to run the write benchmark."""
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+        logger.info(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
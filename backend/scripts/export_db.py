@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Script to export support conversations with their posts as NDJSON or CSV.
+
+Rows are read with a server-side cursor and written as they arrive, so
+memory use stays constant however large the export is.
+
+Usage::
+
+    python scripts/export_db.py --format csv --output conversations.csv
+    python scripts/export_db.py --status RESOLVED --created-after 2024-01-01 > resolved.ndjson
+"""
+import argparse
+import logging
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+from pennylane_support.database import create_database_engine, engine, settings_for
+from pennylane_support.export import FORMATS, export_conditions, select_export
+from pennylane_support.models.conversation import ConversationStatus
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Export support conversations with their posts.")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="ndjson", help="output format")
+    parser.add_argument("--output", type=Path, default=None, help="output file (default: stdout)")
+    parser.add_argument("--status", type=ConversationStatus, default=None, help="only conversations with this status")
+    parser.add_argument("--challenge-id", default=None, help="only conversations about this challenge")
+    parser.add_argument("--created-after", type=datetime.fromisoformat, default=None, help="inclusive lower bound on created_at")
+    parser.add_argument("--created-before", type=datetime.fromisoformat, default=None, help="exclusive upper bound on created_at")
+    parser.add_argument("--database-url", default=engine.url.render_as_string(hide_password=False), help="database to export from")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Main function to export conversations."""
+    args = parse_args(argv)
+    started = time.perf_counter()
+
+    writer = FORMATS[args.format]()
+    query = select_export(export_conditions(args.status, args.challenge_id, args.created_after, args.created_before))
+    output = open(args.output, "w", newline="") if args.output else sys.stdout
+
+    db = create_database_engine(settings_for(args.database_url))
+    rows = 0
+    try:
+        with db.connect() as connection:
+            output.write(writer.header())
+            for partition in connection.execute(query).partitions():
+                rows += len(partition)
+                output.write(writer.write(partition))
+            output.write(writer.finish())
+    finally:
+        db.dispose()
+        if args.output:
+            output.close()
+
+    logger.info(f"Exported {rows} rows in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
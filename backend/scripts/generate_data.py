@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Script to generate a synthetic dataset for load testing and benchmarks.
+
+The output has the same shape as ``data/pennylane_coding_challenges.json``
+and ``data/pennylane_support_conversations.json``, so it loads with
+``load_db.py``. Text, topics and categories are drawn from those files.
+Output is written incrementally and is fully determined by ``--seed``.
+
+``--scale 1`` produces 1,000 conversations with about 10 posts each
+(10k posts). Scale linearly from there: ``--scale 100`` is about 1M posts
+and ``--scale 2000`` about 20M.
+
+Usage::
+
+    python scripts/generate_data.py --scale 100 --files 4 --output-dir generated
+    python scripts/load_db.py --challenges generated/challenges.json \\
+        --conversations generated/conversations-*.json --workers 4
+"""
+import argparse
+import json
+import logging
+import random
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Get the directory where this script is located
+SCRIPT_DIR = Path(__file__).parent
+DATA_DIR = SCRIPT_DIR / 'data'
+
+CHALLENGES_FILE = DATA_DIR / 'pennylane_coding_challenges.json'
+CONVERSATIONS_FILE = DATA_DIR / 'pennylane_support_conversations.json'
+
+CONVERSATIONS_PER_SCALE = 1000
+MEAN_POSTS = 10
+MAX_POSTS = 500
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+SPAN = timedelta(days=365)
+
+STATUS_WEIGHTS = {
+    "OPEN": 30,
+    "IN_PROGRESS": 20,
+    "WAITING_FOR_USER": 10,
+    "RESOLVED": 30,
+    "CLOSED": 10,
+}
+
+
+class Corpus:
+    """Vocabulary sampled by the generator, taken from the bundled data files."""
+
+    def __init__(self, challenges_file: Path, conversations_file: Path):
+        self.challenges: List[Dict[str, Any]] = json.loads(challenges_file.read_text())['coding_challenges']
+        conversations = json.loads(conversations_file.read_text())['support_conversations']
+
+        self.topics = [conversation['topic'] for conversation in conversations]
+        self.categories = [conversation['category'] for conversation in conversations]
+        self.sentences = [
+            sentence
+            for conversation in conversations
+            for post in conversation['posts']
+            for sentence in re.split(r'(?<=[.?!])\s+', post['content'])
+            if sentence
+        ]
+        self.words = sorted({word for topic in self.topics for word in topic.split() if len(word) > 3})
+
+
+class Generator:
+    def __init__(self, corpus: Corpus, scale: float, seed: int):
+        self.corpus = corpus
+        self.rng = random.Random(seed)
+        self.conversations = max(1, round(CONVERSATIONS_PER_SCALE * scale))
+        self.users = [f"user_{i:06d}" for i in range(max(50, self.conversations // 5))]
+        self.agents = [f"support_{i:03d}" for i in range(max(5, int(scale ** 0.5) * 5))]
+        extra_challenges = int(20 * scale ** 0.5)
+        self.challenge_ids = [c['challenge_id'] for c in corpus.challenges]
+        self.challenge_ids += [f"CHAL_G{i:05d}" for i in range(extra_challenges)]
+
+    def content(self, sentences: int) -> str:
+        return " ".join(self.rng.choice(self.corpus.sentences) for _ in range(sentences))
+
+    def user(self) -> str:
+        # A few users ask most of the questions
+        return self.users[min(int(self.rng.paretovariate(1.2)) - 1, len(self.users) - 1)]
+
+    def challenges(self) -> Iterator[Dict[str, Any]]:
+        yield from self.corpus.challenges
+        for challenge_id in self.challenge_ids[len(self.corpus.challenges):]:
+            template = self.rng.choice(self.corpus.challenges)
+            yield {
+                **template,
+                "challenge_id": challenge_id,
+                "title": " ".join(self.rng.sample(self.corpus.words, 3)).title(),
+                "description": self.content(2),
+                "points": self.rng.choice([50, 100, 150, 200, 300, 500]),
+                "tags": self.rng.sample(self.corpus.words, 3),
+            }
+
+    def conversation(self, number: int) -> Dict[str, Any]:
+        rng = self.rng
+        asker = self.user()
+        status = rng.choices(list(STATUS_WEIGHTS), weights=list(STATUS_WEIGHTS.values()))[0]
+        agent = rng.choice(self.agents)
+        timestamp = START + SPAN * rng.random()
+
+        posts = []
+        count = min(1 + int(rng.expovariate(1 / (MEAN_POSTS - 1))), MAX_POSTS)
+        for post_id in range(1, count + 1):
+            if post_id == 1:
+                user = asker
+            else:
+                user = rng.choices([asker, agent, self.user()], weights=[4, 4, 2])[0]
+                timestamp += timedelta(minutes=rng.expovariate(1 / 180))
+            posts.append({
+                "post_id": post_id,
+                "user": user,
+                "timestamp": timestamp.isoformat().replace("+00:00", "Z"),
+                "content": self.content(rng.randint(1, 4)),
+            })
+
+        return {
+            "identifier": f"CONV_G{number:08d}",
+            "topic": rng.choice(self.corpus.topics),
+            "category": rng.choice(self.corpus.categories),
+            "status": status,
+            "assignee": None if status == "OPEN" else agent,
+            "priority": rng.choices([0, 1, 2, 3], weights=[85, 10, 4, 1])[0],
+            "posts": posts,
+            "challenge_id": rng.choice(self.challenge_ids),
+        }
+
+
+def write_json_array(path: Path, key: str, items: Iterator[Dict[str, Any]]) -> int:
+    """Write ``{key: [...]}`` one item at a time."""
+    count = 0
+    with path.open("w") as output:
+        output.write(f'{{"{key}": [\n')
+        for item in items:
+            if count:
+                output.write(",\n")
+            output.write(json.dumps(item))
+            count += 1
+        output.write("\n]}\n")
+    return count
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate a synthetic challenges and conversations dataset.")
+    parser.add_argument("--scale", type=float, default=1.0, help=f"{CONVERSATIONS_PER_SCALE} conversations (~{CONVERSATIONS_PER_SCALE * MEAN_POSTS} posts) per unit")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--files", type=int, default=1, help="number of conversation files, for parallel loading")
+    parser.add_argument("--output-dir", type=Path, default=Path("generated"), help="directory to write to")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Main function to generate the dataset."""
+    args = parse_args(argv)
+    started = time.perf_counter()
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+
+    generator = Generator(Corpus(CHALLENGES_FILE, CONVERSATIONS_FILE), args.scale, args.seed)
+    challenges = write_json_array(args.output_dir / "challenges.json", "coding_challenges", generator.challenges())
+    logger.info(f"Wrote {challenges} challenges")
+
+    posts = 0
+    per_file = -(-generator.conversations // args.files)
+    for index in range(args.files):
+        numbers = range(index * per_file, min((index + 1) * per_file, generator.conversations))
+
+        def conversations():
+            nonlocal posts
+            for number in numbers:
+                conversation = generator.conversation(number)
+                posts += len(conversation["posts"])
+                yield conversation
+
+        path = args.output_dir / f"conversations-{index:02d}.json"
+        written = write_json_array(path, "support_conversations", conversations())
+        logger.info(f"Wrote {written} conversations to {path}")
+
+    logger.info(f"Generated {generator.conversations} conversations and {posts} posts in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -4,27 +4,49 @@ Script to load initial data into the database from JSON files.
 
 This script loads challenges and conversations data from JSON files into the database.
 Challenges are loaded first since conversations reference them.
+
+Input files are parsed incrementally, so memory use does not grow with the
+file size, and rows are written in large batches: one existence lookup,
+one multi-row insert and one transaction per batch. Loading is idempotent;
+rows that already exist (by ``challenge_id`` / ``identifier``) are updated
+in place and conversations that already exist keep their posts. Several
+files of the same kind can be loaded in parallel with ``--workers``.
+
+Usage::
+
+    python scripts/load_db.py
+    python scripts/load_db.py --conversations export1.json export2.json --workers 2
 """
+import argparse
 import json
 import logging
+import re
 import sys
-from datetime import datetime
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Any
+from typing import Any, Dict, Iterable, Iterator, List
 
 # Add the project root to the Python path
 project_root = Path(__file__).parent.parent.parent.parent
 sys.path.insert(0, str(project_root))
 
-from sqlmodel import Session, select
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Import models and database engine
-from pennylane_support.database import engine
-from pennylane_support.models.challenge import Challenge
+from pennylane_support.database import create_database_engine, engine, settings_for
+from pennylane_support.migrations import migrate
+from pennylane_support.tags import tag_rows
+from pennylane_support.models.challenge import Challenge, ChallengeCreate, ChallengeTag
 from pennylane_support.models.conversation import Conversation, ConversationBase, Post
 
 # Get the directory where this script is located
@@ -35,106 +57,323 @@ DATA_DIR = SCRIPT_DIR / 'data'
 CHALLENGES_FILE = DATA_DIR / 'pennylane_coding_challenges.json'
 CONVERSATIONS_FILE = DATA_DIR / 'pennylane_support_conversations.json'
 
-def load_json_file(file_path: Path):
-    """Load and parse a JSON file."""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        logger.error(f"File not found: {file_path}")
-        sys.exit(1)
-    except json.JSONDecodeError as e:
-        logger.error(f"Error parsing JSON file {file_path}: {e}")
-        sys.exit(1)
-
-def create_conversation(conv_data: Dict[str, Any], challenge_map: Dict[str, int]) -> Conversation:
-    """Create a Conversation instance from raw data."""
-    
+CHALLENGES_KEY = 'coding_challenges'
+CONVERSATIONS_KEY = 'support_conversations'
+
+BATCH_SIZE = 2000
+READ_SIZE = 1 << 16
+
+challenge_table = Challenge.__table__
+challenge_tag_table = ChallengeTag.__table__
+conversation_table = Conversation.__table__
+post_table = Post.__table__
+
+
+@dataclass
+class LoadStats:
+    """Progress of loading one file."""
+    file: str
+    read: int = 0
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    posts: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.read / self.seconds if self.seconds else 0.0
+
+    def report(self) -> str:
+        return (
+            f"{self.file}: {self.read} read, {self.inserted} inserted, {self.updated} updated, "
+            f"{self.skipped} skipped, {self.posts} posts in {self.seconds:.1f}s ({self.rate:.0f} rows/s)"
+        )
+
+
+def iter_json_array(file_path: Path, key: str) -> Iterator[Dict[str, Any]]:
+    """Yield the items of the top-level array ``key`` without reading the whole file."""
+    decoder = json.JSONDecoder()
+    marker = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        buffer = f.read(READ_SIZE)
+        while (match := marker.search(buffer)) is None:
+            chunk = f.read(READ_SIZE)
+            if not chunk:
+                raise ValueError(f"No '{key}' array in {file_path}")
+            buffer += chunk
+        position = match.end()
+
+        while True:
+            # Skip separators, reading more when the buffer runs out
+            while True:
+                while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                    position += 1
+                if position < len(buffer):
+                    break
+                buffer, position = f.read(READ_SIZE), 0
+                if not buffer:
+                    raise ValueError(f"Unterminated '{key}' array in {file_path}")
+
+            if buffer[position] == ']':
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                chunk = f.read(READ_SIZE)
+                if not chunk:
+                    raise
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+
+            yield item
+            position = end
+            if position > READ_SIZE:
+                buffer, position = buffer[position:], 0
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def insert_new(connection: Connection, table, rows: List[Dict[str, Any]], key: str) -> Dict[str, int]:
+    """Insert ``rows`` in one multi-row statement, ignoring keys that already exist.
+
+    Returns ``{key: id}`` for the rows that were actually inserted, so a
+    concurrent loader that inserted the same key first is not an error.
+    """
+    if not rows:
+        return {}
+    dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+    statement = (
+        dialect.insert(table)
+        .on_conflict_do_nothing(index_elements=[key])
+        .returning(table.c[key], table.c.id)
+    )
+    return dict(connection.execute(statement, rows).all())
+
+
+def update_existing(connection: Connection, table, rows: List[Dict[str, Any]], key: str, columns: List[str]) -> None:
+    """Update ``columns`` of existing rows, matched on ``key``, in one executemany.
+
+    A ``None`` value keeps the stored value, so fields missing from the
+    source do not overwrite changes made through the API.
+    """
+    if not rows:
+        return
+    statement = (
+        update(table)
+        .where(table.c[key] == bindparam(f"b_{key}"))
+        .values({
+            column: func.coalesce(bindparam(f"b_{column}", type_=table.c[column].type), table.c[column])
+            for column in columns
+        } | {"updated_at": bindparam("b_updated_at")})
+    )
+    connection.execute(statement, [
+        {f"b_{name}": value for name, value in row.items() if name in columns + [key, "updated_at"]}
+        for row in rows
+    ])
+
+
+def existing_keys(connection: Connection, column, keys: List[str]) -> set:
+    """Look up which of ``keys`` already exist, in one query."""
+    return set(connection.scalars(select(column).where(column.in_(keys))))
+
+
+def replace_challenge_tags(connection: Connection, rows: List[Dict[str, Any]]) -> None:
+    """Replace the ``challenge_tag`` rows of the challenges in ``rows``, whoever inserted them.
+
+    Each challenge must appear once in ``rows``; its own duplicate tags are dropped.
+    """
+    ids = dict(connection.execute(
+        select(challenge_table.c.challenge_id, challenge_table.c.id)
+        .where(challenge_table.c.challenge_id.in_([row["challenge_id"] for row in rows]))
+    ).all())
+    connection.execute(challenge_tag_table.delete().where(challenge_tag_table.c.challenge_id.in_(list(ids.values()))))
+    tags = [tag for row in rows for tag in tag_rows(ids[row["challenge_id"]], row["tags"])]
+    if tags:
+        connection.execute(challenge_tag_table.insert(), tags)
+
+
+def challenge_row(challenge_data: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    """Validate a raw challenge and build its table row."""
+    challenge = ChallengeCreate.model_validate(challenge_data)
+    return {**challenge.model_dump(), "created_at": now, "updated_at": now}
+
+
+def conversation_row(conv_data: Dict[str, Any], challenge_map: Dict[str, int], now: datetime) -> Dict[str, Any]:
+    """Validate a raw conversation and build its table row."""
     posts = conv_data.get('posts', [])
 
     conversation = ConversationBase.model_validate(
         {**conv_data, "user": posts[0]['user'], "challenge_id": challenge_map[conv_data['challenge_id']]},
     )
-    conversation_db = Conversation.model_validate(conversation)
-    
-    for post_data in posts:
-        post = Post(
-            user=post_data['user'],
-            content=post_data['content'],
-            timestamp=datetime.fromisoformat(post_data['timestamp'])
-        )
-        conversation_db.posts.append(post)
-    
-    return conversation_db
-
-def load_challenges(session: Session) -> Dict[str, int]:
-    """Load challenges from JSON file into the database."""
-    logger.info(f"Loading challenges from {CHALLENGES_FILE}")
-    challenges_data = load_json_file(CHALLENGES_FILE)
-    
-    # Create a mapping from challenge_id to database ID
-    challenge_map = {}
-    
-    for challenge_data in challenges_data['coding_challenges']:
-        # Check if challenge already exists
-        existing = session.exec(
-            select(Challenge).where(Challenge.challenge_id == challenge_data['challenge_id'])
-        ).first()
-        
-        if existing:
-            logger.info(f"Challenge {challenge_data['challenge_id']} already exists, skipping...")
-            challenge_map[challenge_data['challenge_id']] = existing.id
-            continue
-        
-        # Create and add the challenge
-        challenge = Challenge(**challenge_data)
-        session.add(challenge)
-        session.commit()
-        session.refresh(challenge)
-        
-        logger.info(f"Added challenge: {challenge.title} (ID: {challenge.id})")
-        challenge_map[challenge_data['challenge_id']] = challenge.id
-    
-    return challenge_map
-
-def load_conversations(session: Session, challenge_map: Dict[str, int]) -> None:
-    """Load conversations from JSON file into the database."""
-    logger.info(f"Loading conversations from {CONVERSATIONS_FILE}")
-    conversations_data = load_json_file(CONVERSATIONS_FILE)
-    
-    for conv_data in conversations_data['support_conversations']:
-        # Check if conversation already exists
-        existing = session.exec(
-            select(Conversation).where(Conversation.identifier == conv_data['identifier'])
-        ).first()
-        
-        if existing:
-            logger.info(f"Conversation {conv_data['identifier']} already exists, skipping...")
-            continue
-        
-        # Create and add the conversation
-        conversation = create_conversation(conv_data, challenge_map)
-        session.add(conversation)
-        session.commit()
-        
-        logger.info(f"Added conversation: {conversation.topic} (ID: {conversation.id})")
-
-def main():
+    # A conversation starts with its first post
+    created_at = datetime.fromisoformat(posts[0]['timestamp'])
+    return {**conversation.model_dump(), "created_at": created_at, "updated_at": now, **post_activity(conversation.user, posts)}
+
+
+def post_activity(author: str, posts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The activity columns of a conversation, as ``activity.refresh_activity`` computes them."""
+    timestamps = [datetime.fromisoformat(post_data['timestamp']) for post_data in posts]
+    # The latest post, the last one in the file among equal timestamps
+    latest = max(range(len(posts)), key=lambda index: (timestamps[index], index))
+    responses = [timestamp for timestamp, post_data in zip(timestamps, posts) if post_data['user'] != author]
+    return {
+        "post_count": len(posts),
+        "last_post_at": timestamps[latest],
+        "last_post_user": posts[latest]['user'],
+        "first_response_at": min(responses, default=None),
+    }
+
+
+def post_rows(conv_data: Dict[str, Any], conversation_id: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "user": post_data['user'],
+            "content": post_data['content'],
+            "conversation_id": conversation_id,
+            "timestamp": datetime.fromisoformat(post_data['timestamp']),
+        }
+        for post_data in conv_data.get('posts', [])
+    ]
+
+
+def load_challenges(db: Engine, file_path: Path, batch_size: int = BATCH_SIZE) -> LoadStats:
+    """Upsert challenges and their tags from a JSON file, one transaction per batch."""
+    logger.info(f"Loading challenges from {file_path}")
+    stats = LoadStats(file_path.name)
+    started = time.perf_counter()
+    columns = [column for column in ChallengeCreate.model_fields if column != "challenge_id"]
+
+    for batch in batched(iter_json_array(file_path, CHALLENGES_KEY), batch_size):
+        now = datetime.now(timezone.utc)
+        # A challenge listed twice in a batch is loaded once, as of its last occurrence
+        latest = {}
+        for challenge_data in batch:
+            row = challenge_row(challenge_data, now)
+            latest[row["challenge_id"]] = row
+        rows = list(latest.values())
+        with db.begin() as connection:
+            existing = existing_keys(connection, challenge_table.c.challenge_id, [row["challenge_id"] for row in rows])
+            inserted = insert_new(connection, challenge_table, [row for row in rows if row["challenge_id"] not in existing], "challenge_id")
+            update_existing(connection, challenge_table, [row for row in rows if row["challenge_id"] in existing], "challenge_id", columns)
+            replace_challenge_tags(connection, rows)
+
+        stats.read += len(batch)
+        stats.inserted += len(inserted)
+        stats.updated += len(rows) - len(inserted)
+        stats.skipped += len(batch) - len(rows)
+        stats.seconds = time.perf_counter() - started
+        logger.info(stats.report())
+
+    return stats
+
+
+def load_conversations(db: Engine, file_path: Path, batch_size: int = BATCH_SIZE) -> LoadStats:
+    """Upsert conversations and the posts of new conversations from a JSON file."""
+    logger.info(f"Loading conversations from {file_path}")
+    stats = LoadStats(file_path.name)
+    started = time.perf_counter()
+
+    with db.connect() as connection:
+        challenge_map = dict(connection.execute(select(challenge_table.c.challenge_id, challenge_table.c.id)).all())
+
+    for batch in batched(iter_json_array(file_path, CONVERSATIONS_KEY), batch_size):
+        now = datetime.now(timezone.utc)
+        sources, rows = {}, []
+        for conv_data in batch:
+            if conv_data.get('challenge_id') not in challenge_map or not conv_data.get('posts'):
+                logger.warning(f"Skipping conversation {conv_data.get('identifier')}: unknown challenge or no posts")
+                stats.skipped += 1
+                continue
+            sources[conv_data['identifier']] = conv_data
+            rows.append(conversation_row(conv_data, challenge_map, now))
+
+        with db.begin() as connection:
+            existing = existing_keys(connection, conversation_table.c.identifier, list(sources))
+            inserted = insert_new(connection, conversation_table, [row for row in rows if row["identifier"] not in existing], "identifier")
+            update_existing(
+                connection, conversation_table,
+                [{**row, "status": sources[row["identifier"]].get("status"), "assignee": sources[row["identifier"]].get("assignee")}
+                 for row in rows if row["identifier"] in existing],
+                "identifier", ["topic", "category", "challenge_id", "status", "assignee"],
+            )
+            posts = [post for identifier, conversation_id in inserted.items() for post in post_rows(sources[identifier], conversation_id)]
+            if posts:
+                connection.execute(post_table.insert(), posts)
+
+        stats.read += len(batch)
+        stats.inserted += len(inserted)
+        stats.updated += len(rows) - len(inserted)
+        stats.posts += len(posts)
+        stats.seconds = time.perf_counter() - started
+        logger.info(stats.report())
+
+    return stats
+
+
+def create_loader_engine(database_url: str) -> Engine:
+    # Parallel loaders wait for each other's write transactions on SQLite. A
+    # transaction that reads first cannot wait to upgrade to a write in WAL
+    # mode, so loader transactions take the write lock when they begin.
+    return create_database_engine(settings_for(database_url, busy_timeout_ms=60000, begin="IMMEDIATE"))
+
+
+def load_file(database_url: str, kind: str, file_path: Path, batch_size: int) -> LoadStats:
+    """Load one file in a worker process."""
+    db = create_loader_engine(database_url)
+    try:
+        loader = load_challenges if kind == "challenges" else load_conversations
+        return loader(db, file_path, batch_size)
+    finally:
+        db.dispose()
+
+
+def load_files(database_url: str, kind: str, files: List[Path], batch_size: int, workers: int) -> List[LoadStats]:
+    """Load ``files`` of one kind, up to ``workers`` at a time."""
+    if workers <= 1 or len(files) <= 1:
+        return [load_file(database_url, kind, file_path, batch_size) for file_path in files]
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(files))) as executor:
+        futures = [executor.submit(load_file, database_url, kind, file_path, batch_size) for file_path in files]
+        return [future.result() for future in futures]
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load challenges and support conversations into the database.")
+    parser.add_argument("--challenges", nargs="*", type=Path, default=[CHALLENGES_FILE], help="challenge JSON files")
+    parser.add_argument("--conversations", nargs="*", type=Path, default=[CONVERSATIONS_FILE], help="conversation JSON files")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows per transaction")
+    parser.add_argument("--workers", type=int, default=1, help="files to load in parallel")
+    parser.add_argument("--database-url", default=engine.url.render_as_string(hide_password=False), help="database to load into")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """Main function to load data into the database."""
+    args = parse_args(argv)
     logger.info("Starting database loading process...")
-    
-    # Create database tables if they don't exist
-    from sqlmodel import SQLModel
-    SQLModel.metadata.create_all(engine)
-    
-    with Session(engine) as session:
-        # Load challenges first
-        challenge_map = load_challenges(session)
-        
-        # Then load conversations
-        load_conversations(session, challenge_map)
-    
-    logger.info("Database loading completed successfully!")
+    started = time.perf_counter()
+
+    # Bring the schema up to date
+    db = create_loader_engine(args.database_url)
+    migrate(db)
+    db.dispose()
+
+    # Load challenges first, then conversations
+    stats = load_files(args.database_url, "challenges", args.challenges, args.batch_size, args.workers)
+    stats += load_files(args.database_url, "conversations", args.conversations, args.batch_size, args.workers)
+
+    elapsed = time.perf_counter() - started
+    rows = sum(file_stats.read for file_stats in stats)
+    for file_stats in stats:
+        logger.info(file_stats.report())
+    logger.info(f"Database loading completed successfully! {rows} rows in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)")
 
 if __name__ == "__main__":
     main()
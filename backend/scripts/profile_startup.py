@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Script to profile worker cold start and enforce a startup budget.
+
+Each run imports ``pennylane_support.app`` and runs its startup (the
+lifespan, up to serving the first request) in a fresh interpreter. The
+report shows the median import and startup times over ``--runs``, plus
+import time per module and per top-level package, taken from
+``python -X importtime``. It exits with status 1 when import plus startup
+exceeds ``--budget-ms``, or when a ``--forbid`` module is imported, so CI
+catches startup regressions.
+
+Usage::
+
+    python scripts/profile_startup.py --runs 5 --budget-ms 2500 --output startup.json
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SRC_DIR = Path(__file__).parent.parent / "src"
+
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "2500"))
+# Modules with no business in a worker
+FORBIDDEN_MODULES = ["tkinter", "dotenv"]
+
+PROBE = """
+import asyncio, json, sys, time
+
+started = time.perf_counter()
+from pennylane_support.app import app
+imported = time.perf_counter()
+
+async def start():
+    async with app.router.lifespan_context(app):
+        return time.perf_counter()
+
+ready = asyncio.run(start())
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "modules": sorted(sys.modules),
+}))
+"""
+
+
+def probe(database_url: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    env = {**os.environ, "DATABASE_URL": database_url, "PYTHONPATH": str(SRC_DIR)}
+    flags = ["-X", "importtime"] if importtime else []
+    return subprocess.run(
+        [sys.executable, *flags, "-c", PROBE], env=env, capture_output=True, text=True, check=True,
+    )
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Parse ``-X importtime`` output into one entry per module."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append({
+            "module": name.strip(),
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+    return modules
+
+
+def by_package(modules: List[Dict[str, Any]]) -> Dict[str, float]:
+    packages: Dict[str, float] = {}
+    for module in modules:
+        package = module["module"].split(".")[0]
+        packages[package] = packages.get(package, 0.0) + module["self_ms"]
+    return dict(sorted(packages.items(), key=lambda item: -item[1]))
+
+
+def profile(database_url: str, runs: int) -> Dict[str, Any]:
+    samples = [json.loads(probe(database_url).stdout) for _ in range(runs)]
+    modules = parse_importtime(probe(database_url, importtime=True).stderr)
+    import_ms = statistics.median(sample["import_ms"] for sample in samples)
+    startup_ms = statistics.median(sample["startup_ms"] for sample in samples)
+    return {
+        "import_ms": import_ms,
+        "startup_ms": startup_ms,
+        "total_ms": import_ms + startup_ms,
+        "imported": samples[-1]["modules"],
+        "packages": by_package(modules),
+        "modules": sorted(modules, key=lambda module: -module["cumulative_ms"]),
+    }
+
+
+def report(result: Dict[str, Any], top: int) -> None:
+    logger.info(
+        f"Import {result['import_ms']:.0f}ms + startup {result['startup_ms']:.0f}ms "
+        f"= {result['total_ms']:.0f}ms"
+    )
+    logger.info("Import time by package (self):")
+    for package, ms in list(result["packages"].items())[:top]:
+        logger.info(f"  {ms:8.1f}ms  {package}")
+    logger.info("Slowest modules (cumulative / self):")
+    for module in result["modules"][:top]:
+        logger.info(f"  {module['cumulative_ms']:8.1f}ms {module['self_ms']:8.1f}ms  {module['module']}")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Profile worker cold start against a budget.")
+    parser.add_argument("--database-url", default=None, help="database to start against (default: a new SQLite file)")
+    parser.add_argument("--runs", type=int, default=5, help="timed cold starts; the median is reported")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS, help="fail when import plus startup takes longer")
+    parser.add_argument("--forbid", nargs="*", default=FORBIDDEN_MODULES, help="fail when any of these modules is imported")
+    parser.add_argument("--top", type=int, default=15, help="modules and packages to list")
+    parser.add_argument("--output", type=Path, default=None, help="file to write the full profile to")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Main function to profile startup."""
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory() as scratch:
+        database_url = args.database_url or f"sqlite:///{Path(scratch) / 'startup.db'}"
+        # Migrate first, so the timed runs start against an up-to-date schema
+        probe(database_url)
+        result = profile(database_url, args.runs)
+
+    report(result, args.top)
+    if args.output:
+        args.output.write_text(json.dumps(result, indent=2) + "\n")
+        logger.info(f"Profile written to {args.output}")
+
+    failures = []
+    if result["total_ms"] > args.budget_ms:
+        failures.append(f"startup took {result['total_ms']:.0f}ms, over the {args.budget_ms:.0f}ms budget")
+    forbidden = [
+        name for name in result["imported"]
+        if any(name == module or name.startswith(module + ".") for module in args.forbid)
+    ]
+    if forbidden:
+        failures.append(f"imported forbidden modules: {', '.join(forbidden)}")
+    for failure in failures:
+        logger.error(failure)
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
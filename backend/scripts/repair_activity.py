@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Script to recompute the denormalized activity of conversations.
+
+Post writes keep ``post_count``, ``last_post_at``, ``last_post_user`` and
+``first_response_at`` current, but rows written around the application
+(manual fixes, restores, older loaders) can drift. This script recomputes
+them from the posts in id-range batches, one ``UPDATE`` and one transaction
+per batch, so it can run against a live database. With ``--check`` it only
+counts the conversations that disagree with their posts, and exits with
+status 1 if there are any.
+
+Usage::
+
+    python scripts/repair_activity.py
+    python scripts/repair_activity.py --check --database-url sqlite:///support.db
+"""
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import Engine
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+from pennylane_support.activity import drifted, refresh_activity
+from pennylane_support.database import create_database_engine, engine, settings_for
+from pennylane_support.migrations import migrate
+from pennylane_support.models.conversation import Conversation
+
+BATCH_SIZE = 5000
+
+
+def id_ranges(db: Engine, batch_size: int):
+    """``(first, last)`` id ranges covering every conversation, ``batch_size`` ids each."""
+    with db.connect() as connection:
+        low, high = connection.execute(select(func.min(Conversation.id), func.max(Conversation.id))).one()
+    if low is None:
+        return
+    for first in range(low, high + 1, batch_size):
+        yield first, min(first + batch_size - 1, high)
+
+
+def count_drifted(db: Engine, batch_size: int = BATCH_SIZE) -> int:
+    """Count the conversations whose stored activity disagrees with their posts."""
+    total = 0
+    for first, last in id_ranges(db, batch_size):
+        with db.connect() as connection:
+            total += connection.scalar(
+                select(func.count()).select_from(Conversation)
+                .where(Conversation.id.between(first, last), drifted())
+            )
+    return total
+
+
+def repair(db: Engine, batch_size: int = BATCH_SIZE) -> int:
+    """Recompute the activity of drifted conversations; returns how many were fixed."""
+    repaired = 0
+    started = time.perf_counter()
+    for first, last in id_ranges(db, batch_size):
+        with db.begin() as connection:
+            result = connection.execute(refresh_activity(Conversation.id.between(first, last), drifted()))
+        repaired += result.rowcount
+        logger.info(f"Conversations {first}-{last}: {repaired} repaired in {time.perf_counter() - started:.1f}s")
+    return repaired
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Recompute the denormalized activity of conversations.")
+    parser.add_argument("--check", action="store_true", help="only count drifted conversations; exit 1 if any")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="conversation ids per transaction")
+    parser.add_argument("--database-url", default=engine.url.render_as_string(hide_password=False), help="database to repair")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Main function to repair conversation activity."""
+    args = parse_args(argv)
+    db = create_database_engine(settings_for(args.database_url))
+    try:
+        migrate(db)
+        if args.check:
+            drift = count_drifted(db, args.batch_size)
+            logger.info(f"{drift} conversations have drifted activity")
+            if drift:
+                sys.exit(1)
+            return
+        logger.info(f"Repaired {repair(db, args.batch_size)} conversations")
+    finally:
+        db.dispose()
+
+if __name__ == "__main__":
+    main()
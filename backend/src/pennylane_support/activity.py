@@ -0,0 +1,75 @@
+"""Denormalized conversation activity.
+
+``Conversation.post_count``, ``last_post_at``, ``last_post_user`` and
+``first_response_at`` summarize a conversation's posts, so that list views
+can sort and filter on activity with the conversation indexes alone rather
+than aggregating ``post`` for every row. Post writes keep them current in
+their own transaction: ``record_post`` applies one new post to the stored
+values, and ``refresh_activity`` recomputes them from the posts, after a
+delete, for a batch of posts, or to repair them in bulk.
+
+``first_response_at`` is the time of the first post by anyone other than
+the conversation's author.
+"""
+from datetime import datetime
+from typing import Any, Dict
+
+from sqlalchemy import case, func, or_, update
+from sqlmodel import select
+
+from .models.conversation import Conversation, Post
+
+# The sort key of "most recently active": a conversation without posts is
+# as recent as its creation
+ACTIVITY = func.coalesce(Conversation.last_post_at, Conversation.created_at)
+
+
+def activity_from_posts() -> Dict[str, Any]:
+    """Correlated subqueries computing each activity column from ``post``."""
+    posts = select(Post).where(Post.conversation_id == Conversation.id)
+    latest = posts.order_by(Post.timestamp.desc(), Post.id.desc()).limit(1)
+    return {
+        "post_count": posts.with_only_columns(func.count(Post.id)).scalar_subquery(),
+        "last_post_at": latest.with_only_columns(Post.timestamp).scalar_subquery(),
+        "last_post_user": latest.with_only_columns(Post.user).scalar_subquery(),
+        "first_response_at": posts.with_only_columns(func.min(Post.timestamp))
+        .where(Post.user != Conversation.user).scalar_subquery(),
+    }
+
+
+def refresh_activity(*conditions, **values):
+    """``UPDATE`` recomputing the activity of the conversations matching ``conditions``.
+
+    ``values`` are extra columns to set in the same statement.
+    """
+    return update(Conversation).where(*conditions).values(**activity_from_posts(), **values)
+
+
+def record_post(conversation: Conversation, user: str, timestamp: datetime, **values):
+    """``UPDATE`` applying one new post to its conversation's activity.
+
+    The new values are computed from the stored ones by the database, so
+    concurrent posts to the same conversation do not lose each other's
+    counts; a post older than the latest one only adds to the count.
+    """
+    is_latest = or_(Conversation.last_post_at.is_(None), Conversation.last_post_at <= timestamp)
+    values = {
+        "post_count": Conversation.post_count + 1,
+        "last_post_at": case((is_latest, timestamp), else_=Conversation.last_post_at),
+        "last_post_user": case((is_latest, user), else_=Conversation.last_post_user),
+        **values,
+    }
+    if user != conversation.user:
+        values["first_response_at"] = case(
+            (or_(Conversation.first_response_at.is_(None), Conversation.first_response_at > timestamp), timestamp),
+            else_=Conversation.first_response_at,
+        )
+    return update(Conversation).where(Conversation.id == conversation.id).values(**values)
+
+
+def drifted():
+    """A predicate matching conversations whose stored activity disagrees with their posts."""
+    return or_(*(
+        getattr(Conversation, name).is_distinct_from(value)
+        for name, value in activity_from_posts().items()
+    ))
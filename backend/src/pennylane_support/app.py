@@ -1,30 +1,34 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
-from dotenv import load_dotenv
-from sqlmodel import Session, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 import logging
 
-from .routers import challenges, conversations, user
-from .database import engine
+from .routers import batch, challenges, conversations, events, export, inbox, queue, search, user
+from .database import async_engine, replica_engine
 from .dependencies import get_session
+from .events import hub
+from . import metrics
+from .compression import CompressionMiddleware
+from .migrations import ensure_schema_async
 from sqlmodel import select
 
-# Load environment variables from .env file
-load_dotenv()
-
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def create_tables():
-    SQLModel.metadata.create_all(bind=engine)
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    create_tables()
+    applied = await ensure_schema_async(async_engine)
+    if applied:
+        logger.info(f"Applied schema migrations: {applied}")
+    await hub.start()
     yield
+    await hub.stop()
+    await async_engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
 
 # Create FastAPI app
 app = FastAPI(
@@ -45,7 +49,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+app.add_middleware(CompressionMiddleware)
+# Outermost, so latency and response size include the other middleware
+app.add_middleware(metrics.MetricsMiddleware)
 
 # Include routers
 app.include_router(
@@ -54,12 +60,49 @@ app.include_router(
     responses={404: {"description": "Not found"}},
 )
 
+# Before the conversations router, which would match /conversations/batch as an id
+app.include_router(
+    batch.router,
+    tags=["Batch"],
+    responses={404: {"description": "Not found"}},
+)
+
 app.include_router(
     conversations.router,
     tags=["Conversations"],
     responses={404: {"description": "Not found"}},
 )
 
+app.include_router(
+    events.router,
+    tags=["Events"],
+    responses={404: {"description": "Not found"}},
+)
+
+app.include_router(
+    export.router,
+    tags=["Export"],
+    responses={404: {"description": "Not found"}},
+)
+
+app.include_router(
+    inbox.router,
+    tags=["Inbox"],
+    responses={404: {"description": "Not found"}},
+)
+
+app.include_router(
+    queue.router,
+    tags=["Queue"],
+    responses={404: {"description": "Not found"}},
+)
+
+app.include_router(
+    search.router,
+    tags=["Search"],
+    responses={404: {"description": "Not found"}},
+)
+
 app.include_router(
     user.router,
     tags=["User"],
@@ -68,11 +111,11 @@ app.include_router(
 
 # Health check endpoint
 @app.get("/api/health", tags=["System"])
-async def health_check(session: Session = Depends(get_session)):
+async def health_check(session: AsyncSession = Depends(get_session)):
     """Health check endpoint."""
     try:
         # Test database connection
-        session.exec(select(1))
+        await session.exec(select(1))
         return {
             "status": "healthy",
             "version": app.version,
@@ -86,3 +129,8 @@ async def health_check(session: Session = Depends(get_session)):
             "database": "disconnected",
             "error": str(e),
         }, 503
+
+@app.get("/metrics", tags=["System"], response_class=PlainTextResponse)
+async def read_metrics():
+    """Per-route request, response size and SQL metrics in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,61 @@
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Mapping, Tuple
+
+
+class CountCache:
+    """Small in-process LRU cache of list totals, keyed by scope and filter set.
+
+    Writes call ``invalidate(scope)``, which drops every cached total for
+    that scope. A per-scope generation counter keeps a count that was
+    started before an invalidation from being stored after it. Entries also
+    expire after ``ttl`` seconds, which bounds staleness when several
+    workers each hold their own cache.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[float, int]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+
+    @staticmethod
+    def key(scope: str, filters: Mapping[str, Any]) -> Tuple[str, Hashable]:
+        """Build a cache key; filters that are ``None`` are not part of the key."""
+        return scope, tuple(sorted((k, v) for k, v in filters.items() if v is not None))
+
+    async def get_or_count(
+        self,
+        scope: str,
+        filters: Mapping[str, Any],
+        count: Callable[[], Awaitable[int]],
+    ) -> int:
+        """Return the cached total for ``filters`` or compute and store it."""
+        key = self.key(scope, filters)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            return entry[1]
+
+        generation = self._generations.get(scope, 0)
+        total = await count()
+        if self._generations.get(scope, 0) == generation:
+            self._entries[key] = (time.monotonic() + self.ttl, total)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return total
+
+    def invalidate(self, *scopes: str) -> None:
+        """Drop every cached total in the given scopes."""
+        for scope in scopes:
+            self._generations[scope] = self._generations.get(scope, 0) + 1
+        for key in [key for key in self._entries if key[0] in scopes]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._generations.clear()
+
+
+counts = CountCache()
@@ -0,0 +1,148 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .models.challenge import Challenge, ChallengeDifficulty, ChallengePublic, ChallengeTag, TagMatch
+
+# How often a worker checks the database for a newer catalog version
+CATALOG_CHECK_INTERVAL = float(os.getenv("CATALOG_CHECK_INTERVAL", "1.0"))
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """An immutable view of every challenge, indexed for the read endpoints."""
+    version: int
+    built_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    challenges: Tuple[ChallengePublic, ...] = ()
+    by_challenge_id: Mapping[str, ChallengePublic] = field(default_factory=dict)
+    by_difficulty: Mapping[ChallengeDifficulty, Tuple[ChallengePublic, ...]] = field(default_factory=dict)
+    by_category: Mapping[str, Tuple[ChallengePublic, ...]] = field(default_factory=dict)
+    # Ids of the challenges with each tag, from ``challenge_tag``
+    by_tag: Mapping[str, FrozenSet[int]] = field(default_factory=dict)
+    # JSON-ready documents by id, serialized once per snapshot
+    documents: Mapping[int, Dict[str, Any]] = field(default_factory=dict)
+
+    @classmethod
+    def build(
+        cls, version: int, challenges: List[ChallengePublic], tags: Iterable[Tuple[str, int]] = (),
+    ) -> "CatalogSnapshot":
+        by_difficulty: Dict[ChallengeDifficulty, List[ChallengePublic]] = {}
+        by_category: Dict[str, List[ChallengePublic]] = {}
+        for challenge in challenges:
+            by_difficulty.setdefault(challenge.difficulty, []).append(challenge)
+            by_category.setdefault(challenge.category, []).append(challenge)
+        by_tag: Dict[str, set] = {}
+        for tag, id in tags:
+            by_tag.setdefault(tag, set()).add(id)
+
+        return cls(
+            version=version,
+            challenges=tuple(challenges),
+            by_challenge_id=MappingProxyType({c.challenge_id: c for c in challenges}),
+            by_difficulty=MappingProxyType({k: tuple(v) for k, v in by_difficulty.items()}),
+            by_category=MappingProxyType({k: tuple(v) for k, v in by_category.items()}),
+            by_tag=MappingProxyType({k: frozenset(v) for k, v in by_tag.items()}),
+            documents=MappingProxyType({c.id: c.model_dump(mode="json") for c in challenges}),
+        )
+
+    def filter(
+        self,
+        difficulty: Optional[ChallengeDifficulty] = None,
+        category: Optional[str] = None,
+        tags: Sequence[str] = (),
+        match: TagMatch = TagMatch.ANY,
+    ) -> Tuple[ChallengePublic, ...]:
+        """Return the challenges matching every given filter, in id order.
+
+        ``tags`` matches challenges with any of the tags, or with all of
+        them when ``match`` is ``all``.
+        """
+        if difficulty and category:
+            challenges = tuple(c for c in self.by_difficulty.get(difficulty, ()) if c.category == category)
+        elif difficulty:
+            challenges = self.by_difficulty.get(difficulty, ())
+        elif category:
+            challenges = self.by_category.get(category, ())
+        else:
+            challenges = self.challenges
+
+        if not tags:
+            return challenges
+        tagged = [self.by_tag.get(tag, frozenset()) for tag in tags]
+        ids = frozenset.intersection(*tagged) if match == TagMatch.ALL else frozenset().union(*tagged)
+        return tuple(c for c in challenges if c.id in ids)
+
+    def tag_counts(self, challenges: Sequence[ChallengePublic]) -> List[Tuple[str, int]]:
+        """Count the challenges per tag among ``challenges``, most used first."""
+        if len(challenges) == len(self.challenges):
+            counts = {tag: len(ids) for tag, ids in self.by_tag.items()}
+        else:
+            ids = {c.id for c in challenges}
+            counts = {tag: len(tagged & ids) for tag, tagged in self.by_tag.items()}
+        return sorted(
+            ((tag, count) for tag, count in counts.items() if count), key=lambda item: (-item[1], item[0])
+        )
+
+
+class Catalog:
+    """Holds the current catalog snapshot of this worker.
+
+    Reads are served from the snapshot. At most once per ``check_interval``
+    a read compares the snapshot with the database's ``catalog_version``,
+    which every challenge write bumps, so changes made by other workers are
+    picked up without querying the challenges themselves. A rebuild swaps
+    in a new snapshot as a single reference assignment.
+    """
+
+    def __init__(self, check_interval: float = CATALOG_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self, session: AsyncSession) -> CatalogSnapshot:
+        """Return a snapshot that is at most ``check_interval`` seconds stale."""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() < self._checked_at + self.check_interval:
+            return snapshot
+
+        version = await self._version(session)
+        if snapshot is None or snapshot.version != version:
+            snapshot = await self.rebuild(session)
+        self._checked_at = time.monotonic()
+        return snapshot
+
+    async def rebuild(self, session: AsyncSession) -> CatalogSnapshot:
+        """Load every challenge and its tags, and atomically replace the snapshot."""
+        async with self._lock:
+            version = await self._version(session)
+            if self._snapshot is not None and self._snapshot.version == version:
+                return self._snapshot
+
+            challenges = (await session.exec(select(Challenge).order_by(Challenge.id))).all()
+            tags = (await session.exec(select(ChallengeTag.tag, ChallengeTag.challenge_id))).all()
+            snapshot = CatalogSnapshot.build(
+                version, [ChallengePublic.model_validate(challenge) for challenge in challenges], tags
+            )
+            self._snapshot = snapshot
+            self._checked_at = time.monotonic()
+            return snapshot
+
+    def clear(self) -> None:
+        self._snapshot = None
+        self._checked_at = 0.0
+
+    @staticmethod
+    async def _version(session: AsyncSession) -> int:
+        return await session.scalar(text("SELECT version FROM catalog_version WHERE id = 1")) or 0
+
+
+catalog = Catalog()
@@ -0,0 +1,149 @@
+"""Group commit for small, frequent writes.
+
+Every commit on SQLite waits for the disk, and the single writer means
+concurrent requests wait for each other's commits too. ``WriteCoalescer``
+collects the writes submitted within ``max_delay_ms`` (or while the write
+lock is held by someone else) and commits up to ``max_batch`` of them in
+one transaction. Each write runs in its own savepoint, so one that fails
+is rolled back and raises in its caller without affecting the others.
+
+A write is only acknowledged once its batch has committed: a crash or a
+failed commit loses at most the ``max_batch`` writes that were in flight,
+and all of their callers see the error. With ``WRITE_COALESCING=false``
+every write commits on its own, as before.
+"""
+import asyncio
+import contextvars
+import os
+import time
+from contextlib import nullcontext
+from typing import AsyncContextManager, Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import metrics
+from .database import env_bool
+
+T = TypeVar("T")
+Write = Callable[[AsyncSession], Awaitable[T]]
+
+WRITE_COALESCING = env_bool("WRITE_COALESCING", True)
+WRITE_COALESCE_DELAY_MS = float(os.getenv("WRITE_COALESCE_DELAY_MS", "2"))
+WRITE_COALESCE_MAX_BATCH = int(os.getenv("WRITE_COALESCE_MAX_BATCH", "64"))
+
+
+class WriteCoalescer:
+    """Commits concurrently submitted writes together.
+
+    ``submit(write)`` calls ``write(session)`` inside a batch and returns its
+    result once the batch has committed. Writes must not commit themselves.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker,
+        lock: Optional[AsyncContextManager] = None,
+        max_delay_ms: float = WRITE_COALESCE_DELAY_MS,
+        max_batch: int = WRITE_COALESCE_MAX_BATCH,
+        enabled: bool = WRITE_COALESCING,
+    ):
+        self.session_maker = session_maker
+        self.lock = lock or nullcontext()
+        self.max_delay_ms = max_delay_ms
+        self.max_batch = max(1, max_batch)
+        self.enabled = enabled
+        # Committed transactions and the writes they carried
+        self.batches = 0
+        self.writes = 0
+        self._pending: List[Tuple[Write, asyncio.Future]] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self._full: Optional[asyncio.Event] = None
+
+    async def submit(self, write: Write[T]) -> T:
+        if not self.enabled:
+            return await self._commit_alone(write)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((write, future))
+        # A flusher left over from another event loop (as in tests) cannot serve this one
+        if self._flusher is None or self._flusher.done() or self._flusher.get_loop() is not loop:
+            self._full = asyncio.Event()
+            # A fresh context, so that batches are not charged to the request that started the flusher
+            self._flusher = loop.create_task(self._flush(), context=contextvars.Context())
+        elif len(self._pending) >= self.max_batch:
+            self._full.set()
+        return await future
+
+    async def _commit_alone(self, write: Write[T]) -> T:
+        async with self.lock, self.session_maker() as session:
+            result = await write(session)
+            await session.commit()
+        self.batches += 1
+        self.writes += 1
+        return result
+
+    async def _flush(self) -> None:
+        while self._pending:
+            if len(self._pending) < self.max_batch:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay_ms / 1000)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+            batch: List[Tuple[Write, asyncio.Future]] = []
+            try:
+                async with self.lock:
+                    # Writes that arrived while waiting for the lock join the batch
+                    batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+                    await self._commit(batch)
+            except BaseException as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                if not isinstance(error, Exception):
+                    raise
+
+    async def _commit(self, batch: List[Tuple[Write, asyncio.Future]]) -> None:
+        stats = metrics.RequestStats()
+        token = metrics.current_request.set(stats)
+        started = time.perf_counter()
+        try:
+            results = await self._run(batch)
+        finally:
+            metrics.current_request.reset(token)
+        if not results:
+            return
+
+        metrics.record_write_batch(len(results), time.perf_counter() - started, stats)
+        self.batches += 1
+        self.writes += len(results)
+        for future, result in results:
+            if not future.done():
+                future.set_result(result)
+
+    async def _run(self, batch: List[Tuple[Write, asyncio.Future]]) -> list:
+        """Run the writes of ``batch`` and commit them; returns the successful ones and their results."""
+        batch = [(write, future) for write, future in batch if not future.done()]
+        results = []
+        async with self.session_maker() as session:
+            for write, future in batch:
+                try:
+                    if len(batch) == 1:
+                        result = await write(session)
+                        await session.flush()
+                    else:
+                        async with session.begin_nested():
+                            result = await write(session)
+                except Exception as error:
+                    # The caller may have gone away (a cancelled request) while queued
+                    if not future.done():
+                        future.set_exception(error)
+                    if len(batch) == 1:
+                        await session.rollback()
+                else:
+                    results.append((future, result))
+            if results:
+                await session.commit()
+        return results
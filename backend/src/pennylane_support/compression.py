@@ -0,0 +1,341 @@
+"""Content-negotiated response compression.
+
+``CompressionMiddleware`` compresses response bodies with the best coding
+the client accepts, out of zstd, brotli and gzip (zstd and brotli need the
+``compression`` extra; zstd is in the standard library from Python 3.14).
+Levels depend on the body size: small bodies get a high level, which is
+cheap for them, and large ones a low level, so that compression time
+stays bounded.
+
+Bodies of cacheable responses, those with an ``ETag``, are kept in
+``compressed_bodies``, keyed by URL, ETag and coding. A later response
+with the same key reuses the compressed bytes as long as its body is
+unchanged. The response that misses the cache is compressed at the usual
+level; a background thread then recompresses the body at the best level
+and replaces the cached copy, so the event loop never spends time on the
+slow levels. Streaming responses are compressed
+chunk by chunk; server-sent events are never compressed, so each event is
+delivered as soon as it is sent.
+"""
+import gzip
+import hashlib
+import math
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Sequence, Set, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+KiB = 1024
+MiB = 1024 * KiB
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1000"))
+COMPRESSION_CACHE_BYTES = int(os.getenv("COMPRESSION_CACHE_BYTES", str(64 * MiB)))
+# Preference order, when the client accepts several codings equally
+COMPRESSION_ENCODINGS = os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip")
+
+# Bodies larger than this are compressed off the event loop
+THREADPOOL_SIZE = 256 * KiB
+# Cached bodies up to this size are recompressed at the best level in the background
+BEST_LEVEL_MAX_SIZE = 1 * MiB
+# Most recompressions waiting for the background thread; further ones are skipped
+BEST_LEVEL_QUEUE_SIZE = 64
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript", "application/xml")
+
+
+@dataclass(frozen=True)
+class Codec:
+    """A content coding, with its levels by body size."""
+    name: str
+    compress: Callable[[bytes, int], bytes]
+    # A streaming compressor with ``compress(chunk)`` and ``flush()``
+    stream: Callable[[int], Any]
+    # (largest body size, level), smallest first, ending with ``math.inf``
+    levels: Tuple[Tuple[float, int], ...]
+    best: int
+
+    def level(self, size: Optional[int]) -> int:
+        """The level for a body of ``size`` bytes, or of unknown size (streamed)."""
+        if size is None:
+            return self.levels[-1][1]
+        return next(level for limit, level in self.levels if size <= limit)
+
+
+def gzip_codec() -> Codec:
+    return Codec(
+        "gzip",
+        lambda body, level: gzip.compress(body, compresslevel=level, mtime=0),
+        lambda level: zlib.compressobj(level, zlib.DEFLATED, 31),
+        levels=((64 * KiB, 6), (1 * MiB, 4), (math.inf, 1)),
+        best=9,
+    )
+
+
+def zstd_codec() -> Optional[Codec]:
+    levels = ((64 * KiB, 9), (1 * MiB, 6), (math.inf, 3))
+    try:
+        from compression import zstd
+    except ImportError:
+        try:
+            import zstandard
+        except ImportError:
+            return None
+        return Codec(
+            "zstd",
+            lambda body, level: zstandard.ZstdCompressor(level=level).compress(body),
+            lambda level: zstandard.ZstdCompressor(level=level).compressobj(),
+            levels=levels,
+            best=19,
+        )
+    return Codec(
+        "zstd",
+        lambda body, level: zstd.compress(body, level=level),
+        lambda level: zstd.ZstdCompressor(level=level),
+        levels=levels,
+        best=19,
+    )
+
+
+def brotli_codec() -> Optional[Codec]:
+    try:
+        import brotli
+    except ImportError:
+        return None
+
+    class Stream:
+        def __init__(self, quality: int):
+            self._compressor = brotli.Compressor(quality=quality)
+
+        def compress(self, chunk: bytes) -> bytes:
+            return self._compressor.process(chunk)
+
+        def flush(self) -> bytes:
+            return self._compressor.finish()
+
+    return Codec(
+        "br",
+        lambda body, level: brotli.compress(body, quality=level),
+        Stream,
+        levels=((64 * KiB, 8), (1 * MiB, 5), (math.inf, 3)),
+        best=11,
+    )
+
+
+def available_codecs(names: str = COMPRESSION_ENCODINGS) -> Dict[str, Codec]:
+    """The installed codecs among ``names``, in that order."""
+    factories = {"zstd": zstd_codec, "br": brotli_codec, "gzip": gzip_codec}
+    codecs = (factories[name.strip()]() for name in names.split(",") if name.strip() in factories)
+    return {codec.name: codec for codec in codecs if codec is not None}
+
+
+def negotiate(accept_encoding: str, available: Sequence[str]) -> Optional[str]:
+    """Pick a coding from ``Accept-Encoding``: the highest q-value, then ``available`` order."""
+    qualities: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name.strip():
+            qualities[name.strip().lower()] = quality
+
+    wildcard = qualities.get("*", 0.0)
+    chosen, chosen_quality = None, 0.0
+    for name in available:
+        quality = qualities.get(name, wildcard)
+        if quality > chosen_quality:
+            chosen, chosen_quality = name, quality
+    return chosen
+
+
+class CompressedCache:
+    """LRU cache of compressed bodies, bounded by their total size.
+
+    Thread-safe, since bodies recompressed in the background are stored
+    from another thread.
+    """
+
+    def __init__(self, max_bytes: int = COMPRESSION_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # key -> (digest of the uncompressed body, compressed body)
+        self._entries: "OrderedDict[Tuple[str, ...], Tuple[bytes, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, ...], digest: bytes) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != digest:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Tuple[str, ...], digest: bytes, body: bytes) -> None:
+        with self._lock:
+            self._put(key, digest, body)
+
+    def replace(self, key: Tuple[str, ...], digest: bytes, body: bytes) -> None:
+        """Store ``body`` only if the entry for ``key`` still holds the same body."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == digest:
+                self._put(key, digest, body)
+
+    def _put(self, key: Tuple[str, ...], digest: bytes, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old[1])
+        self._entries[key] = (digest, body)
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = self.hits = self.misses = 0
+
+
+compressed_bodies = CompressedCache()
+
+
+def is_compressible(headers: Headers) -> bool:
+    content_type = headers.get("content-type", "")
+    return (
+        "content-encoding" not in headers
+        and content_type.startswith(COMPRESSIBLE_TYPES)
+        and not content_type.startswith("text/event-stream")
+    )
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with the negotiated coding."""
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        cache: CompressedCache = compressed_bodies,
+        encodings: str = COMPRESSION_ENCODINGS,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = cache
+        self.codecs = available_codecs(encodings)
+        # One thread, so that recompression never takes more than a core
+        self._recompressor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recompress")
+        self._recompressing: Set[Tuple[str, ...]] = set()
+        self._recompressing_lock = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        name = negotiate(Headers(scope=scope).get("accept-encoding", ""), list(self.codecs))
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        codec = self.codecs[name]
+        start: Optional[dict] = None
+        stream = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, stream, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if stream is None:
+                headers = MutableHeaders(raw=start["headers"])
+                if not is_compressible(headers) or (not more_body and len(body) < self.minimum_size):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+
+                headers["content-encoding"] = codec.name
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body:
+                    body = await self.compress(scope, codec, headers, body)
+                    headers["content-length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+
+                del headers["content-length"]
+                stream = codec.stream(codec.level(None))
+                await send(start)
+
+            chunk = stream.compress(body)
+            if not more_body:
+                chunk += stream.flush()
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def compress(self, scope, codec: Codec, headers: MutableHeaders, body: bytes) -> bytes:
+        """Compress a complete body, through the cache when the response has an ETag."""
+        etag = headers.get("etag")
+        cacheable = etag is not None and "no-store" not in headers.get("cache-control", "")
+        if cacheable:
+            key = (scope["path"], scope.get("query_string", b"").decode("latin-1"), etag, codec.name)
+            digest = hashlib.blake2b(body, digest_size=16).digest()
+            compressed = self.cache.get(key, digest)
+            if compressed is not None:
+                return compressed
+
+        level = codec.level(len(body))
+        if len(body) > THREADPOOL_SIZE:
+            compressed = await run_in_threadpool(codec.compress, body, level)
+        else:
+            compressed = codec.compress(body, level)
+
+        if cacheable:
+            self.cache.put(key, digest, compressed)
+            if level != codec.best and len(body) <= BEST_LEVEL_MAX_SIZE:
+                self.recompress(codec, key, digest, body)
+        return compressed
+
+    def recompress(self, codec: Codec, key: Tuple[str, ...], digest: bytes, body: bytes) -> None:
+        """Replace a cached body with its best-level compression, in the background."""
+        with self._recompressing_lock:
+            if key in self._recompressing or len(self._recompressing) >= BEST_LEVEL_QUEUE_SIZE:
+                return
+            self._recompressing.add(key)
+
+        def run():
+            try:
+                self.cache.replace(key, digest, codec.compress(body, codec.best))
+            finally:
+                with self._recompressing_lock:
+                    self._recompressing.discard(key)
+
+        self._recompressor.submit(run)
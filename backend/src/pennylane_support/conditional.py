@@ -0,0 +1,59 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional
+
+from fastapi import Request, Response, status
+
+
+def utc(value: datetime) -> datetime:
+    """Treat naive datetimes (as read back from SQLite) as UTC."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def make_etag(*parts: Any) -> str:
+    """Build a strong ETag from the values that determine a representation."""
+    normalized = [utc(part).isoformat() if isinstance(part, datetime) else repr(part) for part in parts]
+    return '"%s"' % hashlib.blake2b("\x1f".join(normalized).encode(), digest_size=16).hexdigest()
+
+
+def is_not_modified(request: Request, etag: str, modified: Optional[datetime] = None) -> bool:
+    """Evaluate ``If-None-Match`` / ``If-Modified-Since`` against the current validators.
+
+    ``If-None-Match`` takes precedence, as in RFC 9110 section 13.2.2.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None and modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return utc(modified).replace(microsecond=0) <= utc(since)
+
+    return False
+
+
+def has_preconditions(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def validator_headers(etag: str, modified: Optional[datetime] = None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if modified is not None:
+        headers["Last-Modified"] = format_datetime(utc(modified), usegmt=True)
+    return headers
+
+
+def not_modified(etag: str, modified: Optional[datetime] = None) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(etag, modified))
+
+
+def set_validators(response: Response, etag: str, modified: Optional[datetime] = None) -> None:
+    response.headers.update(validator_headers(etag, modified))
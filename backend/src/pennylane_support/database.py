@@ -1,10 +1,165 @@
-from sqlmodel import SQLModel, create_engine
+"""Database engines, configured from the environment.
 
-sqlite_file_name = "database.db"
-sqlite_url = f"sqlite:///{sqlite_file_name}"
+``DATABASE_URL`` selects the database (default ``sqlite:///database.db``);
+the async engine uses the matching async driver (aiosqlite or asyncpg).
 
-engine = create_engine(sqlite_url)
+SQLite connections are switched to WAL, so readers do not block the
+writer, and wait up to ``SQLITE_BUSY_TIMEOUT_MS`` for the write lock.
+SQLite cannot wait when a transaction that has read tries to start
+writing while another writer is active; it fails with "database is
+locked" at once. Sessions that will write therefore use
+``write_session_maker``, whose transactions take the write lock up front
+with ``BEGIN IMMEDIATE``, and hold ``write_lock`` so that writers in this
+process queue in order instead of polling for the database lock.
+Connection pools are sized by the ``DB_POOL_*`` settings.
+
+``DATABASE_REPLICA_URL`` optionally names a read replica of the database;
+see ``dependencies.SessionRouter`` for which requests it serves.
+"""
+import asyncio
+import contextlib
+import os
+from dataclasses import dataclass, field, replace
+from typing import Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlmodel import create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .migrations import migrate, migrate_async
+
+
+def env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True)
+class DatabaseSettings:
+    url: str = field(default_factory=lambda: os.getenv("DATABASE_URL", "sqlite:///database.db"))
+    echo: bool = field(default_factory=lambda: env_bool("SQL_ECHO", False))
+    # Connection pool
+    pool_size: int = field(default_factory=lambda: int(os.getenv("DB_POOL_SIZE", "10")))
+    max_overflow: int = field(default_factory=lambda: int(os.getenv("DB_MAX_OVERFLOW", "20")))
+    pool_timeout: float = field(default_factory=lambda: float(os.getenv("DB_POOL_TIMEOUT", "30")))
+    pool_recycle: int = field(default_factory=lambda: int(os.getenv("DB_POOL_RECYCLE", "1800")))
+    pool_pre_ping: bool = field(default_factory=lambda: env_bool("DB_POOL_PRE_PING", True))
+    # SQLite
+    busy_timeout_ms: int = field(default_factory=lambda: int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")))
+    synchronous: str = field(default_factory=lambda: os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"))
+    mmap_size: int = field(default_factory=lambda: int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))))
+    # Negative values are KiB, as in PRAGMA cache_size
+    cache_size: int = field(default_factory=lambda: int(os.getenv("SQLITE_CACHE_SIZE", "-65536")))
+    begin: str = field(default_factory=lambda: os.getenv("SQLITE_BEGIN", "DEFERRED").upper())
+
+    @property
+    def is_sqlite(self) -> bool:
+        return make_url(self.url).get_backend_name() == "sqlite"
+
+    @property
+    def is_memory(self) -> bool:
+        return self.is_sqlite and make_url(self.url).database in (None, "", ":memory:")
+
+    @property
+    def async_url(self) -> str:
+        return (
+            self.url
+            .replace("postgresql://", "postgresql+asyncpg://", 1)
+            .replace("sqlite://", "sqlite+aiosqlite://", 1)
+        )
+
+
+def engine_options(settings: DatabaseSettings, **overrides) -> dict:
+    options = {"echo": settings.echo}
+    # In-memory SQLite uses a single connection per thread, without a queue
+    if "poolclass" not in overrides and not settings.is_memory:
+        options.update(
+            pool_size=settings.pool_size,
+            max_overflow=settings.max_overflow,
+            pool_timeout=settings.pool_timeout,
+            pool_recycle=settings.pool_recycle,
+            pool_pre_ping=settings.pool_pre_ping,
+        )
+    return {**options, **overrides}
+
+
+def configure_sqlite(engine: Engine, settings: DatabaseSettings) -> None:
+    """Apply the connection pragmas and take over ``BEGIN`` from the driver."""
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        # Let SQLAlchemy, not the driver, decide when transactions begin
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"PRAGMA busy_timeout = {int(settings.busy_timeout_ms)}")
+            cursor.execute("PRAGMA journal_mode = WAL")
+            cursor.execute(f"PRAGMA synchronous = {settings.synchronous}")
+            cursor.execute(f"PRAGMA mmap_size = {int(settings.mmap_size)}")
+            cursor.execute(f"PRAGMA cache_size = {int(settings.cache_size)}")
+        finally:
+            cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def on_begin(connection):
+        begin = connection.get_execution_options().get("sqlite_begin", settings.begin)
+        connection.exec_driver_sql("BEGIN IMMEDIATE" if begin == "IMMEDIATE" else "BEGIN")
+
+
+def create_database_engine(settings: Optional[DatabaseSettings] = None, **overrides) -> Engine:
+    """A synchronous engine, for scripts and offline tooling."""
+    settings = settings or DatabaseSettings()
+    engine = create_engine(settings.url, **engine_options(settings, **overrides))
+    if settings.is_sqlite:
+        configure_sqlite(engine, settings)
+    return engine
+
+
+def create_async_database_engine(settings: Optional[DatabaseSettings] = None, **overrides) -> AsyncEngine:
+    """An asynchronous engine, for the API."""
+    settings = settings or DatabaseSettings()
+    engine = create_async_engine(settings.async_url, **engine_options(settings, **overrides))
+    if settings.is_sqlite:
+        configure_sqlite(engine.sync_engine, settings)
+    return engine
+
+
+def settings_for(url: str, **changes) -> DatabaseSettings:
+    """The environment's settings, for the database at ``url``."""
+    return replace(DatabaseSettings(), url=url, **changes)
+
+
+def create_session_makers(engine: AsyncEngine) -> Tuple[async_sessionmaker, async_sessionmaker]:
+    """Session factories for read-only and for writing requests."""
+    read = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    write = async_sessionmaker(
+        engine.execution_options(sqlite_begin="IMMEDIATE"), class_=AsyncSession, expire_on_commit=False
+    )
+    return read, write
+
+
+settings = DatabaseSettings()
+
+# Synchronous engine, used by scripts and offline tooling.
+engine = create_database_engine(settings)
+
+# Asynchronous engine, used by the API so queries never block the event loop.
+async_engine = create_async_database_engine(settings)
+async_session_maker, write_session_maker = create_session_makers(async_engine)
+
+# Read replica, if configured; reads fall back to the primary without one
+replica_url = os.getenv("DATABASE_REPLICA_URL")
+replica_engine = create_async_database_engine(settings_for(replica_url)) if replica_url else None
+replica_session_maker = create_session_makers(replica_engine)[0] if replica_engine else None
+
+# SQLite has a single writer; Postgres locks rows, so writers do not queue
+write_lock = asyncio.Lock() if settings.is_sqlite else contextlib.nullcontext()
 
 
 def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+    migrate(engine)
+
+
+async def create_db_and_tables_async():
+    await migrate_async(async_engine)
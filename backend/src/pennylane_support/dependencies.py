@@ -1,10 +1,93 @@
-from sqlmodel import Session
-from .database import engine
+import math
+import os
+import time
+from contextlib import asynccontextmanager, nullcontext
+from typing import AsyncContextManager, AsyncGenerator, AsyncIterator, Dict, Optional
+
+from fastapi import Depends, Response
+from fastapi.requests import HTTPConnection
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+from .coalescer import WriteCoalescer
+from .database import async_session_maker, replica_session_maker, write_lock, write_session_maker
 from .models.user import User, UserRole
 
-def get_session():
-    with Session(engine) as session:
-        yield session
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+LAST_WRITE_COOKIE = "last_write"
+
+
+class SessionRouter:
+    """Chooses the database each request's session talks to.
+
+    Requests that may write use the primary and hold the write lock. Reads
+    use the replica, when there is one, except for users who wrote within
+    the last ``sticky_seconds``: their reads stay on the primary until the
+    replica has caught up, so they always see their own writes. Recent
+    writers are remembered in process and in a cookie, so the next request
+    may land on another worker. Small writes that commit together go
+    through ``coalescer``, on the primary and under the same lock.
+    """
+
+    def __init__(
+        self,
+        read: async_sessionmaker,
+        write: async_sessionmaker,
+        replica: Optional[async_sessionmaker] = None,
+        lock: Optional[AsyncContextManager] = None,
+        sticky_seconds: float = REPLICA_STICKY_SECONDS,
+    ):
+        self.read = read
+        self.write = write
+        self.replica = replica
+        self.lock = lock or nullcontext()
+        self.sticky_seconds = sticky_seconds
+        self.coalescer = WriteCoalescer(write, self.lock)
+        # username -> time of their last write
+        self._writes: Dict[str, float] = {}
+
+    def wrote(self, username: str, response: Response) -> None:
+        now = time.time()
+        self._writes[username] = now
+        if len(self._writes) > 10_000:
+            self._writes = {u: t for u, t in self._writes.items() if now - t < self.sticky_seconds}
+        response.set_cookie(
+            LAST_WRITE_COOKIE, f"{now:.3f}", max_age=math.ceil(self.sticky_seconds), httponly=True, samesite="lax"
+        )
+
+    def last_write(self, connection: HTTPConnection, username: str) -> float:
+        try:
+            cookie = float(connection.cookies.get(LAST_WRITE_COOKIE, 0))
+        except ValueError:
+            cookie = 0
+        return max(self._writes.get(username, 0), cookie)
+
+    def reads_from_primary(self, connection: HTTPConnection, username: str) -> bool:
+        if self.replica is None:
+            return True
+        return time.time() - self.last_write(connection, username) < self.sticky_seconds
+
+    def writer(self, response: Response, username: str) -> WriteCoalescer:
+        if self.replica is not None:
+            self.wrote(username, response)
+        return self.coalescer
+
+    @asynccontextmanager
+    async def session(self, connection: HTTPConnection, response: Response, username: str) -> AsyncIterator[AsyncSession]:
+        if connection.scope.get("method", "GET") not in READ_METHODS:
+            if self.replica is not None:
+                self.wrote(username, response)
+            async with self.lock, self.write() as session:
+                yield session
+        else:
+            maker = self.read if self.reads_from_primary(connection, username) else self.replica
+            async with maker() as session:
+                yield session
+
+
+sessions = SessionRouter(async_session_maker, write_session_maker, replica_session_maker, write_lock)
+
 
 def get_user():
 
@@ -23,3 +106,15 @@ def get_user():
     })
 
     return user
+
+async def get_session(
+    connection: HTTPConnection, response: Response, user: User = Depends(get_user)
+) -> AsyncGenerator[AsyncSession, None]:
+    """A session for the request, from the database ``sessions`` routes it to."""
+    async with sessions.session(connection, response, user.username) as session:
+        yield session
+
+
+def get_coalescer(response: Response, user: User = Depends(get_user)) -> WriteCoalescer:
+    """The coalescer that commits the request's write together with concurrent ones."""
+    return sessions.writer(response, user.username)
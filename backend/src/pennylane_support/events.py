@@ -0,0 +1,304 @@
+"""In-process pub/sub hub for live conversation and inbox events.
+
+Handlers publish events to channels (``conversation:<id>``,
+``inbox:<assignee>``) through the hub. The hub hands them to a backend,
+which assigns each event an increasing id and delivers it back to every
+worker's hub for fanout to local subscribers:
+
+* ``MemoryBackend`` keeps everything in this process.
+* ``DatabaseBackend`` is a local stand-in for a message broker. Events are
+  appended to the ``event_log`` table and each worker polls it, so every
+  worker sees every event.
+
+Handlers that change the database publish through their session. The
+event is then part of the same transaction, as in an outbox: the
+database backend writes it with the change, on the same connection, and
+the memory backend holds it until the transaction commits. Either way
+subscribers never see an event for a change that was rolled back.
+
+Backends keep recent events so that a reconnecting client can resume
+after its ``Last-Event-ID``. Each subscriber has a bounded queue. A
+subscriber that falls behind is disconnected instead of slowing down
+publishers, and it catches up through that same replay when it
+reconnects.
+"""
+import asyncio
+import logging
+import os
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import JSON, Column, DateTime, Integer, MetaData, String, Table, delete, func, insert, select
+from sqlalchemy import event as sa_event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+EVENT_BACKEND = os.getenv("EVENT_BACKEND", "memory")
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "256"))
+EVENT_REPLAY_SIZE = int(os.getenv("EVENT_REPLAY_SIZE", "1000"))
+EVENT_POLL_INTERVAL = float(os.getenv("EVENT_POLL_INTERVAL", "0.25"))
+EVENT_POLL_MAX_BACKOFF = 60.0
+EVENT_RETENTION = timedelta(seconds=float(os.getenv("EVENT_RETENTION_SECONDS", "3600")))
+
+event_log = Table(
+    "event_log",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("channel", String, nullable=False),
+    Column("type", String, nullable=False),
+    Column("data", JSON, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+)
+
+
+def conversation_channel(conversation_id: int) -> str:
+    return f"conversation:{conversation_id}"
+
+
+def inbox_channel(assignee: str) -> str:
+    return f"inbox:{assignee}"
+
+
+@dataclass(frozen=True)
+class Event:
+    id: int
+    channel: str
+    type: str
+    data: Dict[str, Any]
+
+
+class Subscription:
+    """A bounded queue of events for one client, iterated asynchronously."""
+
+    def __init__(self, channel: str, queue_size: int = EVENT_QUEUE_SIZE):
+        self.channel = channel
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.last_id = 0
+        self.closed = False
+
+    def offer(self, event: Event) -> bool:
+        """Queue ``event``; returns False, closing the subscription, when it is full."""
+        if self.closed:
+            return False
+        if event.id <= self.last_id:
+            return True
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.closed = True
+            return False
+        self.last_id = event.id
+        return True
+
+    def close(self) -> None:
+        self.closed = True
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> Event:
+        if self.closed and self.queue.empty():
+            raise StopAsyncIteration
+        event = await self.queue.get()
+        if event is None:
+            raise StopAsyncIteration
+        return event
+
+
+class MemoryBackend:
+    """Delivers events within this process only."""
+
+    def __init__(self, replay_size: int = EVENT_REPLAY_SIZE):
+        self.replay_size = replay_size
+        self._next_id = 0
+        self._recent: Dict[str, Deque[Event]] = {}
+        self._deliver: Optional[Callable[[Event], None]] = None
+
+    async def start(self, deliver: Callable[[Event], None]) -> None:
+        self._deliver = deliver
+
+    async def stop(self) -> None:
+        self._deliver = None
+
+    async def publish(
+        self, channels: Iterable[str], type: str, data: Dict[str, Any], session: Optional[AsyncSession] = None,
+    ) -> None:
+        if session is not None:
+            self._outbox(session.sync_session).append((list(channels), type, data))
+        else:
+            self._emit(channels, type, data)
+
+    def _outbox(self, session: Session) -> list:
+        """Events waiting for ``session``'s transaction to commit."""
+        if "events" not in session.info:
+            session.info["events"] = []
+            sa_event.listen(session, "after_commit", self._commit_outbox)
+            sa_event.listen(session, "after_rollback", lambda s: s.info["events"].clear())
+        return session.info["events"]
+
+    def _commit_outbox(self, session: Session) -> None:
+        events, session.info["events"] = session.info["events"], []
+        for channels, type, data in events:
+            self._emit(channels, type, data)
+
+    def _emit(self, channels: Iterable[str], type: str, data: Dict[str, Any]) -> None:
+        for channel in channels:
+            self._next_id += 1
+            event = Event(self._next_id, channel, type, data)
+            self._recent.setdefault(channel, deque(maxlen=self.replay_size)).append(event)
+            if self._deliver:
+                self._deliver(event)
+
+    async def replay(self, channel: str, after: int) -> List[Event]:
+        return [event for event in self._recent.get(channel, ()) if event.id > after]
+
+
+class DatabaseBackend:
+    """Shares events between workers through the ``event_log`` table."""
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        poll_interval: float = EVENT_POLL_INTERVAL,
+        retention: timedelta = EVENT_RETENTION,
+        replay_size: int = EVENT_REPLAY_SIZE,
+    ):
+        self.engine = engine
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.replay_size = replay_size
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Callable[[Event], None]) -> None:
+        async with self.engine.connect() as connection:
+            last_id = await connection.scalar(select(func.max(event_log.c.id))) or 0
+        self._task = asyncio.create_task(self._poll(deliver, last_id))
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def publish(
+        self, channels: Iterable[str], type: str, data: Dict[str, Any], session: Optional[AsyncSession] = None,
+    ) -> None:
+        now = datetime.now(timezone.utc)
+        rows = [{"channel": channel, "type": type, "data": data, "created_at": now} for channel in channels]
+        if session is not None:
+            # Committed, or rolled back, together with the change it describes
+            await session.exec(insert(event_log), params=rows)
+            return
+        async with self.engine.begin() as connection:
+            await connection.execute(insert(event_log), rows)
+
+    async def replay(self, channel: str, after: int) -> List[Event]:
+        async with self.engine.connect() as connection:
+            rows = (await connection.execute(
+                select(event_log)
+                .where(event_log.c.channel == channel, event_log.c.id > after)
+                .order_by(event_log.c.id)
+                .limit(self.replay_size)
+            )).all()
+        return [Event(row.id, row.channel, row.type, row.data) for row in rows]
+
+    async def _poll(self, deliver: Callable[[Event], None], last_id: int) -> None:
+        polls = 0
+        failures = 0
+        while True:
+            try:
+                async with self.engine.begin() as connection:
+                    rows = (await connection.execute(
+                        select(event_log).where(event_log.c.id > last_id).order_by(event_log.c.id).limit(1000)
+                    )).all()
+                    polls += 1
+                    if polls % 1000 == 0:
+                        cutoff = datetime.now(timezone.utc) - self.retention
+                        await connection.execute(delete(event_log).where(event_log.c.created_at < cutoff))
+                for row in rows:
+                    last_id = row.id
+                    deliver(Event(row.id, row.channel, row.type, row.data))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Polling the event log failed")
+                # Back off while the database is unavailable, up to a minute between attempts
+                failures += 1
+                await asyncio.sleep(min(self.poll_interval * 2 ** failures, EVENT_POLL_MAX_BACKOFF))
+                continue
+            failures = 0
+            if not rows:
+                await asyncio.sleep(self.poll_interval)
+
+
+class Hub:
+    """Fans events out from the backend to this worker's subscribers."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+
+    async def start(self) -> None:
+        await self.backend.start(self._dispatch)
+
+    async def stop(self) -> None:
+        await self.backend.stop()
+        for subscriptions in list(self._subscriptions.values()):
+            for subscription in list(subscriptions):
+                subscription.close()
+        self._subscriptions.clear()
+
+    async def publish(
+        self, channels: Iterable[str], type: str, data: Dict[str, Any], session: Optional[AsyncSession] = None,
+    ) -> None:
+        """Publish an event, in ``session``'s transaction when one is given.
+
+        Pass the session of the change the event describes and publish
+        before committing it.
+        """
+        await self.backend.publish(list(dict.fromkeys(channels)), type, data, session)
+
+    async def subscribe(self, channel: str, last_event_id: Optional[int] = None) -> Subscription:
+        """Subscribe to ``channel``, first queueing the events after ``last_event_id``."""
+        subscription = Subscription(channel)
+        self._subscriptions.setdefault(channel, set()).add(subscription)
+        if last_event_id is not None:
+            for event in await self.backend.replay(channel, last_event_id):
+                if not subscription.offer(event):
+                    break
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.channel)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.channel]
+
+    def _dispatch(self, event: Event) -> None:
+        for subscription in list(self._subscriptions.get(event.channel, ())):
+            if not subscription.offer(event):
+                logger.info(f"Dropping slow subscriber on {event.channel}")
+                self.unsubscribe(subscription)
+
+
+def create_hub() -> Hub:
+    if EVENT_BACKEND == "database":
+        from .database import async_engine
+        return Hub(DatabaseBackend(async_engine))
+    return Hub(MemoryBackend())
+
+
+hub = create_hub()
@@ -0,0 +1,146 @@
+"""Streaming export of conversations with their posts.
+
+The export is a single ``conversation ⟕ post`` query ordered by
+conversation, read with a server-side cursor (``yield_per``). A format
+turns the rows into output incrementally, holding at most one
+conversation's posts, so memory use does not depend on the export size.
+The same query and formats back the ``/export`` endpoint and
+``scripts/export_db.py``.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlmodel import select
+
+from .models.challenge import Challenge
+from .models.conversation import Conversation, ConversationStatus, Post
+
+EXPORT_BATCH_SIZE = 1000
+
+CONVERSATION_COLUMNS = [
+    Conversation.id,
+    Conversation.identifier,
+    Conversation.topic,
+    Conversation.category,
+    Challenge.challenge_id,
+    Conversation.user,
+    Conversation.status,
+    Conversation.assignee,
+    Conversation.priority,
+    Conversation.created_at,
+    Conversation.updated_at,
+]
+
+POST_COLUMNS = [
+    Post.id.label("post_id"),
+    Post.user.label("post_user"),
+    Post.content.label("post_content"),
+    Post.timestamp.label("post_timestamp"),
+]
+
+CONVERSATION_FIELDS = [column.key for column in CONVERSATION_COLUMNS]
+POST_FIELDS = ["id", "user", "content", "timestamp"]
+
+
+def export_conditions(
+    status: Optional[ConversationStatus] = None,
+    challenge_id: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+) -> list:
+    conditions = []
+    if status:
+        conditions.append(Conversation.status == status)
+    if challenge_id:
+        conditions.append(Challenge.challenge_id == challenge_id)
+    if created_after:
+        conditions.append(Conversation.created_at >= created_after)
+    if created_before:
+        conditions.append(Conversation.created_at < created_before)
+    return conditions
+
+
+def select_export(conditions: list):
+    """One row per post (or per conversation without posts), grouped by conversation."""
+    return (
+        select(*CONVERSATION_COLUMNS, *POST_COLUMNS)
+        .join(Challenge, Challenge.id == Conversation.challenge_id)
+        .outerjoin(Post, Post.conversation_id == Conversation.id)
+        .where(*conditions)
+        .order_by(Conversation.id, Post.timestamp, Post.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+
+def plain(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+class NDJSONFormat:
+    """One JSON object per line: a conversation with its ``posts`` array."""
+    media_type = "application/x-ndjson"
+    extension = "ndjson"
+
+    def __init__(self):
+        self._conversation: Optional[Dict[str, Any]] = None
+
+    def header(self) -> str:
+        return ""
+
+    def write(self, rows: Iterable[Any]) -> str:
+        lines: List[str] = []
+        for row in rows:
+            if self._conversation is None or self._conversation["id"] != row.id:
+                if self._conversation is not None:
+                    lines.append(json.dumps(self._conversation))
+                self._conversation = {field: plain(getattr(row, field)) for field in CONVERSATION_FIELDS}
+                self._conversation["posts"] = []
+            if row.post_id is not None:
+                self._conversation["posts"].append(
+                    {field: plain(getattr(row, f"post_{field}")) for field in POST_FIELDS}
+                )
+        return "".join(line + "\n" for line in lines)
+
+    def finish(self) -> str:
+        if self._conversation is None:
+            return ""
+        line, self._conversation = json.dumps(self._conversation) + "\n", None
+        return line
+
+
+class CSVFormat:
+    """One row per post, repeating its conversation's columns."""
+    media_type = "text/csv"
+    extension = "csv"
+
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def _flush(self) -> str:
+        output = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return output
+
+    def header(self) -> str:
+        self._writer.writerow(CONVERSATION_FIELDS + [f"post_{field}" for field in POST_FIELDS])
+        return self._flush()
+
+    def write(self, rows: Iterable[Any]) -> str:
+        self._writer.writerows([plain(value) for value in row] for row in rows)
+        return self._flush()
+
+    def finish(self) -> str:
+        return ""
+
+
+FORMATS = {"ndjson": NDJSONFormat, "csv": CSVFormat}
@@ -1,3 +1,16 @@
+"""Entry point that applies a ``.env`` file before the app reads its settings.
+
+``pennylane_support.app`` itself reads only the process environment, so
+workers started with ``uvicorn pennylane_support.app:app`` (and
+``--env-file``) do not pay for ``dotenv``.
+"""
+from dotenv import load_dotenv
+
+# Before the app is imported, since its modules read the environment then
+load_dotenv()
+
+from .app import app  # noqa: E402
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("pennylane_support.app:app", host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run("pennylane_support.main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,235 @@
+"""Per-route request metrics in the Prometheus text format.
+
+``MetricsMiddleware`` times each request and measures its response body,
+labelled by route template (``/conversations/{conversation_id}``, never
+the raw path). SQLAlchemy cursor events attribute every statement, and
+the time spent in it, to the request that is running. ``render()``
+produces the ``/metrics`` page.
+
+Group commits (see ``coalescer.py``) run outside any request, so their
+size, duration and statements are recorded as metrics of their own.
+
+Setting ``SLOW_REQUEST_SECONDS`` logs each slower request together with
+the statements it executed.
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "0")) or None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 25, 50, 100)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+Labels = Tuple[str, ...]
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Per label set: counts per bucket (non-cumulative, plus +Inf), sum
+        self._series: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        counts, total = self._series.setdefault(labels, ([0] * (len(self.buckets) + 1), [0.0]))
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            base = format_labels(self.labels, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{format_labels(self.labels + ('le',), labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{base} {total[0]}")
+            lines.append(f"{self.name}_count{base} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str]):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._series: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels, value: float = 1) -> None:
+        self._series[labels] = self._series.get(labels, 0) + value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._series.items()):
+            lines.append(f"{self.name}{format_labels(self.labels, labels)} {value}")
+        return lines
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+ROUTE_LABELS = ("method", "route")
+
+requests_total = Counter("http_requests_total", "HTTP requests by route and status code.", ROUTE_LABELS + ("status",))
+request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ROUTE_LABELS, LATENCY_BUCKETS
+)
+response_size = Histogram(
+    "http_response_size_bytes", "HTTP response body size, after compression.", ROUTE_LABELS, SIZE_BUCKETS
+)
+request_statements = Histogram(
+    "http_request_db_statements", "SQL statements executed per request.", ROUTE_LABELS, STATEMENT_BUCKETS
+)
+statements_total = Counter("db_statements_total", "SQL statements executed, by route.", ROUTE_LABELS)
+db_seconds_total = Counter("db_seconds_total", "Time spent executing SQL statements, by route.", ROUTE_LABELS)
+
+write_batch_size = Histogram("db_write_batch_size", "Writes committed per group commit.", (), BATCH_BUCKETS)
+write_batch_duration = Histogram(
+    "db_write_batch_duration_seconds", "Time to run and commit a group commit.", (), LATENCY_BUCKETS
+)
+write_batch_statements = Counter("db_write_batch_statements_total", "SQL statements executed by group commits.", ())
+
+METRICS = [
+    requests_total, request_duration, response_size, request_statements, statements_total, db_seconds_total,
+    write_batch_size, write_batch_duration, write_batch_statements,
+]
+
+# Metrics are updated from the event loop and, for sync engines, threads
+_lock = threading.Lock()
+
+
+@dataclass
+class RequestStats:
+    """The database work of one request."""
+    statements: int = 0
+    db_seconds: float = 0.0
+    # (statement, seconds), only collected when the slow-request log is on
+    log: Optional[List[Tuple[str, float]]] = None
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # On the execution context rather than the connection, so that a failed
+    # statement leaves nothing behind on a pooled connection
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+
+def _record_statement(context, statement: str) -> None:
+    """Charge a finished (or failed) statement to the running request."""
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    context._query_started = None
+    elapsed = time.perf_counter() - started
+    stats = current_request.get()
+    if stats is None:
+        return
+    stats.statements += 1
+    stats.db_seconds += elapsed
+    if stats.log is not None:
+        stats.log.append((statement, elapsed))
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record_statement(context, statement)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # after_cursor_execute does not fire for a statement that raises
+    _record_statement(exception_context.execution_context, exception_context.statement)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the per-route metrics of every HTTP request."""
+
+    def __init__(self, app, slow_request_seconds: Optional[float] = SLOW_REQUEST_SECONDS):
+        self.app = app
+        self.slow_request_seconds = slow_request_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(log=[] if self.slow_request_seconds else None)
+        token = current_request.set(stats)
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+            self.record(scope["method"], route, status, elapsed, size, stats)
+
+    def record(self, method: str, route: str, status: int, elapsed: float, size: int, stats: RequestStats) -> None:
+        labels = (method, route)
+        with _lock:
+            requests_total.inc(labels + (str(status),))
+            request_duration.observe(labels, elapsed)
+            response_size.observe(labels, size)
+            request_statements.observe(labels, stats.statements)
+            statements_total.inc(labels, stats.statements)
+            db_seconds_total.inc(labels, stats.db_seconds)
+
+        if self.slow_request_seconds and elapsed >= self.slow_request_seconds:
+            statements = "\n".join(f"  [{seconds * 1000:.1f}ms] {statement}" for statement, seconds in stats.log)
+            logger.warning(
+                f"Slow request: {method} {route} took {elapsed * 1000:.1f}ms, "
+                f"{stats.statements} statements in {stats.db_seconds * 1000:.1f}ms\n{statements}"
+            )
+
+
+def record_write_batch(writes: int, elapsed: float, stats: RequestStats) -> None:
+    with _lock:
+        write_batch_size.observe((), writes)
+        write_batch_duration.observe((), elapsed)
+        write_batch_statements.inc((), stats.statements)
+
+
+def render() -> str:
+    with _lock:
+        return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+def reset() -> None:
+    with _lock:
+        for metric in METRICS:
+            metric._series.clear()
@@ -0,0 +1,158 @@
+"""Versioned schema migrations.
+
+Each migration is a module in ``versions`` named ``NNNN_description.py``
+that defines ``upgrade(connection)``. Applied versions are recorded in the
+``schema_version`` table, and pending migrations run in order inside a
+single transaction, so an existing database is brought up to date in place.
+That transaction holds a lock, the SQLite write lock (``BEGIN IMMEDIATE``)
+or a Postgres advisory lock, and reads the applied version under it, so
+workers that start together migrate once and the others wait and find
+nothing left to do.
+
+At startup the app only reads the applied version, without inspecting the
+schema or running DDL, and migrates when it is behind. With
+``SCHEMA_ON_STARTUP=verify`` it refuses to start instead, for deployments
+that migrate in a separate step. Migration modules are only imported when
+they are applied.
+"""
+import importlib
+import logging
+import os
+import pkgutil
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from types import ModuleType
+from typing import List, Optional, Tuple
+
+from sqlalchemy import (
+    Column, DateTime, Integer, MetaData, String, Table, func, inspect, select
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from . import versions
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_ON_STARTUP = os.getenv("SCHEMA_ON_STARTUP", "migrate")
+# Key of the Postgres advisory lock held while migrating
+MIGRATION_LOCK_KEY = 0x70656E6E
+
+metadata = MetaData()
+
+schema_version = Table(
+    "schema_version",
+    metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    module: ModuleType
+
+    def upgrade(self, connection: Connection) -> None:
+        self.module.upgrade(connection)
+
+
+def discover() -> List[Tuple[int, str, str]]:
+    """The ``(version, name, module name)`` of each migration in ``versions``, in order."""
+    found = []
+    for info in pkgutil.iter_modules(versions.__path__):
+        number, _, name = info.name.partition("_")
+        if number.isdigit():
+            found.append((int(number), name, info.name))
+    return sorted(found)
+
+
+@lru_cache(maxsize=None)
+def load_migrations() -> List[Migration]:
+    """Import the migrations in ``versions``, ordered by version."""
+    return [
+        Migration(version, name, importlib.import_module(f"{versions.__name__}.{module}"))
+        for version, name, module in discover()
+    ]
+
+
+VERSIONS = discover()
+HEAD = VERSIONS[-1][0] if VERSIONS else 0
+
+
+def current_version(connection: Connection) -> int:
+    """Return the latest applied version, or 0 for an unversioned database."""
+    if not inspect(connection).has_table(schema_version.name):
+        return 0
+    version = connection.scalar(select(schema_version.c.version).order_by(schema_version.c.version.desc()))
+    return version or 0
+
+
+def lock(connection: Connection) -> None:
+    """Keep other processes from migrating until this transaction ends.
+
+    On SQLite, ``migrate`` begins the transaction ``IMMEDIATE``, which
+    already holds the database write lock.
+    """
+    if connection.dialect.name == "postgresql":
+        connection.execute(select(func.pg_advisory_xact_lock(MIGRATION_LOCK_KEY)))
+
+
+def upgrade(connection: Connection, target: Optional[int] = None) -> List[int]:
+    """Apply every pending migration up to ``target`` (default: head)."""
+    lock(connection)
+    metadata.create_all(connection, checkfirst=True)
+    current = current_version(connection)
+    target = HEAD if target is None else target
+
+    applied = []
+    for migration in load_migrations():
+        if current < migration.version <= target:
+            migration.upgrade(connection)
+            connection.execute(schema_version.insert().values(
+                version=migration.version,
+                name=migration.name,
+                applied_at=datetime.now(timezone.utc),
+            ))
+            applied.append(migration.version)
+    return applied
+
+
+def migrate(engine: Engine, target: Optional[int] = None) -> List[int]:
+    with engine.execution_options(sqlite_begin="IMMEDIATE").begin() as connection:
+        return upgrade(connection, target)
+
+
+async def migrate_async(engine: AsyncEngine, target: Optional[int] = None) -> List[int]:
+    async with engine.execution_options(sqlite_begin="IMMEDIATE").begin() as connection:
+        return await connection.run_sync(upgrade, target)
+
+
+def stored_version(connection: Connection) -> int:
+    """Read the applied version with a single query, or 0 if there is none."""
+    try:
+        return connection.scalar(select(func.max(schema_version.c.version))) or 0
+    except (OperationalError, ProgrammingError):
+        # No schema_version table: a new or unversioned database
+        return 0
+
+
+async def ensure_schema_async(engine: AsyncEngine, mode: str = SCHEMA_ON_STARTUP) -> List[int]:
+    """Check the schema version at startup, migrating only when it is behind."""
+    async with engine.connect() as connection:
+        version = await connection.run_sync(stored_version)
+
+    if version > HEAD:
+        logger.warning(f"Database schema version {version} is newer than this release ({HEAD})")
+    if version >= HEAD:
+        return []
+    if mode == "verify":
+        raise RuntimeError(
+            f"Database schema is at version {version}, expected {HEAD}; "
+            "run `python -m pennylane_support.migrations upgrade`"
+        )
+    return await migrate_async(engine)
@@ -0,0 +1,31 @@
+"""Apply or inspect schema migrations.
+
+Usage::
+
+    python -m pennylane_support.migrations upgrade [--target N]
+    python -m pennylane_support.migrations current
+"""
+import argparse
+
+from ..database import engine
+from . import HEAD, current_version, migrate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    upgrade_parser = commands.add_parser("upgrade", help="apply pending migrations")
+    upgrade_parser.add_argument("--target", type=int, default=None, help="version to upgrade to (default: head)")
+    commands.add_parser("current", help="show the applied and head versions")
+    args = parser.parse_args()
+
+    if args.command == "upgrade":
+        applied = migrate(engine, args.target)
+        print(f"Applied migrations: {applied}" if applied else "Database is up to date")
+    else:
+        with engine.connect() as connection:
+            print(f"current: {current_version(connection)}, head: {HEAD}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Baseline schema, as previously created by ``SQLModel.metadata.create_all``.
+
+Tables are created with ``checkfirst`` so databases that were created
+before migrations existed are adopted as-is.
+"""
+from sqlalchemy import (
+    JSON, Column, DateTime, Enum, ForeignKey, Integer, MetaData, String, Table
+)
+from sqlalchemy.engine import Connection
+
+from ...models.challenge import ChallengeDifficulty
+from ...models.conversation import ConversationStatus
+
+metadata = MetaData()
+
+Table(
+    "challenge",
+    metadata,
+    Column("challenge_id", String, nullable=False, unique=True, index=True),
+    Column("title", String, nullable=False),
+    Column("description", String, nullable=False),
+    Column("category", String, nullable=False),
+    Column("difficulty", Enum(ChallengeDifficulty), nullable=False),
+    Column("points", Integer, nullable=False),
+    Column("tags", JSON),
+    Column("learning_objectives", JSON),
+    Column("hints", JSON),
+    Column("id", Integer, primary_key=True),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+Table(
+    "conversation",
+    metadata,
+    Column("challenge_id", Integer, ForeignKey("challenge.id"), nullable=False),
+    Column("topic", String, nullable=False),
+    Column("category", String, nullable=False),
+    Column("user", String, nullable=False),
+    Column("identifier", String, unique=True, index=True),
+    Column("status", Enum(ConversationStatus)),
+    Column("assignee", String),
+    Column("id", Integer, primary_key=True),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+Table(
+    "post",
+    metadata,
+    Column("content", String, nullable=False),
+    Column("user", String, nullable=False),
+    Column("conversation_id", Integer, ForeignKey("conversation.id"), nullable=False),
+    Column("id", Integer, primary_key=True),
+    Column("timestamp", DateTime, nullable=False),
+)
+
+
+def upgrade(connection: Connection) -> None:
+    metadata.create_all(connection, checkfirst=True)
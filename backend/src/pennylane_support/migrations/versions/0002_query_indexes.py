@@ -0,0 +1,30 @@
+"""Composite indexes matching the router queries.
+
+List endpoints filter on one column and order by ``(created_at, id)`` or
+``(timestamp, id)``, so each index leads with the filter column and ends
+with the sort key; keyset pages become a single index range scan.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+INDEXES = {
+    # list_challenges
+    "ix_challenge_category": 'challenge (category)',
+    "ix_challenge_difficulty": 'challenge (difficulty)',
+    # list_conversations, unfiltered and per filter
+    "ix_conversation_created_at": 'conversation (created_at, id)',
+    "ix_conversation_status_created_at": 'conversation (status, created_at, id)',
+    "ix_conversation_category_created_at": 'conversation (category, created_at, id)',
+    "ix_conversation_assignee_created_at": 'conversation (assignee, created_at, id)',
+    # get_challenge_conversations and list_conversations?challenge_id=
+    "ix_conversation_challenge_id_created_at": 'conversation (challenge_id, created_at, id)',
+    # list_user_conversations
+    "ix_conversation_user_created_at": 'conversation ("user", created_at, id)',
+    # list_posts and the conversation summary subqueries
+    "ix_post_conversation_id_timestamp": 'post (conversation_id, timestamp, id)',
+}
+
+
+def upgrade(connection: Connection) -> None:
+    for name, definition in INDEXES.items():
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}"))
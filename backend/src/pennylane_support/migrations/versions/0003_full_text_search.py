@@ -0,0 +1,72 @@
+"""Full-text search over challenges, conversation topics and posts.
+
+SQLite gets one external-content FTS5 table per source table, kept in
+sync by triggers. Postgres gets a stored, generated ``tsvector`` column
+per table with a GIN index. Either way the index is maintained by the
+database on every insert, update and delete, so it never needs a rebuild.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# (table, fts columns)
+SQLITE_SOURCES = {
+    "challenge": ("title", "description", "tags"),
+    "conversation": ("topic",),
+    "post": ("content",),
+}
+
+POSTGRES_VECTORS = {
+    "challenge": (
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(tags::text, '')), 'C')"
+    ),
+    "conversation": "setweight(to_tsvector('english', coalesce(topic, '')), 'A')",
+    "post": "setweight(to_tsvector('english', coalesce(content, '')), 'B')",
+}
+
+
+def upgrade_sqlite(connection: Connection) -> None:
+    for table, columns in SQLITE_SOURCES.items():
+        fts = f"{table}_fts"
+        names = ", ".join(columns)
+        new = ", ".join(f"new.{column}" for column in columns)
+        old = ", ".join(f"old.{column}" for column in columns)
+
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{names}, content='{table}', content_rowid='id', tokenize='porter unicode61')"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new}); END"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old}); END"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {names} ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old}); "
+            f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new}); END"
+        ))
+        # Index rows that existed before this migration
+        connection.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+
+def upgrade_postgresql(connection: Connection) -> None:
+    for table, vector in POSTGRES_VECTORS.items():
+        connection.execute(text(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({vector}) STORED"
+        ))
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING GIN (search_vector)"
+        ))
+
+
+def upgrade(connection: Connection) -> None:
+    if connection.dialect.name == "postgresql":
+        upgrade_postgresql(connection)
+    else:
+        upgrade_sqlite(connection)
@@ -0,0 +1,37 @@
+"""Version counter for the challenge catalog.
+
+Every insert, update or delete on ``challenge`` bumps
+``catalog_version.version`` through a trigger, so each worker can detect
+that its in-memory catalog snapshot is stale with one cheap read, whoever
+made the change.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+
+def upgrade(connection: Connection) -> None:
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS catalog_version ("
+        "id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)"
+    ))
+    connection.execute(text(
+        "INSERT INTO catalog_version (id, version) VALUES (1, 1) ON CONFLICT (id) DO NOTHING"
+    ))
+
+    bump = "UPDATE catalog_version SET version = version + 1 WHERE id = 1"
+    if connection.dialect.name == "postgresql":
+        connection.execute(text(
+            "CREATE OR REPLACE FUNCTION bump_catalog_version() RETURNS trigger AS $$ "
+            f"BEGIN {bump}; RETURN NULL; END $$ LANGUAGE plpgsql"
+        ))
+        connection.execute(text("DROP TRIGGER IF EXISTS challenge_catalog_version ON challenge"))
+        connection.execute(text(
+            "CREATE TRIGGER challenge_catalog_version AFTER INSERT OR UPDATE OR DELETE ON challenge "
+            "FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()"
+        ))
+    else:
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            connection.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS challenge_catalog_version_{event.lower()} "
+                f"AFTER {event} ON challenge BEGIN {bump}; END"
+            ))
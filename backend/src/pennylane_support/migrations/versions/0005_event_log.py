@@ -0,0 +1,26 @@
+"""Event log for the database-backed live event broker.
+
+Each row is one event on one channel. Workers poll for rows past the last
+id they have seen and fan them out to their own subscribers; the ids are
+also the SSE event ids clients resume from.
+"""
+from sqlalchemy import JSON, Column, DateTime, Index, Integer, MetaData, String, Table
+from sqlalchemy.engine import Connection
+
+metadata = MetaData()
+
+Table(
+    "event_log",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("channel", String, nullable=False),
+    Column("type", String, nullable=False),
+    Column("data", JSON, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Index("ix_event_log_channel_id", "channel", "id"),
+    Index("ix_event_log_created_at", "created_at"),
+)
+
+
+def upgrade(connection: Connection) -> None:
+    metadata.create_all(connection, checkfirst=True)
@@ -0,0 +1,25 @@
+"""Priority and claim lease columns for the support work queue.
+
+``POST /queue/claim`` takes the first OPEN conversation that is unassigned
+or whose claim has expired, by ``(priority DESC, created_at, id)``; the
+index serves that order within the OPEN status.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+COLUMNS = {
+    "priority": "INTEGER NOT NULL DEFAULT 0",
+    "claim_expires_at": "TIMESTAMP",
+}
+
+
+def upgrade(connection: Connection) -> None:
+    existing = {column["name"] for column in inspect(connection).get_columns("conversation")}
+    for name, definition in COLUMNS.items():
+        if name not in existing:
+            connection.execute(text(f"ALTER TABLE conversation ADD COLUMN {name} {definition}"))
+
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_conversation_queue "
+        "ON conversation (status, priority DESC, created_at, id)"
+    ))
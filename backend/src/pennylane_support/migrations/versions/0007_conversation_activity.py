@@ -0,0 +1,53 @@
+"""Denormalized post activity on conversations.
+
+``post_count``, ``last_post_at``, ``last_post_user`` and
+``first_response_at`` are backfilled from the posts; from then on post
+writes maintain them (see ``activity.py``). The indexes serve the
+``activity`` and ``replies`` sorts of conversation lists, overall and
+within a status.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+COLUMNS = {
+    "post_count": "INTEGER NOT NULL DEFAULT 0",
+    "last_post_at": "TIMESTAMP",
+    "last_post_user": "VARCHAR",
+    "first_response_at": "TIMESTAMP",
+}
+
+INDEXES = {
+    "ix_conversation_activity": "coalesce(last_post_at, created_at), id",
+    "ix_conversation_status_activity": "status, coalesce(last_post_at, created_at), id",
+    "ix_conversation_post_count": "post_count, id",
+    "ix_conversation_status_post_count": "status, post_count, id",
+}
+
+BACKFILL = """
+UPDATE conversation SET
+    post_count = (SELECT count(post.id) FROM post WHERE post.conversation_id = conversation.id),
+    last_post_at = (
+        SELECT post.timestamp FROM post WHERE post.conversation_id = conversation.id
+        ORDER BY post.timestamp DESC, post.id DESC LIMIT 1
+    ),
+    last_post_user = (
+        SELECT post."user" FROM post WHERE post.conversation_id = conversation.id
+        ORDER BY post.timestamp DESC, post.id DESC LIMIT 1
+    ),
+    first_response_at = (
+        SELECT min(post.timestamp) FROM post
+        WHERE post.conversation_id = conversation.id AND post."user" != conversation."user"
+    )
+"""
+
+
+def upgrade(connection: Connection) -> None:
+    existing = {column["name"] for column in inspect(connection).get_columns("conversation")}
+    missing = {name: definition for name, definition in COLUMNS.items() if name not in existing}
+    for name, definition in missing.items():
+        connection.execute(text(f"ALTER TABLE conversation ADD COLUMN {name} {definition}"))
+    if missing:
+        connection.execute(text(BACKFILL))
+
+    for name, columns in INDEXES.items():
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON conversation ({columns})"))
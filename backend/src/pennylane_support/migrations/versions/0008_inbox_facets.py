@@ -0,0 +1,18 @@
+"""Indexes for the facet counts of the support inbox.
+
+``GET /inbox`` counts conversations grouped by ``(status, category,
+assignee)``, overall or for a challenge. These indexes cover that query,
+so it reads an index alone and groups without sorting.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+INDEXES = {
+    "ix_conversation_facets": "status, category, assignee",
+    "ix_conversation_challenge_id_facets": "challenge_id, status, category, assignee",
+}
+
+
+def upgrade(connection: Connection) -> None:
+    for name, columns in INDEXES.items():
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON conversation ({columns})"))
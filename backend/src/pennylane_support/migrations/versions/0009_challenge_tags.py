@@ -0,0 +1,41 @@
+"""Normalized challenge tags.
+
+``challenge.tags`` stays the JSON list the API returns; ``challenge_tag``
+holds one row per tag, written alongside it, and backs tag filtering and
+tag counts. The primary key serves replacing a challenge's tags, and the
+``(tag, challenge_id)`` index serves lookups and counts by tag.
+"""
+from sqlalchemy import JSON, Column, ForeignKey, Index, Integer, MetaData, String, Table, inspect, select
+from sqlalchemy.engine import Connection
+
+metadata = MetaData()
+
+# Only the columns the backfill reads
+challenge = Table(
+    "challenge",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("tags", JSON),
+)
+
+challenge_tag = Table(
+    "challenge_tag",
+    metadata,
+    Column("challenge_id", Integer, ForeignKey("challenge.id", ondelete="CASCADE"), primary_key=True),
+    Column("tag", String, primary_key=True),
+    Index("ix_challenge_tag_tag", "tag", "challenge_id"),
+)
+
+
+def upgrade(connection: Connection) -> None:
+    if inspect(connection).has_table("challenge_tag"):
+        return
+    challenge_tag.create(connection)
+
+    rows = [
+        {"challenge_id": id, "tag": tag}
+        for id, tags in connection.execute(select(challenge.c.id, challenge.c.tags))
+        for tag in dict.fromkeys(tags or [])
+    ]
+    if rows:
+        connection.execute(challenge_tag.insert(), rows)
@@ -0,0 +1,63 @@
+from enum import Enum
+from typing import Generic, List, Optional, TypeVar
+
+from pydantic import BaseModel, Field
+
+from .conversation import ConversationStatus, ConversationUpdate, PostCreate, PostPublic
+
+T = TypeVar("T")
+
+MAX_BATCH_SIZE = 1000
+
+
+class BatchItemStatus(str, Enum):
+    UPDATED = "updated"
+    CREATED = "created"
+    NOT_FOUND = "not_found"
+
+
+class ConversationFilter(BaseModel):
+    """Selects conversations by the same filters as ``GET /conversations/``."""
+    status: Optional[ConversationStatus] = None
+    category: Optional[str] = None
+    challenge_id: Optional[str] = None
+    assignee: Optional[str] = None
+
+
+class ConversationChanges(ConversationUpdate):
+    """Fields a batch update can set; unset fields are left unchanged."""
+    category: str | None = None
+
+
+class ConversationBatchUpdate(BaseModel):
+    """Apply ``changes`` to the conversations in ``ids`` or matching ``filter``."""
+    ids: Optional[List[int]] = Field(default=None, max_length=MAX_BATCH_SIZE)
+    filter: Optional[ConversationFilter] = None
+    changes: ConversationChanges
+
+
+class BatchPostCreate(PostCreate):
+    conversation_id: int
+
+
+class PostBatchCreate(BaseModel):
+    posts: List[BatchPostCreate] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class ConversationBatchItem(BaseModel):
+    id: int
+    status: BatchItemStatus
+
+
+class PostBatchItem(BaseModel):
+    """Result for the post at ``index`` in the request."""
+    index: int
+    conversation_id: int
+    status: BatchItemStatus
+    post: Optional[PostPublic] = None
+
+
+class BatchResponse(BaseModel, Generic[T]):
+    items: List[T]
+    succeeded: int
+    failed: int
@@ -2,7 +2,7 @@ from typing import List, TYPE_CHECKING
 from enum import Enum
 from datetime import datetime, timezone
 from sqlalchemy.types import JSON
-from sqlmodel import SQLModel, Field, Relationship, Column
+from sqlmodel import SQLModel, Field, Relationship, Column, Index
 
 if TYPE_CHECKING:
     from .conversation import Conversation
@@ -12,6 +12,11 @@ class ChallengeDifficulty(str, Enum):
     INTERMEDIATE = "Intermediate"
     ADVANCED = "Advanced"
 
+class TagMatch(str, Enum):
+    """Whether a tag filter matches challenges with any or all of the tags."""
+    ANY = "any"
+    ALL = "all"
+
 class ChallengeBase(SQLModel):
     """Base schema for a challenge."""
     challenge_id: str = Field(unique=True, index=True)
@@ -26,6 +31,11 @@ class ChallengeBase(SQLModel):
 
 class Challenge(ChallengeBase, table=True):
     """Database model for a challenge."""
+    __table_args__ = (
+        Index("ix_challenge_category", "category"),
+        Index("ix_challenge_difficulty", "difficulty"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(
@@ -35,6 +45,21 @@ class Challenge(ChallengeBase, table=True):
     
     conversations: List["Conversation"] = Relationship(back_populates="challenge")
 
+class ChallengeTag(SQLModel, table=True):
+    """A tag of a challenge, normalized out of ``Challenge.tags`` so it can be indexed."""
+    __tablename__ = "challenge_tag"
+    __table_args__ = (
+        Index("ix_challenge_tag_tag", "tag", "challenge_id"),
+    )
+
+    challenge_id: int = Field(foreign_key="challenge.id", primary_key=True, ondelete="CASCADE")
+    tag: str = Field(primary_key=True)
+
+class TagCount(SQLModel):
+    """Number of challenges with a tag."""
+    tag: str
+    count: int
+
 class ChallengeCreate(ChallengeBase):
     """Schema for creating a new challenge."""
     pass
@@ -1,8 +1,8 @@
-from tkinter.constants import S
 from typing import List, Optional, TYPE_CHECKING
 from enum import Enum
 from datetime import datetime, timezone
-from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import text
+from sqlmodel import SQLModel, Field, Relationship, Index
 
 if TYPE_CHECKING:
     from .challenge import Challenge
@@ -25,6 +25,10 @@ class PostBase(PostCreate):
 
 class Post(PostBase, table=True):
     """Database model for a post in a conversation."""
+    __table_args__ = (
+        Index("ix_post_conversation_id_timestamp", "conversation_id", "timestamp", "id"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     
@@ -47,15 +51,38 @@ class ConversationBase(ConversationCreate):
     identifier: str | None = Field(unique=True, index=True, default=None)
     status: Optional[ConversationStatus] = ConversationStatus.OPEN
     assignee: str | None = None
+    priority: int = 0
+    claim_expires_at: datetime | None = None
 
 class Conversation(ConversationBase, table=True):
     """Database model for a conversation."""
+    __table_args__ = (
+        Index("ix_conversation_created_at", "created_at", "id"),
+        Index("ix_conversation_status_created_at", "status", "created_at", "id"),
+        Index("ix_conversation_category_created_at", "category", "created_at", "id"),
+        Index("ix_conversation_assignee_created_at", "assignee", "created_at", "id"),
+        Index("ix_conversation_challenge_id_created_at", "challenge_id", "created_at", "id"),
+        Index("ix_conversation_user_created_at", "user", "created_at", "id"),
+        Index("ix_conversation_queue", "status", text("priority DESC"), "created_at", "id"),
+        Index("ix_conversation_activity", text("coalesce(last_post_at, created_at)"), "id"),
+        Index("ix_conversation_status_activity", "status", text("coalesce(last_post_at, created_at)"), "id"),
+        Index("ix_conversation_post_count", "post_count", "id"),
+        Index("ix_conversation_status_post_count", "status", "post_count", "id"),
+        Index("ix_conversation_facets", "status", "category", "assignee"),
+        Index("ix_conversation_challenge_id_facets", "challenge_id", "status", "category", "assignee"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc),
         sa_column_kwargs={"onupdate": lambda: datetime.now(timezone.utc)}
     )
+    # Activity of the posts, maintained by every post write (see activity.py)
+    post_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    last_post_at: datetime | None = None
+    last_post_user: str | None = None
+    first_response_at: datetime | None = None
     
     challenge: "Challenge" = Relationship(back_populates="conversations")
     posts: List[Post] = Relationship(
@@ -68,9 +95,31 @@ class ConversationPublic(ConversationBase):
     id: int
     created_at: datetime
     updated_at: datetime
+    post_count: int = 0
+    last_post_at: datetime | None = None
+    last_post_user: str | None = None
+    first_response_at: datetime | None = None
     posts: List[PostPublic] = []
 
+class ConversationSummary(ConversationBase):
+    """Schema for a conversation in list views, without its posts."""
+    id: int
+    created_at: datetime
+    updated_at: datetime
+    post_count: int = 0
+    last_post_at: datetime | None = None
+    last_poster: str | None = None
+    preview: str | None = None
+    first_response_at: datetime | None = None
+
+class ConversationSort(str, Enum):
+    """Orders of conversation lists, all newest or largest first."""
+    CREATED = "created"
+    ACTIVITY = "activity"
+    REPLIES = "replies"
+
 class ConversationUpdate(SQLModel):
     """Schema for updating a conversation."""
     assignee: str | None = None
     status: ConversationStatus | None = None
+    priority: int | None = None
@@ -0,0 +1,30 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from .conversation import ConversationSummary
+from .responses import ListResponse
+
+# The assignee filter value and facet value of conversations without an assignee
+UNASSIGNED = "unassigned"
+
+
+class FacetCount(BaseModel):
+    value: Optional[str]
+    count: int
+
+
+class InboxFacets(BaseModel):
+    """Conversation counts per value of each filter.
+
+    Each facet counts the conversations matching every filter except its
+    own, so selecting a status still shows how many conversations the
+    other statuses hold.
+    """
+    status: List[FacetCount]
+    category: List[FacetCount]
+    assignee: List[FacetCount]
+
+
+class InboxResponse(ListResponse[ConversationSummary]):
+    facets: InboxFacets
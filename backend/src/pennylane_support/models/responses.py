@@ -1,10 +1,11 @@
 from pydantic import BaseModel
-from typing import List, TypeVar, Generic
+from typing import List, Optional, TypeVar, Generic
 
 T = TypeVar("T")
 
 class ListResponse(BaseModel, Generic[T]):
     items: List[T]
-    total: int
+    total: Optional[int]
     offset: int
     limit: int
+    next_cursor: Optional[str] = None
@@ -0,0 +1,25 @@
+from enum import Enum
+from pydantic import BaseModel
+
+
+class SearchType(str, Enum):
+    CHALLENGE = "challenge"
+    CONVERSATION = "conversation"
+    POST = "post"
+
+
+class SearchResult(BaseModel):
+    """A ranked search hit.
+
+    ``challenge_id`` is set for challenges and ``conversation_id`` for
+    conversations and posts, so clients can link to the matching page.
+    ``snippet`` is HTML: the text is escaped and matched terms are
+    wrapped in ``<b>``/``</b>``.
+    """
+    type: SearchType
+    id: int
+    title: str | None = None
+    snippet: str | None = None
+    score: float
+    challenge_id: str | None = None
+    conversation_id: int | None = None
@@ -0,0 +1,104 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+from fastapi import HTTPException
+from sqlalchemy import func, tuple_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .cache import counts
+
+
+SortValue = Union[datetime, int]
+
+
+def encode_cursor(sort: str, value: SortValue, id: int) -> str:
+    """Encode a ``(timestamp, id)`` or ``(count, id)`` sort key as an opaque, URL-safe cursor.
+
+    ``sort`` names the order the key belongs to, so that a cursor is only
+    accepted by the list and sort it came from.
+    """
+    key = value.isoformat() if isinstance(value, datetime) else value
+    payload = json.dumps([sort, key, id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[SortValue, int]:
+    """Decode a cursor produced by ``encode_cursor`` for ``sort`` or raise 400."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, id = json.loads(base64.urlsafe_b64decode(padded))
+        if cursor_sort != sort:
+            raise ValueError(f"cursor of sort {cursor_sort!r}")
+        if isinstance(value, str):
+            return datetime.fromisoformat(value), int(id)
+        return int(value), int(id)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
+
+def keyset(query, timestamp_column, id_column, cursor: Optional[str], sort: str, descending: bool = False):
+    """Order ``query`` by ``(timestamp, id)`` and seek past ``cursor`` if given.
+
+    ``timestamp_column`` may be any sort expression with an index on
+    ``(expression, id)``, such as a count. The row-value comparison lets
+    the database walk that composite index instead of scanning and
+    discarding every row before the page. ``cursor`` must have been
+    encoded for the same ``sort``.
+    """
+    if descending:
+        query = query.order_by(timestamp_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(timestamp_column, id_column)
+
+    if cursor:
+        key = tuple_(timestamp_column, id_column)
+        position = decode_cursor(cursor, sort)
+        query = query.where(key < position if descending else key > position)
+
+    return query
+
+
+def field(row: Any, name: str) -> Any:
+    """A field of a row, which is an object or, on the fast serialization path, a mapping."""
+    return row[name] if isinstance(row, Mapping) else getattr(row, name)
+
+
+def page(
+    rows: Sequence[Any], limit: int, timestamp_field: Union[str, Callable[[Any], SortValue]], sort: str,
+) -> Tuple[List[Any], Optional[str]]:
+    """Trim a ``limit + 1`` result set to ``limit`` rows and build the next cursor.
+
+    ``timestamp_field`` names the field holding the sort value, or computes
+    it from a row; ``sort`` is passed on to ``encode_cursor``.
+    """
+    items = list(rows[:limit])
+    if len(rows) <= limit or not items:
+        return items, None
+
+    last = items[-1]
+    if callable(timestamp_field):
+        return items, encode_cursor(sort, timestamp_field(last), field(last, "id"))
+    return items, encode_cursor(sort, field(last, timestamp_field), field(last, "id"))
+
+
+async def count_total(
+    session: AsyncSession,
+    model,
+    conditions: Sequence[Any],
+    scope: str,
+    filters: Dict[str, Any],
+) -> int:
+    """Count the rows of ``model`` matching ``conditions``, through the count cache.
+
+    ``conditions`` must be the same predicates as the item query, and
+    ``filters`` the request parameters they were built from.
+    """
+    async def count() -> int:
+        return await session.scalar(
+            select(func.count()).select_from(model).where(*conditions)
+        ) or 0
+
+    return await counts.get_or_count(scope, filters, count)
@@ -0,0 +1,158 @@
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import insert, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..activity import refresh_activity
+from ..cache import counts
+from ..dependencies import get_session, get_user
+from ..events import conversation_channel, hub, inbox_channel
+from ..models.batch import (
+    BatchItemStatus, BatchResponse, ConversationBatchItem, ConversationBatchUpdate,
+    PostBatchCreate, PostBatchItem,
+)
+from ..models.conversation import Conversation, Post, PostPublic
+from ..models.user import User, UserRole
+from .conversations import conversation_conditions
+
+router = APIRouter(
+    prefix="/conversations/batch",
+    tags=["batch"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+@router.patch("", response_model=BatchResponse[ConversationBatchItem])
+async def update_conversations(
+    *,
+    user: User = Depends(get_user),
+    session: AsyncSession = Depends(get_session),
+    batch: ConversationBatchUpdate,
+):
+    """Update the status, assignee, priority or category of many conversations.
+
+    Conversations are selected by ``ids`` or by ``filter`` (exactly one of
+    them). The whole batch is a single ``UPDATE ... RETURNING``, preceded
+    by a read of the current assignees when they change; with ``ids``, the
+    ids that matched nothing are reported as ``not_found``.
+    """
+    if user.role != UserRole.SUPPORT:
+        raise HTTPException(status_code=403, detail="User is not authorized to update these conversations")
+    if (batch.ids is None) == (batch.filter is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of ids or filter")
+
+    changes = batch.changes.model_dump(exclude_unset=True)
+    if not changes:
+        raise HTTPException(status_code=400, detail="No changes given")
+    if "assignee" in changes:
+        changes["claim_expires_at"] = None
+
+    if batch.ids is not None:
+        conditions = [Conversation.id.in_(batch.ids)]
+    else:
+        criteria = batch.filter.model_dump(exclude_none=True)
+        if not criteria:
+            raise HTTPException(status_code=400, detail="Filter must not be empty")
+        conditions = conversation_conditions(
+            criteria.get("status"), criteria.get("category"), criteria.get("challenge_id")
+        )
+        if "assignee" in criteria:
+            conditions.append(Conversation.assignee == criteria["assignee"])
+
+    previous_assignees = {}
+    if "assignee" in changes:
+        # Reassigned conversations also leave their previous assignee's inbox
+        previous_assignees = dict((await session.exec(
+            select(Conversation.id, Conversation.assignee).where(*conditions).with_for_update()
+        )).all())
+
+    now = datetime.now(timezone.utc)
+    updated = (await session.exec(
+        update(Conversation)
+        .where(*conditions)
+        .values(**changes, updated_at=now)
+        .returning(Conversation)
+        .execution_options(synchronize_session=False)
+    )).scalars().all()
+
+    for conversation in updated:
+        channels = [conversation_channel(conversation.id)]
+        channels += [
+            inbox_channel(a) for a in (conversation.assignee, previous_assignees.get(conversation.id)) if a
+        ]
+        await hub.publish(channels, "conversation.updated", conversation.model_dump(mode="json"), session)
+    await session.commit()
+    counts.invalidate("conversations")
+
+    updated_ids = {conversation.id for conversation in updated}
+    requested = batch.ids if batch.ids is not None else sorted(updated_ids)
+    items = [
+        ConversationBatchItem(
+            id=id, status=BatchItemStatus.UPDATED if id in updated_ids else BatchItemStatus.NOT_FOUND
+        )
+        for id in dict.fromkeys(requested)
+    ]
+    return BatchResponse[ConversationBatchItem](
+        items=items, succeeded=len(updated_ids), failed=len(items) - len(updated_ids)
+    )
+
+
+@router.post("/posts", response_model=BatchResponse[PostBatchItem])
+async def create_posts(
+    *,
+    user: User = Depends(get_user),
+    session: AsyncSession = Depends(get_session),
+    batch: PostBatchCreate,
+):
+    """Add posts to many conversations in one transaction.
+
+    Posts for conversations that do not exist are reported as
+    ``not_found``; the rest are inserted with a single multi-row
+    ``INSERT``, and their conversations' activity and ``updated_at``
+    refreshed by one ``UPDATE``.
+    """
+    conversation_ids = {post.conversation_id for post in batch.posts}
+    assignees = dict((await session.exec(
+        select(Conversation.id, Conversation.assignee).where(Conversation.id.in_(conversation_ids))
+    )).all())
+
+    now = datetime.now(timezone.utc)
+    accepted = [post for post in batch.posts if post.conversation_id in assignees]
+    created = []
+    if accepted:
+        created = (await session.exec(
+            insert(Post).returning(Post, sort_by_parameter_order=True),
+            params=[
+                {**post.model_dump(), "user": user.username, "timestamp": now}
+                for post in accepted
+            ],
+        )).scalars().all()
+        await session.exec(refresh_activity(
+            Conversation.id.in_({post.conversation_id for post in accepted}), updated_at=now
+        ))
+
+    created_posts = iter(created)
+    items = []
+    for index, post in enumerate(batch.posts):
+        if post.conversation_id not in assignees:
+            items.append(PostBatchItem(
+                index=index, conversation_id=post.conversation_id, status=BatchItemStatus.NOT_FOUND
+            ))
+            continue
+
+        public = PostPublic.model_validate(next(created_posts))
+        items.append(PostBatchItem(
+            index=index, conversation_id=post.conversation_id, status=BatchItemStatus.CREATED, post=public
+        ))
+        channels = [conversation_channel(post.conversation_id)]
+        if assignees[post.conversation_id]:
+            channels.append(inbox_channel(assignees[post.conversation_id]))
+        await hub.publish(channels, "post.created", public.model_dump(mode="json"), session)
+    await session.commit()
+    counts.invalidate("conversations", "posts")
+
+    return BatchResponse[PostBatchItem](
+        items=items, succeeded=len(created), failed=len(batch.posts) - len(created)
+    )
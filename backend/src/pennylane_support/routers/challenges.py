@@ -1,15 +1,25 @@
-from typing import Optional
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import func
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import delete
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from .. import serialization
+from ..catalog import catalog
+from ..conditional import is_not_modified, make_etag, not_modified, set_validators
 from ..dependencies import get_session
 from ..models.challenge import (
-    Challenge, ChallengeCreate, ChallengePublic, ChallengeUpdate, ChallengeDifficulty
+    Challenge, ChallengeCreate, ChallengePublic, ChallengeTag, ChallengeUpdate, ChallengeDifficulty,
+    TagCount, TagMatch,
 )
-from ..models.conversation import Conversation, ConversationPublic
+from ..models.conversation import Conversation, ConversationSummary
 from ..models.responses import ListResponse
+from ..cache import counts
+from ..pagination import count_total
+from ..tags import replace_tags
+from .conversations import summary_page
 
 router = APIRouter(
     prefix="/challenges",
@@ -17,123 +27,204 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+async def get_challenge(session: AsyncSession, challenge_id: str) -> Challenge:
+    """Load a challenge from the database for writing, or raise 404."""
+    challenge = (await session.exec(
+        select(Challenge)
+        .where(Challenge.challenge_id == challenge_id)
+    )).first()
+
+    if not challenge:
+        raise HTTPException(status_code=404, detail="Challenge not found")
+
+    return challenge
+
+async def find_challenge(session: AsyncSession, challenge_id: str) -> ChallengePublic:
+    """Look up a challenge in the catalog snapshot, or raise 404."""
+    snapshot = await catalog.get(session)
+    challenge = snapshot.by_challenge_id.get(challenge_id)
+
+    if not challenge:
+        raise HTTPException(status_code=404, detail="Challenge not found")
+
+    return challenge
+
 @router.get("/", response_model=ListResponse[ChallengePublic])
 async def list_challenges(
     *,
-    session: Session = Depends(get_session),
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
     offset: int = 0,
     limit: int = Query(default=20, le=100),
     difficulty: Optional[ChallengeDifficulty] = None,
     category: Optional[str] = None,
+    tags: List[str] = Query(default=[]),
+    match: TagMatch = TagMatch.ANY,
+    include_total: bool = True,
 ):
-    """List all challenges with optional filtering and pagination."""
-    query = select(Challenge)
-    
-    if difficulty:
-        query = query.where(Challenge.difficulty == difficulty)
-    if category:
-        query = query.where(Challenge.category == category)
-    
-    total = session.scalar(select(func.count()).select_from(Challenge)) or 0    
-    items = session.exec(query.offset(offset).limit(limit)).all()
+    """List all challenges with optional filtering and pagination.
+
+    ``tags`` (repeatable) matches challenges with any of the tags, or all
+    of them with ``match=all``. Served from the in-memory catalog snapshot,
+    whose version is the ETag, and whose challenges are already serialized.
+    """
+    snapshot = await catalog.get(session)
+    etag = make_etag("challenges", snapshot.version)
+    if is_not_modified(request, etag, snapshot.built_at):
+        return not_modified(etag, snapshot.built_at)
+    set_validators(response, etag, snapshot.built_at)
+
+    challenges = snapshot.filter(difficulty, category, tags, match)
+    if serialization.FAST:
+        return serialization.list_response(
+            response,
+            [snapshot.documents[challenge.id] for challenge in challenges[offset:offset + limit]],
+            total=len(challenges) if include_total else None,
+            offset=offset,
+            limit=limit,
+        )
     
-    return ListResponse[Challenge](
-        items=items,
-        total=total,
+    return ListResponse[ChallengePublic](
+        items=challenges[offset:offset + limit],
+        total=len(challenges) if include_total else None,
         offset=offset,
         limit=limit,
     )
 
+@router.get("/tags", response_model=List[TagCount])
+async def list_tags(
+    *,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
+    difficulty: Optional[ChallengeDifficulty] = None,
+    category: Optional[str] = None,
+    tags: List[str] = Query(default=[]),
+    match: TagMatch = TagMatch.ANY,
+):
+    """Count the challenges per tag, most used first.
+
+    Takes the filters of ``GET /challenges/`` and counts only the
+    challenges matching them. Served from the catalog snapshot.
+    """
+    snapshot = await catalog.get(session)
+    etag = make_etag("tags", snapshot.version)
+    if is_not_modified(request, etag, snapshot.built_at):
+        return not_modified(etag, snapshot.built_at)
+    set_validators(response, etag, snapshot.built_at)
+
+    tag_counts = snapshot.tag_counts(snapshot.filter(difficulty, category, tags, match))
+    return [TagCount(tag=tag, count=count) for tag, count in tag_counts]
+
 @router.post("/", response_model=ChallengePublic, status_code=status.HTTP_201_CREATED)
 async def create_challenge(
     *,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     challenge: ChallengeCreate,
 ):
     """Create a new coding challenge."""
     db_challenge = Challenge.model_validate(challenge)
     session.add(db_challenge)
-    session.commit()
-    session.refresh(db_challenge)
+    await session.flush()
+    await replace_tags(session, db_challenge.id, db_challenge.tags, new=True)
+    await session.commit()
+    await session.refresh(db_challenge)
+    await catalog.rebuild(session)
     return db_challenge
 
 @router.get("/{challenge_id}", response_model=ChallengePublic)
 async def read_challenge(
     *,
-    session: Session = Depends(get_session),
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
     challenge_id: str,
 ):
-    """Get a single challenge by ID."""
-    challenge = session.exec(
-        select(Challenge)
-        .where(Challenge.challenge_id == challenge_id)
-    ).first()
-    
-    if not challenge:
-        raise HTTPException(status_code=404, detail="Challenge not found")
+    """Get a single challenge by ID, from the in-memory catalog snapshot."""
+    challenge = await find_challenge(session, challenge_id)
+
+    etag = make_etag("challenge", challenge.id, challenge.updated_at)
+    if is_not_modified(request, etag, challenge.updated_at):
+        return not_modified(etag, challenge.updated_at)
+    set_validators(response, etag, challenge.updated_at)
         
     return challenge
 
 @router.patch("/{challenge_id}", response_model=ChallengePublic)
 async def update_challenge(
     *,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     challenge_id: str,
     challenge: ChallengeUpdate,
 ):
     """Update a challenge's metadata."""
-    db_challenge = await read_challenge(session=session, challenge_id=challenge_id)
+    db_challenge = await get_challenge(session, challenge_id)
     
     update_data = challenge.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_challenge, key, value)
     
     session.add(db_challenge)
-    session.commit()
-    session.refresh(db_challenge)
+    if "tags" in update_data:
+        await replace_tags(session, db_challenge.id, db_challenge.tags)
+    await session.commit()
+    await session.refresh(db_challenge)
+    await catalog.rebuild(session)
     return db_challenge
 
 @router.delete("/{challenge_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_challenge(
     *,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     challenge_id: str,
 ):
     """Delete a challenge."""
-    challenge = await read_challenge(session=session, challenge_id=challenge_id)
-    session.delete(challenge)
-    session.commit()
+    # Conversations are loaded up front so the relationship is updated
+    # without an implicit (blocking) lazy load during the flush.
+    challenge = (await session.exec(
+        select(Challenge)
+        .where(Challenge.challenge_id == challenge_id)
+        .options(selectinload(Challenge.conversations))
+    )).first()
+
+    if not challenge:
+        raise HTTPException(status_code=404, detail="Challenge not found")
+
+    await session.exec(delete(ChallengeTag).where(ChallengeTag.challenge_id == challenge.id))
+    await session.delete(challenge)
+    await session.commit()
+    counts.invalidate("conversations", "posts")
+    await catalog.rebuild(session)
     return {"ok": True}
 
-@router.get("/{challenge_id}/conversations", response_model=ListResponse[ConversationPublic])
+@router.get("/{challenge_id}/conversations", response_model=ListResponse[ConversationSummary])
 async def get_challenge_conversations(
     *,
-    session: Session = Depends(get_session),
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
     challenge_id: str,
     offset: int = 0,
     limit: int = Query(default=20, le=100),
+    cursor: Optional[str] = None,
+    include_total: bool = True,
 ):
-    """Get all conversations for a specific challenge with pagination."""
-    challenge = await read_challenge(session=session, challenge_id=challenge_id)
-    
-    total = session.scalar(
-        select(func.count()).select_from(Conversation)
-        .where(Conversation.challenge_id == challenge.id)
-    ) or 0
-
-    query = (
-        select(Conversation)
-        .where(Conversation.challenge_id == challenge.id)
-        .order_by(Conversation.created_at.desc())
-        .offset(offset)
-        .limit(limit)
-    )
+    """Get all conversations for a specific challenge with pagination.
 
-    items = session.exec(query).all()
+    Pass the ``next_cursor`` of a previous page as ``cursor`` to seek by
+    ``(created_at, id)`` instead of ``offset``.
+    """
+    challenge = await find_challenge(session, challenge_id)
+    conditions = [Conversation.challenge_id == challenge.id]
     
-    return ListResponse(
-        items=items,
-        total=total,
-        offset=offset,
-        limit=limit,
+    total = None
+    if include_total:
+        total = await count_total(
+            session, Conversation, conditions, "conversations", {"challenge_id": challenge_id},
+        )
+
+    return await summary_page(
+        session, request, response, conditions,
+        offset=offset, limit=limit, cursor=cursor, total=total,
     )
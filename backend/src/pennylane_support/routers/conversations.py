@@ -1,19 +1,29 @@
 from datetime import datetime, timezone
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
 from sqlalchemy import func
 from sqlalchemy.orm import selectinload
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from ..dependencies import get_session, get_user
+from .. import serialization
+from ..coalescer import WriteCoalescer
+from ..dependencies import get_coalescer, get_session, get_user
 from ..models.challenge import Challenge
 from ..models.conversation import (
-    Conversation, ConversationCreate, ConversationPublic, ConversationUpdate,
-    Post, PostCreate, PostPublic, ConversationStatus
+    Conversation, ConversationCreate, ConversationPublic, ConversationSummary,
+    ConversationUpdate, Post, PostCreate, PostPublic, ConversationSort, ConversationStatus
 )
 from ..models.responses import ListResponse
 from ..models.user import User, UserRole
+from ..cache import counts
+from ..events import conversation_channel, hub, inbox_channel
+from ..conditional import (
+    has_preconditions, is_not_modified, make_etag, not_modified, set_validators, utc
+)
+from ..activity import ACTIVITY, record_post, refresh_activity
+from ..pagination import count_total, field, keyset, page
 
 router = APIRouter(
     prefix="/conversations",
@@ -21,108 +31,327 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-def get_conversation(session: Session, conversation_id: int) -> Conversation:
+async def get_conversation(session: AsyncSession, conversation_id: int) -> Conversation:
     """Get a conversation by ID or raise 404 if not found."""
-    conversation = session.get(Conversation, conversation_id)
+    conversation = await session.get(Conversation, conversation_id)
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
     return conversation
 
-@router.get("/", response_model=ListResponse[ConversationPublic])
-async def list_conversations(
-    *,
-    session: Session = Depends(get_session),
-    offset: int = 0,
-    limit: int = Query(default=20, le=100),
+async def load_conversation(session: AsyncSession, conversation_id: int) -> Conversation:
+    """Get a conversation with all its posts or raise 404 if not found."""
+    conversation = (await session.exec(
+        select(Conversation)
+        .where(Conversation.id == conversation_id)
+        .options(selectinload(Conversation.posts))
+    )).first()
+    
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+        
+    return conversation
+
+PREVIEW_LENGTH = 200
+
+def post_preview():
+    """The start of a conversation's first post, as a correlated subquery.
+
+    The other summary fields are stored on the conversation; the preview
+    only runs for the rows on the page.
+    """
+    return (
+        select(func.substr(Post.content, 1, PREVIEW_LENGTH))
+        .where(Post.conversation_id == Conversation.id)
+        .order_by(Post.timestamp, Post.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+
+def select_conversation_summaries():
+    """Select conversations along with the preview of their posts."""
+    return select(Conversation, post_preview().label("preview"))
+
+SUMMARY_COLUMNS = serialization.columns(
+    ConversationSummary, Conversation.__table__,
+    last_poster=Conversation.last_post_user, preview=post_preview(),
+)
+POST_COLUMNS = serialization.columns(PostPublic, Post.__table__)
+
+def select_summary_rows():
+    """Select summaries as plain rows, in ``ConversationSummary`` field order."""
+    return select(*SUMMARY_COLUMNS)
+
+# Sort expression of each order, and its value for a row of the page
+SORT_KEYS = {
+    ConversationSort.CREATED: (Conversation.created_at, lambda row: field(row, "created_at")),
+    ConversationSort.ACTIVITY: (ACTIVITY, lambda row: field(row, "last_post_at") or field(row, "created_at")),
+    ConversationSort.REPLIES: (Conversation.post_count, lambda row: field(row, "post_count")),
+}
+# Name of the order of post lists in their cursors
+POST_SORT = "posts"
+
+def conversation_conditions(
     status: Optional[ConversationStatus] = None,
     category: Optional[str] = None,
     challenge_id: Optional[str] = None,
-):
-    """List all support conversations with optional filtering."""
-    query = select(Conversation)
-    
+    active_since: Optional[datetime] = None,
+    answered: Optional[bool] = None,
+    min_posts: Optional[int] = None,
+) -> list:
+    """Build the filter predicates shared by the item and total queries."""
+    conditions = []
     if status:
-        query = query.where(Conversation.status == status)
+        conditions.append(Conversation.status == status)
     if category:
-        query = query.where(Conversation.category == category)
+        conditions.append(Conversation.category == category)
     if challenge_id:
-        query = query.join(Challenge).where(Challenge.challenge_id == challenge_id)
-    
-    # Get total count for pagination
-    total = session.scalar(select(func.count()).select_from(Conversation)) or 0
-    items = session.exec(query.offset(offset).limit(limit)).all()
-    
-    return ListResponse[ConversationPublic](
+        conditions.append(
+            Conversation.challenge_id == select(Challenge.id)
+            .where(Challenge.challenge_id == challenge_id)
+            .scalar_subquery()
+        )
+    if active_since:
+        conditions.append(ACTIVITY >= utc(active_since))
+    if answered is not None:
+        conditions.append(
+            Conversation.first_response_at.is_not(None) if answered
+            else Conversation.first_response_at.is_(None)
+        )
+    if min_posts:
+        conditions.append(Conversation.post_count >= min_posts)
+    return conditions
+
+def to_summary(row) -> ConversationSummary:
+    """Build a summary from a row of ``select_conversation_summaries``."""
+    conversation, preview = row
+    return ConversationSummary(
+        **conversation.model_dump(),
+        last_poster=conversation.last_post_user,
+        preview=preview,
+    )
+
+def page_etag(versions, total: Optional[int], fields: Optional[dict] = None) -> str:
+    """ETag of a page, from the ``(id, updated_at)`` of its rows and the total.
+
+    Extra ``fields`` of the response (the inbox facets) are part of it too.
+    Pages have no Last-Modified: a row that leaves a filtered page takes its
+    ``updated_at`` with it, so no date of the remaining rows could tell.
+    """
+    versions = [tuple(version) for version in versions]
+    return make_etag("conversations", total, *([fields] if fields else []), *versions)
+
+async def summary_page(
+    session: AsyncSession,
+    request: Request,
+    response: Response,
+    conditions: list,
+    *,
+    offset: int,
+    limit: int,
+    cursor: Optional[str],
+    total: Optional[int],
+    sort: ConversationSort = ConversationSort.CREATED,
+    response_model: type[ListResponse] = ListResponse[ConversationSummary],
+    **fields,
+):
+    """Fetch a page of conversation summaries, answering conditional requests.
+
+    A conditional request is first checked against the ``(id, updated_at)``
+    of the page's rows, which the conversation indexes answer on their own;
+    the post previews only run when the page has changed. ``fields`` are
+    the extra fields of ``response_model``, as plain data, and are part of
+    the ETag.
+    """
+    sort_column, sort_value = SORT_KEYS[sort]
+
+    def paged(query):
+        query = keyset(
+            query.where(*conditions), sort_column, Conversation.id, cursor, sort.value, descending=True
+        )
+        if not cursor:
+            query = query.offset(offset)
+        return query.limit(limit + 1)
+
+    if has_preconditions(request):
+        versions = (await session.exec(paged(select(Conversation.id, Conversation.updated_at)))).all()
+        etag = page_etag(versions, total, fields)
+        if is_not_modified(request, etag):
+            return not_modified(etag)
+
+    if serialization.FAST:
+        rows = [dict(row) for row in (await session.exec(paged(select_summary_rows()))).mappings()]
+        set_validators(response, page_etag([(row["id"], row["updated_at"]) for row in rows], total, fields))
+        items, next_cursor = page(rows, limit, sort_value, sort.value)
+        return serialization.list_response(
+            response, items, total=total, offset=0 if cursor else offset, limit=limit,
+            next_cursor=next_cursor, **fields,
+        )
+
+    rows = (await session.exec(paged(select_conversation_summaries()))).all()
+    summaries = [to_summary(row) for row in rows]
+    set_validators(response, page_etag(
+        [(summary.id, summary.updated_at) for summary in summaries], total, fields
+    ))
+    items, next_cursor = page(summaries, limit, sort_value, sort.value)
+
+    return response_model(
         items=items,
         total=total,
-        offset=offset,
+        offset=0 if cursor else offset,
         limit=limit,
+        next_cursor=next_cursor,
+        **fields,
     )
 
-@router.get("/user", response_model=ListResponse[ConversationPublic])
+@router.get("/", response_model=ListResponse[ConversationSummary])
+async def list_conversations(
+    *,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
+    offset: int = 0,
+    limit: int = Query(default=20, le=100),
+    cursor: Optional[str] = None,
+    status: Optional[ConversationStatus] = None,
+    category: Optional[str] = None,
+    challenge_id: Optional[str] = None,
+    active_since: Optional[datetime] = None,
+    answered: Optional[bool] = None,
+    min_posts: Optional[int] = None,
+    sort: ConversationSort = ConversationSort.CREATED,
+    include_total: bool = True,
+):
+    """List all support conversations with optional filtering.
+
+    ``sort`` orders newest first by ``created`` (the default), by
+    ``activity`` (the last post, or creation for conversations without
+    posts) or by ``replies`` (the number of posts). ``active_since``,
+    ``answered`` (whether anyone other than the author has posted) and
+    ``min_posts`` filter on the same activity.
+
+    Pass the ``next_cursor`` of a previous page as ``cursor`` to seek by
+    the sort key and id instead of ``offset``; a cursor is only valid for
+    the ``sort`` it came from. Infinite-scroll clients can skip the total
+    with ``include_total=false``.
+    """
+    conditions = conversation_conditions(
+        status, category, challenge_id, active_since, answered, min_posts
+    )
+
+    # Get total count for pagination
+    total = None
+    if include_total:
+        total = await count_total(
+            session, Conversation, conditions, "conversations",
+            {
+                "status": status, "category": category, "challenge_id": challenge_id,
+                "active_since": active_since, "answered": answered, "min_posts": min_posts,
+            },
+        )
+
+    return await summary_page(
+        session, request, response, conditions,
+        offset=offset, limit=limit, cursor=cursor, total=total, sort=sort,
+    )
+
+@router.get("/user", response_model=ListResponse[ConversationSummary])
 async def list_user_conversations(
     *,
-    session: Session = Depends(get_session),
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
     offset: int = 0,
     limit: int = Query(default=20, le=100),
+    cursor: Optional[str] = None,
+    include_total: bool = True,
     user: User = Depends(get_user),
 ):
-    query = select(Conversation).where(Conversation.user == user.username)
-    total = session.scalar(select(func.count()).select_from(Conversation).where(Conversation.user == user.username)) or 0
-    items = session.exec(query.offset(offset).limit(limit)).all()
-    
-    return ListResponse[ConversationPublic](
-        items=items,
-        total=total,
-        offset=offset,
-        limit=limit,
+    conditions = [Conversation.user == user.username]
+    total = None
+    if include_total:
+        total = await count_total(
+            session, Conversation, conditions, "conversations", {"user": user.username}
+        )
+
+    return await summary_page(
+        session, request, response, conditions,
+        offset=offset, limit=limit, cursor=cursor, total=total,
     )
 
 @router.post("/", response_model=ConversationPublic, status_code=status.HTTP_201_CREATED)
 async def create_conversation(
     *,
     user: User = Depends(get_user),
-    session: Session = Depends(get_session),
+    coalescer: WriteCoalescer = Depends(get_coalescer),
     conversation: ConversationCreate,
 ):
-    """Create a new support conversation."""
+    """Create a new support conversation.
 
-    challenge = session.get(Challenge, conversation.challenge_id)
-    if not challenge:
-        raise HTTPException(status_code=404, detail="Challenge not found")
-    
-    db_conversation = Conversation.model_validate(
-        {**conversation.model_dump(), "user": user.username}
-    )
+    The insert is committed together with concurrent post and conversation
+    writes (see ``coalescer.py``).
+    """
 
-    session.add(db_conversation)
-    session.commit()
-    session.refresh(db_conversation)
+    async def write(session: AsyncSession) -> Conversation:
+        challenge = await session.get(Challenge, conversation.challenge_id)
+        if not challenge:
+            raise HTTPException(status_code=404, detail="Challenge not found")
+
+        db_conversation = Conversation.model_validate(
+            {**conversation.model_dump(), "user": user.username}
+        )
+        session.add(db_conversation)
+        await session.flush()
+        await session.refresh(db_conversation, ["posts"])
+        return db_conversation
+
+    db_conversation = await coalescer.submit(write)
+    counts.invalidate("conversations")
     return db_conversation
 
+def conversation_etag(conversation_id: int, updated_at: datetime, post_count: int, last_post_id: Optional[int]) -> str:
+    return make_etag("conversation", conversation_id, updated_at, post_count, last_post_id)
+
 @router.get("/{conversation_id}", response_model=ConversationPublic)
 async def read_conversation(
     *,
-    session: Session = Depends(get_session),
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
     conversation_id: int,
 ):
-    """Get a single conversation by ID with all its posts."""
-    conversation = session.exec(
-        select(Conversation)
-        .where(Conversation.id == conversation_id)
-        .options(selectinload(Conversation.posts))
-    ).first()
-    
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
-        
+    """Get a single conversation by ID with all its posts.
+
+    Conditional requests are answered from the conversation's version
+    (``updated_at`` plus the count and last id of its posts), without
+    loading the posts.
+    """
+    if has_preconditions(request):
+        version = (await session.exec(
+            select(Conversation.updated_at, func.count(Post.id), func.max(Post.id))
+            .outerjoin(Post, Post.conversation_id == Conversation.id)
+            .where(Conversation.id == conversation_id)
+            .group_by(Conversation.id)
+        )).first()
+        if version:
+            etag = conversation_etag(conversation_id, *version)
+            if is_not_modified(request, etag, version[0]):
+                return not_modified(etag, version[0])
+
+    conversation = await load_conversation(session, conversation_id)
+    etag = conversation_etag(
+        conversation.id,
+        conversation.updated_at,
+        len(conversation.posts),
+        max((post.id for post in conversation.posts), default=None),
+    )
+    set_validators(response, etag, conversation.updated_at)
     return conversation
 
 @router.patch("/{conversation_id}", response_model=ConversationPublic)
 async def update_conversation(
     *,
     user: User = Depends(get_user),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     conversation_id: int,
     conversation: ConversationUpdate,
 ):
@@ -130,34 +359,44 @@ async def update_conversation(
     if user.role != UserRole.SUPPORT:
         raise HTTPException(status_code=403, detail="User is not authorized to update this conversation")
 
-    db_conversation = await read_conversation(session=session, conversation_id=conversation_id)
+    db_conversation = await load_conversation(session, conversation_id)
+    previous_assignee = db_conversation.assignee
     
     # Update only the fields that were provided
     update_data = conversation.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_conversation, key, value)
+    if "assignee" in update_data:
+        # A manual assignment replaces any queue claim and does not expire
+        db_conversation.claim_expires_at = None
     
     db_conversation.updated_at = datetime.now(timezone.utc)
     session.add(db_conversation)
-    session.commit()
-    session.refresh(db_conversation)
+
+    channels = [conversation_channel(conversation_id)]
+    channels += [inbox_channel(a) for a in (db_conversation.assignee, previous_assignee) if a]
+    await hub.publish(channels, "conversation.updated", db_conversation.model_dump(mode="json"), session)
+    # The posts were loaded with the conversation, so nothing is read after the commit
+    await session.commit()
+    counts.invalidate("conversations")
     return db_conversation
 
 @router.delete("/{conversation_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_conversation(
     *,
     user: User = Depends(get_user),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     conversation_id: int,
 ):
     """Delete a conversation and all its posts."""
-    conversation = await read_conversation(session=session, conversation_id=conversation_id)
+    conversation = await load_conversation(session, conversation_id)
     
     if user.username != conversation.user:
         raise HTTPException(status_code=403, detail="User is not authorized to delete this conversation")
 
-    session.delete(conversation)
-    session.commit()
+    await session.delete(conversation)
+    await session.commit()
+    counts.invalidate("conversations", "posts")
     return {"ok": True}
 
 # Post endpoints
@@ -165,75 +404,109 @@ async def delete_conversation(
 async def create_post(
     *,
     user: User = Depends(get_user),
-    session: Session = Depends(get_session),
+    coalescer: WriteCoalescer = Depends(get_coalescer),
     conversation_id: int,
     post: PostCreate,
 ):
-    """Add a post to an existing conversation."""
-    conversation = await read_conversation(session=session, conversation_id=conversation_id)
-    
-    db_post = Post(
-        **post.model_dump(),
-        user=user.username,
-        conversation_id=conversation_id,
-        timestamp=datetime.now(timezone.utc)
-    )
-    
-    conversation.updated_at = datetime.now(timezone.utc)
-    
-    session.add(db_post)
-    session.commit()
-    session.refresh(db_post)
+    """Add a post to an existing conversation.
+
+    The post is committed together with concurrent post and conversation
+    writes; it is returned, and announced, once that commit has succeeded.
+    """
+
+    async def write(session: AsyncSession):
+        conversation = await get_conversation(session, conversation_id)
+
+        now = datetime.now(timezone.utc)
+        db_post = Post(
+            **post.model_dump(),
+            user=user.username,
+            conversation_id=conversation_id,
+            timestamp=now
+        )
+
+        session.add(db_post)
+        await session.exec(record_post(conversation, user.username, now, updated_at=now))
+        await session.flush()
+
+        channels = [conversation_channel(conversation_id)]
+        if conversation.assignee:
+            channels.append(inbox_channel(conversation.assignee))
+        await hub.publish(channels, "post.created", PostPublic.model_validate(db_post).model_dump(mode="json"), session)
+        return db_post
+
+    db_post = await coalescer.submit(write)
+    counts.invalidate("conversations", "posts")
     return db_post
 
 @router.get("/{conversation_id}/posts", response_model=ListResponse[PostPublic])
 async def list_posts(
     *,
-    session: Session = Depends(get_session),
+    response: Response,
+    session: AsyncSession = Depends(get_session),
     conversation_id: int,
     offset: int = 0,
     limit: int = Query(default=20, le=100),
+    cursor: Optional[str] = None,
+    include_total: bool = True,
 ):
-    """List all posts in a conversation with pagination."""
-    await read_conversation(session=session, conversation_id=conversation_id)
+    """List all posts in a conversation with pagination.
+
+    Pass the ``next_cursor`` of a previous page as ``cursor`` to seek by
+    ``(timestamp, id)`` instead of ``offset``; cursors of conversation
+    lists are rejected.
+    """
+    await get_conversation(session, conversation_id)
     
-    total = session.scalar(
-        select(func.count()).select_from(Post)
-        .where(Post.conversation_id == conversation_id)
-    ) or 0
+    total = None
+    if include_total:
+        total = await count_total(
+            session, Post, [Post.conversation_id == conversation_id], "posts",
+            {"conversation_id": conversation_id},
+        )
     
     # Get paginated posts
-    query = (
-        select(Post)
-        .where(Post.conversation_id == conversation_id)
-        .order_by(Post.timestamp)
-        .offset(offset)
-        .limit(limit)
+    query = keyset(
+        (select(*POST_COLUMNS) if serialization.FAST else select(Post))
+        .where(Post.conversation_id == conversation_id),
+        Post.timestamp, Post.id, cursor, POST_SORT,
     )
-    items = session.exec(query).all()
+    if not cursor:
+        query = query.offset(offset)
+
+    if serialization.FAST:
+        rows = [dict(row) for row in (await session.exec(query.limit(limit + 1))).mappings()]
+        items, next_cursor = page(rows, limit, "timestamp", POST_SORT)
+        return serialization.list_response(
+            response, items, total=total, offset=0 if cursor else offset, limit=limit, next_cursor=next_cursor,
+        )
+
+    rows = (await session.exec(query.limit(limit + 1))).all()
+    items, next_cursor = page(rows, limit, "timestamp", POST_SORT)
     
     return ListResponse(
         items=items,
         total=total,
-        offset=offset,
+        offset=0 if cursor else offset,
         limit=limit,
+        next_cursor=next_cursor,
     )
 
 @router.get("/{conversation_id}/posts/{post_id}", response_model=PostPublic)
 async def read_post(
     *,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     conversation_id: int,
     post_id: int,
 ):
     """Get a specific post from a conversation."""
-    await read_conversation(session=session, conversation_id=conversation_id)
+    await get_conversation(session, conversation_id)
     
-    post = session.exec(
+    post = (await session.exec(
         select(Post)
         .where(Post.conversation_id == conversation_id)
         .where(Post.id == post_id)
-    ).first()
+    )).first()
     
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
@@ -244,18 +517,18 @@ async def read_post(
 async def delete_post(
     *,
     user: User = Depends(get_user),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     conversation_id: int,
     post_id: int,
 ):
     """Delete a specific post from a conversation."""
-    await read_conversation(session=session, conversation_id=conversation_id)
+    conversation = await get_conversation(session, conversation_id)
     
-    post = session.exec(
+    post = (await session.exec(
         select(Post)
         .where(Post.conversation_id == conversation_id)
         .where(Post.id == post_id)
-    ).first()
+    )).first()
     
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
@@ -263,6 +536,11 @@ async def delete_post(
     if user.username != post.user:
         raise HTTPException(status_code=403, detail="User is not authorized to delete this post")
     
-    session.delete(post)
-    session.commit()
+    await session.delete(post)
+    await session.flush()
+    await session.exec(refresh_activity(
+        Conversation.id == conversation.id, updated_at=datetime.now(timezone.utc)
+    ))
+    await session.commit()
+    counts.invalidate("conversations", "posts")
     return
@@ -0,0 +1,152 @@
+import asyncio
+import json
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..dependencies import get_session, get_user
+from ..events import Event, Subscription, conversation_channel, hub, inbox_channel
+from ..models.user import User, UserRole
+from .conversations import get_conversation
+
+router = APIRouter(
+    prefix="/conversations",
+    tags=["events"],
+    responses={404: {"description": "Not found"}},
+)
+
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE_INTERVAL = 15.0
+
+
+def resume_from(request_value: Optional[str], query_value: Optional[int]) -> Optional[int]:
+    """The id after which to resume, from ``Last-Event-ID`` or ``last_event_id``."""
+    if request_value:
+        try:
+            return int(request_value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+    return query_value
+
+
+def require_support(user: User) -> None:
+    if user.role != UserRole.SUPPORT:
+        raise HTTPException(status_code=403, detail="User is not authorized to read this inbox")
+
+
+def format_sse(event: Event) -> str:
+    return f"id: {event.id}\nevent: {event.type}\ndata: {json.dumps(event.data)}\n\n"
+
+
+async def sse_stream(request: Request, subscription: Subscription) -> AsyncIterator[str]:
+    """Write a subscription as server-sent events until the client goes away.
+
+    The stream ends when the subscription is dropped for falling behind; the
+    client's ``EventSource`` then reconnects with ``Last-Event-ID``.
+    """
+    try:
+        yield "retry: 1000\n\n"
+        iterator = subscription.__aiter__()
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(iterator.__anext__(), KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            except StopAsyncIteration:
+                break
+            yield format_sse(event)
+    finally:
+        hub.unsubscribe(subscription)
+
+
+def event_stream(request: Request, subscription: Subscription) -> StreamingResponse:
+    return StreamingResponse(
+        sse_stream(request, subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def forward(websocket: WebSocket, subscription: Subscription) -> None:
+    """Send a subscription over an accepted WebSocket until either side closes."""
+    try:
+        async for event in subscription:
+            await websocket.send_json({"id": event.id, "event": event.type, "data": event.data})
+        # Dropped for falling behind: the client reconnects with last_event_id
+        await websocket.close(code=1013)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub.unsubscribe(subscription)
+
+
+@router.get("/inbox/events")
+async def stream_inbox_events(
+    *,
+    request: Request,
+    user: User = Depends(get_user),
+    last_event_id: Optional[int] = None,
+):
+    """Stream events for the conversations assigned to the current support user."""
+    require_support(user)
+    after = resume_from(request.headers.get("last-event-id"), last_event_id)
+    subscription = await hub.subscribe(inbox_channel(user.username), after)
+    return event_stream(request, subscription)
+
+
+@router.get("/{conversation_id}/events")
+async def stream_conversation_events(
+    *,
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    conversation_id: int,
+    last_event_id: Optional[int] = None,
+):
+    """Stream new posts and updates of a conversation as server-sent events.
+
+    Reconnecting clients resume after the ``Last-Event-ID`` header (or the
+    ``last_event_id`` query parameter) from the recent event history.
+    """
+    await get_conversation(session, conversation_id)
+    await session.close()
+    after = resume_from(request.headers.get("last-event-id"), last_event_id)
+    subscription = await hub.subscribe(conversation_channel(conversation_id), after)
+    return event_stream(request, subscription)
+
+
+@router.websocket("/inbox/ws")
+async def inbox_websocket(
+    websocket: WebSocket,
+    user: User = Depends(get_user),
+    last_event_id: Optional[int] = None,
+):
+    """WebSocket variant of the inbox event stream."""
+    if user.role != UserRole.SUPPORT:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    subscription = await hub.subscribe(inbox_channel(user.username), last_event_id)
+    await forward(websocket, subscription)
+
+
+@router.websocket("/{conversation_id}/ws")
+async def conversation_websocket(
+    websocket: WebSocket,
+    conversation_id: int,
+    session: AsyncSession = Depends(get_session),
+    last_event_id: Optional[int] = None,
+):
+    """WebSocket variant of the conversation event stream."""
+    try:
+        await get_conversation(session, conversation_id)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    finally:
+        await session.close()
+    await websocket.accept()
+    subscription = await hub.subscribe(conversation_channel(conversation_id), last_event_id)
+    await forward(websocket, subscription)
@@ -0,0 +1,56 @@
+from datetime import datetime
+from enum import Enum
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..dependencies import get_session
+from ..export import FORMATS, export_conditions, select_export
+from ..models.conversation import ConversationStatus
+
+router = APIRouter(
+    prefix="/export",
+    tags=["export"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+@router.get("/conversations")
+async def export_conversations(
+    *,
+    session: AsyncSession = Depends(get_session),
+    format: ExportFormat = ExportFormat.NDJSON,
+    status: Optional[ConversationStatus] = None,
+    challenge_id: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+):
+    """Stream every matching conversation with its posts as NDJSON or CSV.
+
+    Rows are read with a server-side cursor and written as they arrive, so
+    exports of any size run in constant memory. ``created_after`` is
+    inclusive and ``created_before`` exclusive.
+    """
+    writer = FORMATS[format.value]()
+    query = select_export(export_conditions(status, challenge_id, created_after, created_before))
+
+    async def body() -> AsyncIterator[str]:
+        yield writer.header()
+        result = await session.stream(query)
+        async for rows in result.partitions():
+            yield writer.write(rows)
+        yield writer.finish()
+
+    filename = f"conversations.{writer.extension}"
+    return StreamingResponse(
+        body(),
+        media_type=writer.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,142 @@
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import func, or_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..cache import counts
+from ..dependencies import get_session, get_user
+from ..models.challenge import Challenge
+from ..models.conversation import Conversation, ConversationSort, ConversationStatus
+from ..models.inbox import UNASSIGNED, InboxResponse
+from ..models.user import User, UserRole
+from .conversations import conversation_conditions, summary_page
+
+router = APIRouter(
+    prefix="/inbox",
+    tags=["inbox"],
+    responses={404: {"description": "Not found"}},
+)
+
+FACETS = ("status", "category", "assignee")
+
+
+def facet_conditions(
+    status: List[ConversationStatus], category: List[str], assignee: List[str],
+) -> list:
+    """Build the predicates of the facet filters; each matches any of its values."""
+    conditions = []
+    if status:
+        conditions.append(Conversation.status.in_(status))
+    if category:
+        conditions.append(Conversation.category.in_(category))
+    if assignee:
+        names = [name for name in assignee if name != UNASSIGNED]
+        conditions.append(or_(
+            *([Conversation.assignee.in_(names)] if names else []),
+            *([Conversation.assignee.is_(None)] if UNASSIGNED in assignee else []),
+        ))
+    return conditions
+
+
+async def facet_groups(session: AsyncSession, conditions: list, filters: Dict[str, Any]) -> list:
+    """Count conversations per ``(status, category, assignee)``, through the count cache.
+
+    ``conditions`` are the filters that are not facets; the facet filters
+    are applied to the groups afterwards, so that one grouped query serves
+    every facet.
+    """
+    # Grouping by challenge first, when filtering by challenge, follows the
+    # index order; the groups of several challenges add up in ``facets_and_total``
+    keys = [Conversation.status, Conversation.category, Conversation.assignee]
+    if conditions:
+        keys.insert(0, Conversation.challenge_id)
+
+    async def group() -> list:
+        rows = (await session.exec(select(*keys, func.count()).where(*conditions).group_by(*keys))).all()
+        return [
+            ({"status": status.value if status else None, "category": category, "assignee": assignee or UNASSIGNED}, count)
+            for *_, status, category, assignee, count in rows
+        ]
+
+    return await counts.get_or_count("conversations", {**filters, "facets": True}, group)
+
+
+def facets_and_total(groups: list, selected: Dict[str, List[str]]):
+    """Each facet's counts under the other facets' filters, and the total under all of them."""
+    def matches(values: Dict[str, str], ignored: Optional[str] = None) -> bool:
+        return all(
+            not selected[facet] or values[facet] in selected[facet]
+            for facet in FACETS if facet != ignored
+        )
+
+    facets = {}
+    for facet in FACETS:
+        tally = Counter({value: 0 for value in selected[facet]})
+        for values, count in groups:
+            if matches(values, facet):
+                tally[values[facet]] += count
+        if facet == "status":
+            facets[facet] = [
+                {"value": status.value, "count": tally[status.value]} for status in ConversationStatus
+            ]
+        else:
+            facets[facet] = [
+                {"value": value, "count": count}
+                for value, count in sorted(tally.items(), key=lambda item: (-item[1], item[0]))
+            ]
+
+    total = sum(count for values, count in groups if matches(values))
+    return facets, total
+
+
+@router.get("", response_model=InboxResponse)
+async def list_inbox(
+    *,
+    request: Request,
+    response: Response,
+    user: User = Depends(get_user),
+    session: AsyncSession = Depends(get_session),
+    status: List[ConversationStatus] = Query(default=[]),
+    assignee: List[str] = Query(default=[]),
+    category: List[str] = Query(default=[]),
+    challenge_id: List[str] = Query(default=[]),
+    sort: ConversationSort = ConversationSort.CREATED,
+    offset: int = 0,
+    limit: int = Query(default=20, le=100),
+    cursor: Optional[str] = None,
+):
+    """List conversations for the support inbox, with facet counts.
+
+    Every filter takes several values (``?status=OPEN&status=IN_PROGRESS``)
+    and matches any of them; ``assignee=unassigned`` matches conversations
+    without an assignee. Alongside the page, ``facets`` counts the
+    conversations per status, category and assignee, all from a single
+    grouped query, and ``total`` is derived from the same counts.
+    """
+    if user.role != UserRole.SUPPORT:
+        raise HTTPException(status_code=403, detail="User is not authorized to view the inbox")
+
+    challenge_conditions = []
+    if len(challenge_id) == 1:
+        # Equality, unlike IN, lets the page follow the (challenge_id, created_at, id) index
+        challenge_conditions = conversation_conditions(challenge_id=challenge_id[0])
+    elif challenge_id:
+        challenge_conditions.append(Conversation.challenge_id.in_(
+            select(Challenge.id).where(Challenge.challenge_id.in_(challenge_id))
+        ))
+    groups = await facet_groups(session, challenge_conditions, {"challenge_id": tuple(sorted(challenge_id))})
+    selected = {
+        "status": [value.value for value in status],
+        "category": category,
+        "assignee": assignee,
+    }
+    facets, total = facets_and_total(groups, selected)
+
+    return await summary_page(
+        session, request, response, challenge_conditions + facet_conditions(status, category, assignee),
+        offset=offset, limit=limit, cursor=cursor, total=total, sort=sort,
+        response_model=InboxResponse, facets=facets,
+    )
@@ -0,0 +1,152 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import and_, or_, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..cache import counts
+from ..dependencies import get_session, get_user
+from ..events import conversation_channel, hub, inbox_channel
+from ..models.conversation import Conversation, ConversationPublic, ConversationStatus
+from ..models.user import User, UserRole
+from .conversations import load_conversation
+
+router = APIRouter(
+    prefix="/queue",
+    tags=["queue"],
+    responses={404: {"description": "Not found"}},
+)
+
+# Seconds a claim is held before an unacknowledged conversation returns to the queue
+QUEUE_LEASE_SECONDS = int(os.getenv("QUEUE_LEASE_SECONDS", "300"))
+
+
+def require_support(user: User) -> None:
+    if user.role != UserRole.SUPPORT:
+        raise HTTPException(status_code=403, detail="User is not authorized to work the queue")
+
+
+def claimable(now: datetime):
+    """OPEN conversations that are unassigned or whose claim has lapsed.
+
+    Assignments made through ``PATCH /conversations/{id}`` have no expiry
+    and are never reclaimed.
+    """
+    return and_(
+        Conversation.status == ConversationStatus.OPEN,
+        or_(Conversation.assignee.is_(None), Conversation.claim_expires_at < now),
+    )
+
+
+def held_by(conversation_id: int, user: User, now: datetime):
+    """The caller's unexpired claim on a conversation."""
+    return and_(
+        Conversation.id == conversation_id,
+        Conversation.assignee == user.username,
+        Conversation.claim_expires_at >= now,
+    )
+
+
+async def publish_claim(session: AsyncSession, conversation: Conversation, *assignees: str) -> None:
+    channels = [conversation_channel(conversation.id)] + [inbox_channel(a) for a in assignees if a]
+    await hub.publish(channels, "conversation.updated", conversation.model_dump(mode="json"), session)
+
+
+@router.post(
+    "/claim",
+    response_model=ConversationPublic,
+    responses={204: {"description": "The queue is empty"}},
+)
+async def claim_conversation(
+    *,
+    user: User = Depends(get_user),
+    session: AsyncSession = Depends(get_session),
+    lease: int = Query(default=QUEUE_LEASE_SECONDS, gt=0, le=86400),
+):
+    """Assign the next waiting conversation to the caller.
+
+    Conversations are handed out by priority, then age. The candidate row
+    is read with ``FOR UPDATE SKIP LOCKED`` on Postgres, so concurrent
+    claims move on to the next row instead of waiting, and SQLite runs the
+    claim under its single writer lock. The read also yields the holder of
+    an expired claim, whose inbox is told that the conversation moved. The
+    claim lasts ``lease`` seconds unless renewed or the conversation leaves
+    the OPEN status.
+    """
+    require_support(user)
+    now = datetime.now(timezone.utc)
+
+    candidate = (await session.exec(
+        select(Conversation.id, Conversation.assignee)
+        .where(claimable(now))
+        .order_by(Conversation.priority.desc(), Conversation.created_at, Conversation.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )).first()
+    if candidate is None:
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    claimed_id, previous_assignee = candidate
+    await session.exec(
+        update(Conversation)
+        .where(Conversation.id == claimed_id)
+        .values(assignee=user.username, claim_expires_at=now + timedelta(seconds=lease), updated_at=now)
+    )
+
+    # Loaded and announced in the claim's transaction, which is still the write lock's
+    conversation = await load_conversation(session, claimed_id)
+    await publish_claim(session, conversation, user.username, previous_assignee)
+    await session.commit()
+    counts.invalidate("conversations")
+    return conversation
+
+
+@router.post("/{conversation_id}/renew", response_model=ConversationPublic)
+async def renew_claim(
+    *,
+    user: User = Depends(get_user),
+    session: AsyncSession = Depends(get_session),
+    conversation_id: int,
+    lease: int = Query(default=QUEUE_LEASE_SECONDS, gt=0, le=86400),
+):
+    """Extend the caller's claim on a conversation by ``lease`` seconds."""
+    require_support(user)
+    now = datetime.now(timezone.utc)
+
+    result = await session.exec(
+        update(Conversation)
+        .where(held_by(conversation_id, user, now))
+        .values(claim_expires_at=now + timedelta(seconds=lease))
+    )
+    await session.commit()
+    if result.rowcount == 0:
+        raise HTTPException(status_code=409, detail="Conversation is not claimed by this user")
+
+    return await load_conversation(session, conversation_id)
+
+
+@router.post("/{conversation_id}/release", status_code=status.HTTP_204_NO_CONTENT)
+async def release_claim(
+    *,
+    user: User = Depends(get_user),
+    session: AsyncSession = Depends(get_session),
+    conversation_id: int,
+):
+    """Return a claimed conversation to the queue."""
+    require_support(user)
+    now = datetime.now(timezone.utc)
+
+    result = await session.exec(
+        update(Conversation)
+        .where(held_by(conversation_id, user, now))
+        .values(assignee=None, claim_expires_at=None, updated_at=now)
+    )
+    if result.rowcount == 0:
+        raise HTTPException(status_code=409, detail="Conversation is not claimed by this user")
+
+    conversation = await load_conversation(session, conversation_id)
+    await publish_claim(session, conversation, user.username)
+    await session.commit()
+    counts.invalidate("conversations")
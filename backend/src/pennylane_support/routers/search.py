@@ -0,0 +1,137 @@
+import html
+import re
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import text
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..dependencies import get_session
+from ..models.responses import ListResponse
+from ..models.search import SearchResult, SearchType
+
+router = APIRouter(
+    prefix="/search",
+    tags=["search"],
+    responses={404: {"description": "Not found"}},
+)
+
+# Matched terms are marked with control characters rather than tags, so that
+# the text can be escaped before ``highlight`` turns the marks into <b>...</b>
+MATCH_START, MATCH_END = "\x02", "\x03"
+HEADLINE_OPTIONS = f"StartSel={MATCH_START}, StopSel={MATCH_END}"
+
+# Per-type queries. Each selects the SearchResult columns for rows matching
+# :query, with a higher score meaning a better match.
+SQLITE_QUERIES = {
+    SearchType.CHALLENGE: """
+        SELECT 'challenge' AS type, challenge.id AS id, challenge.title AS title,
+               snippet(challenge_fts, -1, char(2), char(3), '…', 16) AS snippet,
+               -bm25(challenge_fts, 10.0, 5.0, 2.0) AS score,
+               challenge.challenge_id AS challenge_id, NULL AS conversation_id
+        FROM challenge_fts JOIN challenge ON challenge.id = challenge_fts.rowid
+        WHERE challenge_fts MATCH :query""",
+    SearchType.CONVERSATION: """
+        SELECT 'conversation' AS type, conversation.id AS id, conversation.topic AS title,
+               snippet(conversation_fts, 0, char(2), char(3), '…', 16) AS snippet,
+               -bm25(conversation_fts) AS score,
+               NULL AS challenge_id, conversation.id AS conversation_id
+        FROM conversation_fts JOIN conversation ON conversation.id = conversation_fts.rowid
+        WHERE conversation_fts MATCH :query""",
+    SearchType.POST: """
+        SELECT 'post' AS type, post.id AS id, conversation.topic AS title,
+               snippet(post_fts, 0, char(2), char(3), '…', 16) AS snippet,
+               -bm25(post_fts) AS score,
+               NULL AS challenge_id, post.conversation_id AS conversation_id
+        FROM post_fts
+        JOIN post ON post.id = post_fts.rowid
+        JOIN conversation ON conversation.id = post.conversation_id
+        WHERE post_fts MATCH :query""",
+}
+
+POSTGRES_QUERIES = {
+    SearchType.CHALLENGE: """
+        SELECT 'challenge' AS type, challenge.id AS id, challenge.title AS title,
+               ts_headline('english', challenge.description, q, :headline) AS snippet,
+               ts_rank_cd(challenge.search_vector, q) AS score,
+               challenge.challenge_id AS challenge_id, NULL::integer AS conversation_id
+        FROM challenge, websearch_to_tsquery('english', :query) AS q
+        WHERE challenge.search_vector @@ q""",
+    SearchType.CONVERSATION: """
+        SELECT 'conversation' AS type, conversation.id AS id, conversation.topic AS title,
+               ts_headline('english', conversation.topic, q, :headline) AS snippet,
+               ts_rank_cd(conversation.search_vector, q) AS score,
+               NULL::varchar AS challenge_id, conversation.id AS conversation_id
+        FROM conversation, websearch_to_tsquery('english', :query) AS q
+        WHERE conversation.search_vector @@ q""",
+    SearchType.POST: """
+        SELECT 'post' AS type, post.id AS id, conversation.topic AS title,
+               ts_headline('english', post.content, q, :headline) AS snippet,
+               ts_rank_cd(post.search_vector, q) AS score,
+               NULL::varchar AS challenge_id, post.conversation_id AS conversation_id
+        FROM post
+        JOIN conversation ON conversation.id = post.conversation_id,
+        websearch_to_tsquery('english', :query) AS q
+        WHERE post.search_vector @@ q""",
+}
+
+def highlight(snippet: Optional[str]) -> Optional[str]:
+    """Escape a marked snippet as HTML, wrapping the matched terms in ``<b>``.
+
+    Marks that are not a pair, which could only come from the content
+    itself, are dropped.
+    """
+    if snippet is None:
+        return None
+    parts = re.split(f"{MATCH_START}([^{MATCH_START}{MATCH_END}]*){MATCH_END}", snippet)
+    return "".join(
+        f"<b>{html.escape(part)}</b>" if matched else html.escape(part.replace(MATCH_START, "").replace(MATCH_END, ""))
+        for matched, part in ((i % 2 == 1, part) for i, part in enumerate(parts))
+    )
+
+def fts5_query(q: str) -> str:
+    """Turn free text into an FTS5 query matching all of its words.
+
+    Each word is quoted so user input can never be parsed as FTS5 syntax.
+    """
+    return " ".join(f'"{word}"' for word in re.findall(r"\w+", q))
+
+@router.get("/", response_model=ListResponse[SearchResult])
+async def search(
+    *,
+    session: AsyncSession = Depends(get_session),
+    q: str = Query(min_length=1),
+    type: Optional[List[SearchType]] = Query(default=None),
+    offset: int = 0,
+    limit: int = Query(default=20, le=100),
+    include_total: bool = True,
+):
+    """Search challenges, conversation topics and posts, best matches first."""
+    connection = await session.connection()
+    if connection.dialect.name == "postgresql":
+        queries, query, params = POSTGRES_QUERIES, q, {"headline": HEADLINE_OPTIONS}
+    else:
+        queries, query, params = SQLITE_QUERIES, fts5_query(q), {}
+
+    if not query:
+        return ListResponse[SearchResult](items=[], total=0, offset=offset, limit=limit)
+
+    matches = " UNION ALL ".join(queries[search_type] for search_type in dict.fromkeys(type or SearchType))
+
+    total = None
+    if include_total:
+        total = await session.scalar(
+            text(f"SELECT count(*) FROM ({matches}) AS matches"), {"query": query, **params}
+        )
+
+    rows = (await session.exec(
+        text(f"{matches} ORDER BY score DESC, type, id LIMIT :limit OFFSET :offset"),
+        params={"query": query, "limit": limit, "offset": offset, **params},
+    )).mappings().all()
+
+    return ListResponse[SearchResult](
+        items=[SearchResult(**{**row, "snippet": highlight(row["snippet"])}) for row in rows],
+        total=total,
+        offset=offset,
+        limit=limit,
+    )
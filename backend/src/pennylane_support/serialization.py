@@ -0,0 +1,70 @@
+"""Fast JSON encoding of list responses.
+
+A list endpoint that returns its ``ListResponse`` model has every row go
+through Pydantic twice: once when the model is built from ORM objects, and
+again when FastAPI validates it against ``response_model``, before the
+standard library encodes it. In the default ``SERIALIZATION_MODE=fast``
+list endpoints instead select plain rows, whose types the database schema
+already guarantees, and encode them with orjson without validation. The
+documented response model is unchanged. ``SERIALIZATION_MODE=validate``
+restores the validated path, to rule the fast path out when debugging.
+"""
+import os
+from typing import Any, Dict, List, Optional
+
+import orjson
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import Table
+from sqlmodel import SQLModel
+
+FAST = os.getenv("SERIALIZATION_MODE", "fast") == "fast"
+
+
+def dumps(content: Any) -> bytes:
+    """Encode as Pydantic would: UTC as ``Z``, naive datetimes without an offset."""
+    return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def columns(schema: type[SQLModel], table: Table, **expressions) -> list:
+    """The columns of ``table`` that ``schema`` exposes, in the schema's field order.
+
+    ``expressions`` supply, by field name, the fields that are not columns
+    of ``table``.
+    """
+    return [
+        expressions[name].label(name) if name in expressions else table.c[name]
+        for name in schema.model_fields
+        if name in expressions or name in table.c
+    ]
+
+
+def list_response(
+    response: Response,
+    items: List[Dict[str, Any]],
+    *,
+    total: Optional[int],
+    offset: int,
+    limit: int,
+    next_cursor: Optional[str] = None,
+    **fields: Any,
+) -> FastJSONResponse:
+    """A ``ListResponse`` of trusted rows, with the headers the endpoint set on ``response``.
+
+    ``fields`` are the extra fields of a ``ListResponse`` subclass, as plain data.
+    """
+    fast = FastJSONResponse({
+        "items": items,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "next_cursor": next_cursor,
+        **fields,
+    })
+    fast.raw_headers.extend(header for header in response.raw_headers if header[0] != b"content-length")
+    return fast
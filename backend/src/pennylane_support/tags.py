@@ -0,0 +1,27 @@
+"""Normalized challenge tags.
+
+``Challenge.tags`` is the JSON list the API returns. Every write of it
+also replaces the challenge's rows in ``challenge_tag``, in the same
+transaction, so the table can be indexed and counted by tag; the catalog
+snapshot builds its tag index from it.
+"""
+from typing import Dict, Iterable, List
+
+from sqlalchemy import delete, insert
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .models.challenge import ChallengeTag
+
+
+def tag_rows(challenge_id: int, tags: Iterable[str]) -> List[Dict[str, object]]:
+    """The ``challenge_tag`` rows of a challenge, without duplicate tags."""
+    return [{"challenge_id": challenge_id, "tag": tag} for tag in dict.fromkeys(tags)]
+
+
+async def replace_tags(session: AsyncSession, challenge_id: int, tags: Iterable[str], new: bool = False) -> None:
+    """Replace the tag rows of a challenge; a ``new`` challenge has none to delete."""
+    if not new:
+        await session.exec(delete(ChallengeTag).where(ChallengeTag.challenge_id == challenge_id))
+    rows = tag_rows(challenge_id, tags)
+    if rows:
+        await session.exec(insert(ChallengeTag), params=rows)
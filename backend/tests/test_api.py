@@ -1,21 +1,52 @@
+import asyncio
+import contextvars
+import csv
+import gzip
+import hashlib
+import io
+import json
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+import httpx
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.pool import NullPool
+from starlette.datastructures import MutableHeaders
 from sqlmodel import Session, SQLModel, create_engine
-from sqlmodel.pool import StaticPool
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from pennylane_support.main import app
-from pennylane_support.database import get_session
-from pennylane_support.models import Challenge, Conversation, Post
+from pennylane_support.activity import refresh_activity
+from pennylane_support.app import app
+from pennylane_support.cache import counts
+from pennylane_support.catalog import catalog
+from pennylane_support.compression import CompressedCache, CompressionMiddleware, compressed_bodies, negotiate
+from pennylane_support import dependencies
+from pennylane_support.database import create_async_database_engine, create_database_engine, create_session_makers, settings_for
+from pennylane_support.coalescer import WriteCoalescer
+from pennylane_support.dependencies import SessionRouter, get_coalescer, get_session, get_user
+from pennylane_support.events import DatabaseBackend, Hub, MemoryBackend, event_log, hub, inbox_channel
+from pennylane_support import metrics, serialization
+from pennylane_support.migrations import migrate
+from pennylane_support.models.challenge import Challenge, ChallengeTag
+from pennylane_support.models.conversation import Conversation, ConversationStatus, Post
+from pennylane_support.models.user import User, UserRole
 
 # Test database setup
+@pytest.fixture(name="db_path")
+def db_path_fixture(tmp_path):
+    return tmp_path / "test.db"
+
 @pytest.fixture(name="session")
-def session_fixture():
-    engine = create_engine(
-        "sqlite://",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
-    SQLModel.metadata.create_all(engine)
+def session_fixture(db_path):
+    engine = create_database_engine(settings_for(f"sqlite:///{db_path}"))
+    migrate(engine)
     with Session(engine) as session:
         # Add test data
         challenge = Challenge(
@@ -31,12 +62,15 @@ def session_fixture():
         )
         session.add(challenge)
         session.commit()
+        session.add_all(ChallengeTag(challenge_id=challenge.id, tag=tag) for tag in challenge.tags)
+        session.commit()
         
         conversation = Conversation(
             identifier="CONV_001",
             topic="Test Conversation",
             category="Testing",
-            status="open",
+            user="testuser",
+            status=ConversationStatus.OPEN,
             challenge_id=challenge.id
         )
         session.add(conversation)
@@ -49,19 +83,75 @@ def session_fixture():
         )
         session.add(post)
         session.commit()
+        # Written around the application, so its activity needs a refresh
+        session.exec(refresh_activity(Conversation.id == conversation.id))
+        session.commit()
         
         yield session
 
+@pytest.fixture(name="async_engine")
+def async_engine_fixture(session: Session, db_path):
+    return create_async_database_engine(settings_for(f"sqlite:///{db_path}"), poolclass=NullPool)
+
 @pytest.fixture(name="client")
-def client_fixture(session: Session):
-    def get_session_override():
-        return session
+def client_fixture(async_engine):
+    async_session_maker = async_sessionmaker(
+        async_engine, class_=AsyncSession, expire_on_commit=False
+    )
+
+    async def get_session_override():
+        async with async_session_maker() as async_session:
+            yield async_session
     
+    coalescer = WriteCoalescer(async_session_maker)
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_coalescer] = lambda: coalescer
+    counts.clear()
+    catalog.clear()
+    compressed_bodies.clear()
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
 
+class QueryCounter:
+    """Records the SQL statements executed through an engine while active.
+
+    Use ``with queries.budget(n): ...`` to fail when the block runs more
+    than ``n`` statements; the failure lists them.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if not statement.startswith("BEGIN"):
+            self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    def __len__(self):
+        return len(self.statements)
+
+    def report(self) -> str:
+        return "\n".join(f"{i}. {statement}" for i, (statement, _) in enumerate(self.statements, 1))
+
+    @contextmanager
+    def budget(self, limit: int):
+        with self:
+            yield self
+        assert len(self) <= limit, f"{len(self)} statements, budget {limit}:\n{self.report()}"
+
+@pytest.fixture(name="queries")
+def queries_fixture(async_engine):
+    return QueryCounter(async_engine.sync_engine)
+
 def test_health_check(client: TestClient):
     response = client.get("/api/health")
     assert response.status_code == 200
@@ -147,3 +237,942 @@ def test_nonexistent_endpoint(client: TestClient):
     response = client.get("/api/nonexistent")
     assert response.status_code == 404
     assert response.json()["detail"] == "Not Found"
+
+def test_list_posts_cursor_pagination(client: TestClient):
+    for i in range(4):
+        response = client.post("/conversations/1/posts", json={"content": f"Reply {i}"})
+        assert response.status_code == 201
+
+    contents = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/conversations/1/posts", params=params)
+        assert response.status_code == 200
+        data = response.json()
+        contents += [post["content"] for post in data["items"]]
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+
+    assert contents == ["Test post content"] + [f"Reply {i}" for i in range(4)]
+
+def test_list_posts_invalid_cursor(client: TestClient):
+    response = client.get("/conversations/1/posts", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+def test_list_conversations_returns_summaries(client: TestClient):
+    client.post("/conversations/1/posts", json={"content": "A reply"})
+    response = client.get("/conversations/")
+    assert response.status_code == 200
+    summary = response.json()["items"][0]
+    assert "posts" not in summary
+    assert summary["post_count"] == 2
+    assert summary["preview"] == "Test post content"
+    assert summary["last_poster"] == "newbie_quantum"
+    assert summary["last_post_at"] is not None
+
+def test_list_conversations_total_respects_filters(client: TestClient):
+    response = client.post("/conversations/", json={
+        "challenge_id": 1, "topic": "Another", "category": "Other",
+    })
+    assert response.status_code == 201
+
+    assert client.get("/conversations/").json()["total"] == 2
+    assert client.get("/conversations/", params={"category": "Other"}).json()["total"] == 1
+    assert client.get("/conversations/", params={"status": "CLOSED"}).json()["total"] == 0
+    assert client.get("/conversations/", params={"include_total": False}).json()["total"] is None
+
+    # Creating a conversation invalidates the cached totals
+    client.post("/conversations/", json={"challenge_id": 1, "topic": "Third", "category": "Other"})
+    assert client.get("/conversations/", params={"category": "Other"}).json()["total"] == 2
+
+def test_post_writes_maintain_activity(client: TestClient):
+    def activity():
+        conversation = client.get("/conversations/1").json()
+        return {key: conversation[key] for key in ("post_count", "last_post_user", "first_response_at")}
+
+    assert activity() == {"post_count": 1, "last_post_user": "testuser", "first_response_at": None}
+
+    reply = client.post("/conversations/1/posts", json={"content": "A reply"}).json()
+    assert activity() == {"post_count": 2, "last_post_user": "newbie_quantum", "first_response_at": reply["timestamp"]}
+    assert client.get("/conversations/1").json()["last_post_at"] == reply["timestamp"]
+
+    client.delete(f"/conversations/1/posts/{reply['id']}")
+    assert activity() == {"post_count": 1, "last_post_user": "testuser", "first_response_at": None}
+
+    client.post("/conversations/batch/posts", json={"posts": [
+        {"conversation_id": 1, "content": "First"}, {"conversation_id": 1, "content": "Second"},
+    ]})
+    assert activity()["post_count"] == 3
+    assert activity()["last_post_user"] == "newbie_quantum"
+
+def test_list_conversations_sort_and_filter_by_activity(client: TestClient):
+    def ids(**params):
+        return [item["id"] for item in client.get("/conversations/", params=params).json()["items"]]
+
+    client.post("/conversations/", json={"challenge_id": 1, "topic": "Quiet", "category": "Testing"})
+    assert ids() == [2, 1]
+    assert ids(sort="replies") == [1, 2]
+    assert ids(sort="activity") == [2, 1]
+
+    def replied_total():
+        return client.get("/conversations/", params={"min_posts": 2}).json()["total"]
+    assert replied_total() == 0
+
+    reply = client.post("/conversations/1/posts", json={"content": "A reply"}).json()
+    # Post writes change the activity the cached totals are filtered on
+    assert replied_total() == 1
+    assert ids(sort="activity") == [1, 2]
+    assert ids(answered=True) == [1]
+    assert ids(answered=False) == [2]
+    assert ids(min_posts=2) == [1]
+    assert ids(sort="activity", active_since="2100-01-01T00:00:00Z") == []
+    assert client.get("/conversations/", params={"min_posts": 1}).json()["total"] == 1
+
+    first = client.get("/conversations/", params={"sort": "replies", "limit": 1}).json()
+    assert [item["id"] for item in first["items"]] == [1]
+    second = client.get("/conversations/", params={"sort": "replies", "limit": 1, "cursor": first["next_cursor"]})
+    assert [item["id"] for item in second.json()["items"]] == [2]
+    # A cursor only seeks in the order it came from
+    replies_cursor = first["next_cursor"]
+    assert client.get("/conversations/", params={"sort": "created", "cursor": replies_cursor}).status_code == 400
+    assert client.get("/conversations/", params={"cursor": replies_cursor}).status_code == 400
+    assert client.get("/conversations/1/posts", params={"cursor": replies_cursor}).status_code == 400
+    created_cursor = client.get("/conversations/", params={"limit": 1}).json()["next_cursor"]
+    assert client.get("/conversations/", params={"sort": "replies", "cursor": created_cursor}).status_code == 400
+
+    assert client.delete(f"/conversations/1/posts/{reply['id']}").status_code == 204
+    assert replied_total() == 0
+
+def test_load_db_workers_load_files_in_parallel(tmp_path):
+    import os
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    backend = Path(__file__).parent.parent
+    data = backend / "scripts" / "data"
+    conversations = json.loads((data / "pennylane_support_conversations.json").read_text())["support_conversations"]
+    files = []
+    for i in range(4):
+        files.append(tmp_path / f"conversations-{i}.json")
+        files[-1].write_text(json.dumps({"support_conversations": conversations[i::4]}))
+
+    db_path = tmp_path / "loaded.db"
+    result = subprocess.run(
+        [sys.executable, str(backend / "scripts" / "load_db.py"), "--database-url", f"sqlite:///{db_path}",
+         "--workers", "4", "--batch-size", "2", "--conversations", *map(str, files)],
+        capture_output=True, text=True, env={**os.environ, "PYTHONPATH": str(backend / "src")},
+    )
+    assert result.returncode == 0, result.stderr
+    with sqlite3.connect(db_path) as connection:
+        assert connection.execute("SELECT count(*) FROM conversation").fetchone()[0] == len(conversations)
+
+def test_load_db_challenges_listed_twice_load_once(tmp_path):
+    import os
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    backend = Path(__file__).parent.parent
+    challenge = {**CHALLENGE_BODY, "tags": ["basics", "basics"]}
+    challenges = tmp_path / "challenges.json"
+    listed = [challenge, challenge, {**challenge, "points": 80, "tags": ["advanced"]}]
+    challenges.write_text(json.dumps({"coding_challenges": listed}))
+
+    db_path = tmp_path / "loaded.db"
+    for _ in range(2):
+        result = subprocess.run(
+            [sys.executable, str(backend / "scripts" / "load_db.py"), "--database-url", f"sqlite:///{db_path}",
+             "--challenges", str(challenges)],
+            capture_output=True, text=True, env={**os.environ, "PYTHONPATH": str(backend / "src")},
+        )
+        assert result.returncode == 0, result.stderr
+    with sqlite3.connect(db_path) as connection:
+        assert connection.execute("SELECT challenge_id, points FROM challenge").fetchall() == [("CHAL_001", 80)]
+        assert connection.execute("SELECT tag FROM challenge_tag").fetchall() == [("advanced",)]
+
+def test_repair_activity_recomputes_drifted_conversations(session: Session, db_path):
+    import os
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    session.exec(refresh_activity(Conversation.id == 1).values(post_count=7, last_post_user="someone"))
+    session.commit()
+
+    backend = Path(__file__).parent.parent
+    def repair(*args):
+        return subprocess.run(
+            [sys.executable, str(backend / "scripts" / "repair_activity.py"), "--database-url", f"sqlite:///{db_path}", *args],
+            capture_output=True, text=True, env={**os.environ, "PYTHONPATH": str(backend / "src")},
+        )
+
+    check = repair("--check")
+    assert check.returncode == 1 and "1 conversations have drifted" in check.stderr
+    assert "Repaired 1 conversations" in repair().stderr
+    assert repair("--check").returncode == 0
+    session.expire_all()
+    conversation = session.get(Conversation, 1)
+    assert (conversation.post_count, conversation.last_post_user) == (1, "testuser")
+
+def test_migrations_upgrade_existing_database(tmp_path):
+    from sqlalchemy import inspect
+    from pennylane_support.migrations import HEAD, current_version, migrate
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrate.db'}")
+    with engine.begin() as connection:
+        # A database created before migrations existed
+        SQLModel.metadata.tables["challenge"].create(connection)
+
+    assert migrate(engine) == list(range(1, HEAD + 1))
+    assert migrate(engine) == []
+    with engine.connect() as connection:
+        assert current_version(connection) == HEAD
+        indexes = {index["name"] for index in inspect(connection).get_indexes("conversation")}
+    assert "ix_conversation_status_created_at" in indexes
+
+def test_startup_checks_schema_version_without_ddl(tmp_path):
+    from pennylane_support.migrations import HEAD, ensure_schema_async
+
+    engine = create_async_database_engine(settings_for(f"sqlite:///{tmp_path / 'startup.db'}"), poolclass=NullPool)
+    with pytest.raises(RuntimeError, match=f"version 0, expected {HEAD}"):
+        asyncio.run(ensure_schema_async(engine, mode="verify"))
+    assert asyncio.run(ensure_schema_async(engine)) == list(range(1, HEAD + 1))
+
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    assert asyncio.run(ensure_schema_async(engine, mode="verify")) == []
+    assert [s for s in statements if not s.startswith(("PRAGMA", "BEGIN"))] == [
+        "SELECT max(schema_version.version) AS max_1 \nFROM schema_version"
+    ]
+
+def test_workers_starting_together_migrate_once(tmp_path):
+    from pennylane_support.migrations import HEAD, ensure_schema_async
+
+    url = f"sqlite:///{tmp_path / 'workers.db'}"
+    engines = [create_async_database_engine(settings_for(url), poolclass=NullPool) for _ in range(4)]
+
+    async def start_workers():
+        return await asyncio.gather(*(ensure_schema_async(engine) for engine in engines))
+
+    applied = asyncio.run(start_workers())
+    assert sorted(applied, key=len) == [[], [], [], list(range(1, HEAD + 1))]
+
+def test_startup_profile_within_budget():
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    script = Path(__file__).parent.parent / "scripts" / "profile_startup.py"
+    result = subprocess.run([sys.executable, str(script), "--runs", "1"], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+def test_search(client: TestClient):
+    client.post("/conversations/1/posts", json={"content": "Entanglement between two qubits"})
+    client.patch("/challenges/CHAL_001", json={
+        "challenge_id": "CHAL_001",
+        "title": "Entangled States",
+        "description": "Prepare a Bell state",
+        "category": "Testing",
+        "difficulty": "Beginner",
+    })
+
+    response = client.get("/search/", params={"q": "entangled"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 2
+    assert {item["type"] for item in data["items"]} == {"challenge", "post"}
+
+    response = client.get("/search/", params={"q": "entangled", "type": "post"})
+    assert [item["conversation_id"] for item in response.json()["items"]] == [1]
+
+    # Content is escaped; only the matches are marked up
+    client.post("/conversations/1/posts", json={"content": "<img src=x onerror=alert(1)> \x02<script>\x03 \x03teleported"})
+    snippet = client.get("/search/", params={"q": "teleported"}).json()["items"][0]["snippet"]
+    assert snippet.startswith("&lt;img src=x onerror=alert(1)&gt; ")
+    assert snippet.endswith(" <b>teleported</b>")
+    assert re.sub(r"</?b>", "", snippet).count("<") == 0
+
+    # FTS syntax in user input is treated as plain words
+    response = client.get("/search/", params={"q": 'two" qubits* ('})
+    assert response.status_code == 200
+    assert response.json()["total"] == 1
+
+def test_challenge_catalog_detects_stale_snapshot(client: TestClient, session: Session, monkeypatch):
+    monkeypatch.setattr(catalog, "check_interval", 3600)
+    assert client.get("/challenges/").json()["total"] == 1
+
+    # A write made by another worker bumps the catalog version
+    session.add(Challenge(
+        challenge_id="CHAL_009",
+        title="Written Elsewhere",
+        description="Created outside this worker",
+        category="Testing",
+        difficulty="Advanced",
+    ))
+    session.commit()
+    assert client.get("/challenges/CHAL_009").status_code == 404
+
+    monkeypatch.setattr(catalog, "check_interval", 0)
+    assert client.get("/challenges/CHAL_009").status_code == 200
+    assert client.get("/challenges/", params={"difficulty": "Advanced"}).json()["total"] == 1
+
+def test_challenge_tags_filter_and_facets(client: TestClient):
+    def challenge_ids(**params):
+        return [item["challenge_id"] for item in client.get("/challenges/", params=params).json()["items"]]
+
+    def tag_counts(**params):
+        return [(item["tag"], item["count"]) for item in client.get("/challenges/tags", params=params).json()]
+
+    body = {
+        "challenge_id": "CHAL_002", "title": "Tagged", "description": "Two tags", "category": "Other",
+        "difficulty": "Advanced", "tags": ["test", "advanced", "test"],
+    }
+    assert client.post("/challenges/", json=body).json()["tags"] == ["test", "advanced", "test"]
+
+    assert challenge_ids(tags="test") == ["CHAL_001", "CHAL_002"]
+    assert challenge_ids(tags=["example", "advanced"]) == ["CHAL_001", "CHAL_002"]
+    assert challenge_ids(tags=["test", "advanced"], match="all") == ["CHAL_002"]
+    assert challenge_ids(tags=["test"], category="Testing") == ["CHAL_001"]
+    assert challenge_ids(tags="missing") == []
+    assert tag_counts() == [("test", 2), ("advanced", 1), ("example", 1)]
+    assert tag_counts(category="Other") == [("advanced", 1), ("test", 1)]
+
+    assert client.patch("/challenges/CHAL_002", json={**body, "tags": ["advanced"]}).status_code == 200
+    assert challenge_ids(tags="test") == ["CHAL_001"]
+    assert client.get("/challenges/", params={"tags": "advanced"}).json()["items"][0]["tags"] == ["advanced"]
+
+    client.delete("/challenges/CHAL_002")
+    assert tag_counts() == [("example", 1), ("test", 1)]
+
+def test_conditional_get_conversation(client: TestClient):
+    response = client.get("/conversations/1")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.headers["Last-Modified"]
+
+    response = client.get("/conversations/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    client.post("/conversations/1/posts", json={"content": "New reply"})
+    response = client.get("/conversations/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+def test_conditional_get_lists(client: TestClient):
+    for url in ["/conversations/", "/challenges/", "/challenges/CHAL_001", "/challenges/CHAL_001/conversations"]:
+        response = client.get(url)
+        assert response.status_code == 200
+        response = client.get(url, headers={"If-None-Match": response.headers["ETag"]})
+        assert response.status_code == 304, url
+
+    etag = client.get("/conversations/").headers["ETag"]
+    client.post("/conversations/1/posts", json={"content": "New reply"})
+    assert client.get("/conversations/", headers={"If-None-Match": etag}).status_code == 200
+
+def test_conditional_get_list_after_a_row_leaves_the_page(client: TestClient):
+    client.post("/conversations/", json={"challenge_id": 1, "topic": "Second", "category": "Testing"})
+    assert [item["id"] for item in client.get("/conversations/", params={"status": "OPEN"}).json()["items"]] == [2, 1]
+
+    app.dependency_overrides[get_user] = lambda: support_user("agent")
+    assert client.patch("/conversations/1", json={"status": "RESOLVED"}).status_code == 200
+    # The remaining rows are older than any date the client saw, yet the page changed
+    headers = {"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"}
+    response = client.get("/conversations/", params={"status": "OPEN"}, headers=headers)
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()["items"]] == [2]
+    assert "Last-Modified" not in response.headers
+
+def test_conversation_event_stream_resumes(client: TestClient):
+    last_event_id = max((event.id for event in asyncio.run(hub.backend.replay("conversation:1", 0))), default=0)
+    client.post("/conversations/1/posts", json={"content": "Live reply"})
+
+    with client.websocket_connect(f"/conversations/1/ws?last_event_id={last_event_id}") as websocket:
+        message = websocket.receive_json()
+    assert message["event"] == "post.created"
+    assert message["data"]["content"] == "Live reply"
+    assert message["id"] > last_event_id
+
+    assert client.get("/conversations/999/events").status_code == 404
+    assert client.get("/conversations/inbox/events").status_code == 403
+
+def test_database_events_are_written_with_the_change(client: TestClient, session: Session, async_engine, monkeypatch):
+    # Write sessions begin IMMEDIATE and hold the write lock, as in production
+    router = SessionRouter(*create_session_makers(async_engine), lock=asyncio.Lock())
+    monkeypatch.setattr(dependencies, "sessions", router)
+    monkeypatch.setattr(hub, "backend", DatabaseBackend(async_engine))
+    del app.dependency_overrides[get_session]
+    del app.dependency_overrides[get_coalescer]
+    app.dependency_overrides[get_user] = lambda: support_user("agent")
+
+    response = client.patch("/conversations/1", json={"status": "IN_PROGRESS", "assignee": "agent"})
+    assert response.status_code == 200
+    assert response.json()["posts"][0]["content"] == "Test post content"
+    assert client.post("/conversations/1/posts", json={"content": "Reply"}).status_code == 201
+
+    events = session.exec(select(event_log.c.channel, event_log.c.type).order_by(event_log.c.id)).all()
+    assert events == [
+        ("conversation:1", "conversation.updated"), ("inbox:agent", "conversation.updated"),
+        ("conversation:1", "post.created"), ("inbox:agent", "post.created"),
+    ]
+
+def test_event_hub_drops_slow_subscribers():
+    async def scenario():
+        events = Hub(MemoryBackend())
+        await events.start()
+        slow = await events.subscribe("conversation:1")
+        slow.queue = asyncio.Queue(maxsize=2)
+        for i in range(3):
+            await events.publish(["conversation:1"], "post.created", {"n": i})
+
+        assert [event.data["n"] async for event in slow] == [0, 1]
+        resumed = await events.subscribe("conversation:1", last_event_id=1)
+        resumed.close()
+        assert [event.data["n"] async for event in resumed] == [1, 2]
+        await events.stop()
+
+    asyncio.run(scenario())
+
+def test_database_event_poller_survives_failed_polls(async_engine):
+    class Unavailable:
+        """The engine, except that the first transaction fails."""
+        failed = False
+
+        def connect(self):
+            return async_engine.connect()
+
+        def begin(self):
+            if not self.failed:
+                self.failed = True
+                raise OSError("database unavailable")
+            return async_engine.begin()
+
+    async def scenario():
+        events = Hub(DatabaseBackend(Unavailable(), poll_interval=0.01))
+        await events.start()
+        subscription = await events.subscribe("conversation:1")
+        await asyncio.sleep(0)
+        await events.publish(["conversation:1"], "post.created", {"n": 1})
+        event = await asyncio.wait_for(subscription.__anext__(), timeout=5)
+        # Stop while the poller sleeps rather than during a query
+        events.backend.poll_interval = 60
+        await asyncio.sleep(0.2)
+        await events.stop()
+        return event
+
+    assert asyncio.run(scenario()).data == {"n": 1}
+
+def test_reads_use_replica_except_after_own_writes(client: TestClient, db_path, tmp_path, monkeypatch):
+    # The replica is a snapshot that never catches up, as if replication lagged
+    replica_path = tmp_path / "replica.db"
+    with sqlite3.connect(db_path) as primary, sqlite3.connect(replica_path) as replica:
+        primary.backup(replica)
+    read, write = create_session_makers(
+        create_async_database_engine(settings_for(f"sqlite:///{db_path}"), poolclass=NullPool)
+    )
+    replica, _ = create_session_makers(
+        create_async_database_engine(settings_for(f"sqlite:///{replica_path}"), poolclass=NullPool)
+    )
+    router = SessionRouter(read, write, replica, sticky_seconds=60)
+    monkeypatch.setattr(dependencies, "sessions", router)
+    del app.dependency_overrides[get_session]
+    del app.dependency_overrides[get_coalescer]
+
+    def topics():
+        return [c["topic"] for c in client.get("/conversations/", params={"include_total": False}).json()["items"]]
+
+    app.dependency_overrides[get_user] = lambda: support_user("writer")
+    response = client.post("/conversations/", json={"challenge_id": 1, "topic": "Fresh", "category": "Other"})
+    assert response.status_code == 201
+    assert "last_write" in response.cookies
+    assert "Fresh" in topics()
+
+    # Another worker only knows about the write from the cookie
+    router._writes.clear()
+    assert "Fresh" in topics()
+
+    app.dependency_overrides[get_user] = lambda: support_user("reader")
+    client.cookies.clear()
+    assert topics() == ["Test Conversation"]
+
+    # Once the window has passed, the writer reads from the replica again
+    app.dependency_overrides[get_user] = lambda: support_user("writer")
+    router.sticky_seconds = 0
+    assert "Fresh" not in topics()
+
+    # WebSocket routes share the dependency
+    with client.websocket_connect("/conversations/1/ws"):
+        pass
+
+@pytest.mark.parametrize("url", [
+    "/challenges/",
+    "/conversations/?limit=1",
+    "/conversations/user",
+    "/challenges/CHAL_001/conversations",
+    "/conversations/1/posts?limit=1",
+])
+def test_fast_serialization_matches_validated(client: TestClient, session: Session, monkeypatch, url):
+    session.add(Post(user="agent", content="Réponse ✓", conversation_id=1))
+    session.add(Conversation(
+        identifier="CONV_002", topic="Second", category="Testing", user="newbie_quantum",
+        challenge_id=1, claim_expires_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+    ))
+    session.commit()
+
+    fast = client.get(url)
+    monkeypatch.setattr(serialization, "FAST", False)
+    validated = client.get(url)
+
+    assert fast.status_code == validated.status_code == 200
+    assert fast.json() == validated.json()
+    assert fast.headers.get("etag") == validated.headers.get("etag")
+    assert fast.headers["content-type"] == validated.headers["content-type"]
+
+@pytest.mark.parametrize("accept, expected", [
+    ("gzip, deflate, br, zstd", "zstd"),
+    ("gzip;q=1.0, zstd;q=0.5", "gzip"),
+    ("br;q=0, *", "zstd"),
+    ("*;q=0.2, gzip", "gzip"),
+    ("identity", None),
+    ("zstd;q=0, gzip;q=0", None),
+    ("", None),
+])
+def test_negotiate_content_encoding(accept, expected):
+    assert negotiate(accept, ["zstd", "br", "gzip"]) == expected
+
+def test_compressed_bodies_are_reused_by_etag(client: TestClient, session: Session):
+    for number in range(2, 8):
+        session.add(Challenge(
+            challenge_id=f"CHAL_00{number}", title=f"Challenge {number}", description="Prepare a state " * 10,
+            category="Testing", difficulty="Beginner",
+        ))
+    session.commit()
+
+    identity = client.get("/challenges/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+
+    first = client.get("/challenges/", headers={"Accept-Encoding": "gzip"})
+    second = client.get("/challenges/", headers={"Accept-Encoding": "gzip"})
+    assert first.headers["content-encoding"] == second.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in first.headers["vary"]
+    assert int(first.headers["content-length"]) < len(identity.content)
+    assert first.json() == second.json() == identity.json()
+    assert (compressed_bodies.hits, compressed_bodies.misses) == (1, 1)
+
+    # A new catalog version is a new ETag, and is compressed again
+    client.patch("/challenges/CHAL_002", json={**CHALLENGE_BODY, "challenge_id": "CHAL_002", "title": "Renamed"})
+    assert client.get("/challenges/", headers={"Accept-Encoding": "gzip"}).json()["items"][1]["title"] == "Renamed"
+    assert (compressed_bodies.hits, compressed_bodies.misses) == (1, 2)
+
+    # A miss is compressed at the usual level, and cached at the best level in the background
+    cache = CompressedCache()
+    middleware = CompressionMiddleware(app, cache=cache, encodings="gzip")
+    body = b'{"description": "Prepare a state"}' * 500
+    headers = MutableHeaders({"etag": '"v1"'})
+    sent = asyncio.run(middleware.compress({"path": "/challenges/"}, middleware.codecs["gzip"], headers, body))
+    assert sent == gzip.compress(body, compresslevel=6, mtime=0)
+    middleware._recompressor.shutdown(wait=True)
+    digest = hashlib.blake2b(body, digest_size=16).digest()
+    assert cache.get(("/challenges/", "", '"v1"', "gzip"), digest) == gzip.compress(body, compresslevel=9, mtime=0)
+
+    # Streamed responses are compressed as they are sent, without the cache
+    export = client.get("/export/conversations", headers={"Accept-Encoding": "gzip"})
+    assert export.headers["content-encoding"] == "gzip"
+    assert "content-length" not in export.headers
+    assert json.loads(export.text.splitlines()[0])["identifier"] == "CONV_001"
+
+def support_user(username: str) -> User:
+    return User(user_id=2, username=username, email=f"{username}@example.com", role=UserRole.SUPPORT)
+
+def test_queue_claims_by_priority_and_expires_leases(client: TestClient, session: Session):
+    assert client.post("/queue/claim").status_code == 403
+
+    for identifier, priority in [("CONV_LOW", 0), ("CONV_HIGH", 5)]:
+        session.add(Conversation(
+            identifier=identifier, topic=identifier, category="Testing", user="testuser",
+            challenge_id=1, priority=priority,
+        ))
+    session.commit()
+
+    app.dependency_overrides[get_user] = lambda: support_user("agent_a")
+    claims = [client.post("/queue/claim").json()["identifier"] for _ in range(3)]
+    assert claims == ["CONV_HIGH", "CONV_001", "CONV_LOW"]
+    assert client.post("/queue/claim").status_code == 204
+
+    app.dependency_overrides[get_user] = lambda: support_user("agent_b")
+    assert client.post("/queue/1/renew").status_code == 409
+    assert client.post("/queue/claim?lease=1").status_code == 204
+
+    conversation = session.get(Conversation, 1)
+    conversation.claim_expires_at = datetime(2000, 1, 1, tzinfo=timezone.utc)
+    session.commit()
+    seen = max(event.id for event in asyncio.run(hub.backend.replay(inbox_channel("agent_a"), 0)))
+    response = client.post("/queue/claim")
+    assert response.json()["identifier"] == "CONV_001"
+    assert response.json()["assignee"] == "agent_b"
+    # The agent whose claim lapsed sees the conversation leave their inbox
+    for assignee in ["agent_a", "agent_b"]:
+        events = asyncio.run(hub.backend.replay(inbox_channel(assignee), seen))
+        assert [(event.data["id"], event.data["assignee"]) for event in events] == [(1, "agent_b")]
+    assert client.post("/queue/1/release").status_code == 204
+    assert client.get("/conversations/1").json()["assignee"] is None
+
+def test_queue_concurrent_claims_are_exclusive(client: TestClient, session: Session, async_engine, monkeypatch):
+    for i in range(10):
+        session.add(Conversation(
+            identifier=f"CONV_Q{i}", topic="Queued", category="Testing", user="testuser", challenge_id=1,
+        ))
+    session.commit()
+    # A claim reads its candidate before updating it, under the write lock of production sessions
+    monkeypatch.setattr(dependencies, "sessions", SessionRouter(*create_session_makers(async_engine), lock=asyncio.Lock()))
+    del app.dependency_overrides[get_session]
+    app.dependency_overrides[get_user] = lambda: support_user("agent")
+
+    async def claim_all():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+            return await asyncio.gather(*(http.post("/queue/claim") for _ in range(20)))
+
+    responses = asyncio.run(claim_all())
+    claimed = [response.json()["id"] for response in responses if response.status_code == 200]
+    assert len(claimed) == len(set(claimed)) == 11
+    assert sum(response.status_code == 204 for response in responses) == 9
+
+def test_concurrent_writes_commit_together(client: TestClient, session: Session):
+    coalescer = app.dependency_overrides[get_coalescer]()
+    coalescer.max_delay_ms = 50
+    metrics.reset()
+
+    async def write_all():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+            return await asyncio.gather(
+                *(http.post("/conversations/1/posts", json={"content": f"Reply {i}"}) for i in range(10)),
+                http.post("/conversations/999/posts", json={"content": "Lost"}),
+                http.post("/conversations/", json={"challenge_id": 999, "topic": "Lost", "category": "Other"}),
+                http.post("/conversations/", json={"challenge_id": 1, "topic": "Batched", "category": "Other"}),
+            )
+
+    *posts, missing_conversation, missing_challenge, created = asyncio.run(write_all())
+    assert [response.status_code for response in posts] == [201] * 10
+    assert len({response.json()["id"] for response in posts}) == 10
+    assert missing_conversation.status_code == 404
+    assert missing_challenge.status_code == 404
+    assert created.status_code == 201
+    assert coalescer.writes == 11
+    assert coalescer.batches < coalescer.writes
+
+    # Batches are measured on their own, not charged to the request that started the flusher
+    text = metrics.render()
+    assert f"db_write_batch_size_count {coalescer.batches}" in text
+    assert f"db_write_batch_size_sum {coalescer.writes}" in text
+    labels = 'method="POST",route="/conversations/{conversation_id}/posts"'
+    assert f"db_statements_total{{{labels}}} 0" in text
+
+    session.expire_all()
+    assert session.get(Conversation, 1).post_count == 11
+    assert session.get(Conversation, created.json()["id"]).topic == "Batched"
+
+    # Without coalescing every write is its own transaction
+    coalescer.enabled = False
+    batches = coalescer.batches
+    assert client.post("/conversations/1/posts", json={"content": "Alone"}).status_code == 201
+    assert client.post("/conversations/999/posts", json={"content": "Lost"}).status_code == 404
+    assert (coalescer.batches, coalescer.writes) == (batches + 1, 12)
+
+    # Writes run in the flusher's own context, not in that of the request that started it
+    submitter = contextvars.ContextVar("submitter", default=None)
+
+    async def submit_as(name):
+        submitter.set(name)
+        return await coalescer.submit(lambda session: asyncio.sleep(0, submitter.get()))
+
+    coalescer.enabled = True
+    assert asyncio.run(submit_as("first request")) is None
+
+    # A caller that goes away while its write fails does not take the batch down with it
+    async def abandon_failing_write():
+        started, abandon = asyncio.Event(), asyncio.Event()
+
+        async def fail(session):
+            started.set()
+            await abandon.wait()
+            raise ValueError("failed write")
+
+        abandoned = asyncio.create_task(coalescer.submit(fail))
+        kept = asyncio.create_task(coalescer.submit(lambda session: asyncio.sleep(0, "kept")))
+        await started.wait()
+        abandoned.cancel()
+        await asyncio.sleep(0)
+        abandon.set()
+        return await kept
+
+    assert asyncio.run(abandon_failing_write()) == "kept"
+
+def test_inbox_filters_and_facets(client: TestClient, session: Session):
+    assert client.get("/inbox").status_code == 403
+
+    for identifier, status, category, assignee in [
+        ("CONV_A", ConversationStatus.IN_PROGRESS, "Testing", "alice"),
+        ("CONV_B", ConversationStatus.OPEN, "Other", "alice"),
+        ("CONV_C", ConversationStatus.CLOSED, "Other", None),
+    ]:
+        session.add(Conversation(
+            identifier=identifier, topic=identifier, category=category, user="testuser",
+            challenge_id=1, status=status, assignee=assignee,
+        ))
+    session.commit()
+    app.dependency_overrides[get_user] = lambda: support_user("agent")
+
+    def inbox(**params):
+        data = client.get("/inbox", params=params).json()
+        return {item["identifier"] for item in data["items"]}, data
+
+    identifiers, data = inbox(status=["OPEN", "IN_PROGRESS"])
+    assert identifiers == {"CONV_001", "CONV_A", "CONV_B"}
+    assert data["total"] == 3
+    facets = {facet: {c["value"]: c["count"] for c in counts} for facet, counts in data["facets"].items()}
+    # A facet ignores its own filter, so the other statuses still show their counts
+    assert facets["status"] == {"OPEN": 2, "IN_PROGRESS": 1, "WAITING_FOR_USER": 0, "RESOLVED": 0, "CLOSED": 1}
+    assert facets["category"] == {"Testing": 2, "Other": 1}
+    assert facets["assignee"] == {"alice": 2, "unassigned": 1}
+
+    assert inbox(assignee=["unassigned"])[0] == {"CONV_001", "CONV_C"}
+    assert inbox(assignee=["unassigned", "alice"], category=["Other"])[0] == {"CONV_B", "CONV_C"}
+    assert inbox(challenge_id=["CHAL_001", "CHAL_404"])[1]["total"] == 4
+    assert inbox(challenge_id=["CHAL_404"])[1]["total"] == 0
+
+    serialization.FAST = False
+    try:
+        assert inbox(status=["OPEN", "IN_PROGRESS"])[1] == data
+    finally:
+        serialization.FAST = True
+
+    # Closing a conversation off the page changes the facets, but not the page or its total
+    response = client.get("/inbox", params={"status": "OPEN"})
+    assert "Last-Modified" not in response.headers
+    etag = response.headers["ETag"]
+    assert client.get("/inbox", params={"status": "OPEN"}, headers={"If-None-Match": etag}).status_code == 304
+    assert client.patch("/conversations/4", json={"status": "RESOLVED"}).status_code == 200
+    response = client.get("/inbox", params={"status": "OPEN"}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["total"] == 2
+    assert {c["value"]: c["count"] for c in response.json()["facets"]["status"]}["RESOLVED"] == 1
+
+def test_batch_update_conversations(client: TestClient, session: Session):
+    session.add(Conversation(identifier="CONV_002", topic="Other", category="Testing", user="testuser", challenge_id=1))
+    session.commit()
+    batch = {"ids": [1, 2, 999], "changes": {"status": "CLOSED"}}
+    assert client.patch("/conversations/batch", json=batch).status_code == 403
+
+    app.dependency_overrides[get_user] = lambda: support_user("agent")
+    data = client.patch("/conversations/batch", json=batch).json()
+    assert [(item["id"], item["status"]) for item in data["items"]] == [(1, "updated"), (2, "updated"), (999, "not_found")]
+    assert (data["succeeded"], data["failed"]) == (2, 1)
+    assert client.get("/conversations/?status=CLOSED").json()["total"] == 2
+
+    batch = {"filter": {"status": "CLOSED"}, "changes": {"assignee": "agent", "category": "Triaged"}}
+    data = client.patch("/conversations/batch", json=batch).json()
+    assert data["succeeded"] == 2
+    assert client.get("/conversations/2").json()["category"] == "Triaged"
+
+    # Reassigning tells the previous assignee's inbox too
+    seen = max((event.id for event in asyncio.run(hub.backend.replay(inbox_channel("agent"), 0))), default=0)
+    assert client.patch("/conversations/batch", json={"ids": [1], "changes": {"assignee": "other"}}).status_code == 200
+    for assignee in ["agent", "other"]:
+        events = asyncio.run(hub.backend.replay(inbox_channel(assignee), seen))
+        assert [(event.type, event.data["id"], event.data["assignee"]) for event in events] == [
+            ("conversation.updated", 1, "other")
+        ]
+
+    assert client.patch("/conversations/batch", json={"filter": {}, "changes": {"status": "OPEN"}}).status_code == 400
+    assert client.patch("/conversations/batch", json={"ids": [1], "changes": {}}).status_code == 400
+
+def test_batch_create_posts(client: TestClient):
+    posts = [
+        {"conversation_id": 1, "content": "First"},
+        {"conversation_id": 999, "content": "Lost"},
+        {"conversation_id": 1, "content": "Second"},
+    ]
+    data = client.post("/conversations/batch/posts", json={"posts": posts}).json()
+    assert [item["status"] for item in data["items"]] == ["created", "not_found", "created"]
+    assert [item["post"]["content"] for item in data["items"] if item["post"]] == ["First", "Second"]
+    assert (data["succeeded"], data["failed"]) == (2, 1)
+    assert client.get("/conversations/1/posts").json()["total"] == 3
+
+def test_export_conversations(client: TestClient):
+    client.post("/conversations/1/posts", json={"content": "Second post"})
+
+    response = client.get("/export/conversations")
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 1
+    assert lines[0]["challenge_id"] == "CHAL_001"
+    assert [post["content"] for post in lines[0]["posts"]] == ["Test post content", "Second post"]
+
+    rows = list(csv.DictReader(io.StringIO(client.get("/export/conversations?format=csv").text)))
+    assert [row["post_content"] for row in rows] == ["Test post content", "Second post"]
+    assert rows[0]["identifier"] == "CONV_001"
+
+    assert client.get("/export/conversations?status=CLOSED").text == ""
+    assert client.get("/export/conversations?created_after=2100-01-01T00:00:00Z").text == ""
+    assert client.get("/export/conversations?challenge_id=CHAL_001").text.count("\n") == 1
+
+def test_metrics_per_route(client: TestClient, db_path, caplog):
+    metrics.reset()
+    client.get("/conversations/1")
+    client.get("/conversations/1")
+    client.get("/conversations/not-a-number/posts/x/y")
+
+    text = client.get("/metrics").text
+    labels = 'method="GET",route="/conversations/{conversation_id}"'
+    assert f"http_request_duration_seconds_count{{{labels}}} 2" in text
+    assert f'http_requests_total{{{labels},status="200"}} 2' in text
+    statements = next(line for line in text.splitlines() if line.startswith(f"db_statements_total{{{labels}}}"))
+    assert float(statements.split()[-1]) >= 2
+    assert 'route="<unmatched>"' in text
+
+    # Failed statements are charged too, and leave nothing on the connection
+    stats = metrics.RequestStats(log=[])
+    token = metrics.current_request.set(stats)
+    engine = create_database_engine(settings_for(f"sqlite:///{db_path}"))
+    try:
+        with engine.connect() as connection:
+            for _ in range(2):
+                with pytest.raises(OperationalError):
+                    connection.exec_driver_sql("SELECT * FROM missing")
+            assert "query_started" not in connection.info
+    finally:
+        metrics.current_request.reset(token)
+        engine.dispose()
+    assert [statement for statement, _ in stats.log].count("SELECT * FROM missing") == 2
+
+    slow = metrics.MetricsMiddleware(None, slow_request_seconds=0.5)
+    slow.record("GET", "/slow", 200, 1.0, 10, metrics.RequestStats(1, 0.9, [("SELECT 1", 0.9)]))
+    assert "SELECT 1" in caplog.text
+
+CHALLENGE_BODY = {
+    "challenge_id": "CHAL_001", "title": "Test Challenge", "description": "A test challenge",
+    "category": "Testing", "difficulty": "Beginner", "points": 75,
+}
+
+# Statement budget of every route. Requests run as a support user who also owns
+# the fixture conversation, unless ``support`` is off. Budgets must not depend on
+# the number of rows; the test adds some to expose N+1 queries.
+class Budget(NamedTuple):
+    """A route's SQL statement budget, for one request and its expected status."""
+    method: str
+    route: str
+    url: str
+    body: Optional[dict]
+    budget: int
+    status: int = 200
+    # Requested as a support agent, unless the check is of a regular user
+    support: bool = True
+    # Requests made before the measured one
+    setup: tuple = ()
+
+QUERY_BUDGETS = [
+    Budget("GET", "/api/health", "/api/health", None, 1),
+    Budget("GET", "/metrics", "/metrics", None, 0),
+    Budget("GET", "/user/", "/user/", None, 0),
+    Budget("GET", "/challenges/", "/challenges/", None, 0),
+    # Challenge writes rebuild the catalog: its version, the challenges and their tags
+    Budget("POST", "/challenges/", "/challenges/", {**CHALLENGE_BODY, "challenge_id": "CHAL_002", "tags": ["a", "b"]}, 6, 201),
+    Budget("GET", "/challenges/tags", "/challenges/tags?tags=test&tags=example&match=all", None, 0),
+    Budget("GET", "/challenges/{challenge_id}", "/challenges/CHAL_001", None, 0),
+    Budget("PATCH", "/challenges/{challenge_id}", "/challenges/CHAL_001", {**CHALLENGE_BODY, "tags": ["a", "b"]}, 8),
+    Budget("DELETE", "/challenges/{challenge_id}", "/challenges/CHAL_002", None, 7, 204,
+           setup=(("POST", "/challenges/", {**CHALLENGE_BODY, "challenge_id": "CHAL_002"}),)),
+    Budget("GET", "/challenges/{challenge_id}/conversations", "/challenges/CHAL_001/conversations", None, 2),
+    Budget("GET", "/conversations/", "/conversations/", None, 2),
+    Budget("GET", "/conversations/user", "/conversations/user", None, 2),
+    Budget("POST", "/conversations/", "/conversations/", {"challenge_id": 1, "topic": "New", "category": "Testing"}, 4, 201),
+    Budget("GET", "/conversations/{conversation_id}", "/conversations/1", None, 2),
+    Budget("PATCH", "/conversations/{conversation_id}", "/conversations/1", {"status": "IN_PROGRESS"}, 5),
+    Budget("DELETE", "/conversations/{conversation_id}", "/conversations/1", None, 4, 204),
+    Budget("GET", "/conversations/{conversation_id}/posts", "/conversations/1/posts", None, 3),
+    Budget("POST", "/conversations/{conversation_id}/posts", "/conversations/1/posts", {"content": "Reply"}, 4, 201),
+    Budget("GET", "/conversations/{conversation_id}/posts/{post_id}", "/conversations/1/posts/1", None, 2),
+    Budget("DELETE", "/conversations/{conversation_id}/posts/{post_id}", "/conversations/1/posts/1", None, 4, 204),
+    # The event streams are long-lived, so only their refusals are measured:
+    # checking that the conversation exists, and the caller's role
+    Budget("GET", "/conversations/{conversation_id}/events", "/conversations/999/events", None, 1, 404),
+    Budget("GET", "/conversations/inbox/events", "/conversations/inbox/events", None, 0, 403, support=False),
+    Budget("PATCH", "/conversations/batch", "/conversations/batch", {"ids": [1, 2], "changes": {"status": "CLOSED"}}, 1),
+    Budget("POST", "/conversations/batch/posts", "/conversations/batch/posts",
+           {"posts": [{"conversation_id": 1, "content": "A"}, {"conversation_id": 1, "content": "B"}]}, 4),
+    Budget("GET", "/export/conversations", "/export/conversations", None, 1),
+    Budget("GET", "/inbox", "/inbox?status=OPEN&status=IN_PROGRESS&assignee=unassigned", None, 2),
+    Budget("POST", "/queue/claim", "/queue/claim", None, 4),
+    Budget("POST", "/queue/{conversation_id}/renew", "/queue/1/renew", None, 3, setup=(("POST", "/queue/claim"),)),
+    Budget("POST", "/queue/{conversation_id}/release", "/queue/1/release", None, 3, 204, setup=(("POST", "/queue/claim"),)),
+    Budget("GET", "/search/", "/search/?q=test", None, 2),
+]
+
+def test_every_route_has_query_budget():
+    budgeted = {(method, route) for method, route, *_ in QUERY_BUDGETS}
+    routes = {
+        (method.upper(), path)
+        for path, operations in app.openapi()["paths"].items()
+        for method in operations
+    }
+    assert routes - budgeted == set()
+
+@pytest.mark.parametrize("case", QUERY_BUDGETS, ids=[f"{case.method} {case.route}" for case in QUERY_BUDGETS])
+def test_query_budget(client: TestClient, session: Session, queries, case: Budget):
+    for i in range(3):
+        conversation = Conversation(
+            identifier=f"CONV_B{i}", topic="Budget", category="Testing", user="testuser", challenge_id=1,
+        )
+        conversation.posts = [Post(user="testuser", content=f"Post {j}") for j in range(2)]
+        session.add(conversation)
+    session.commit()
+
+    if case.support:
+        app.dependency_overrides[get_user] = lambda: support_user("testuser")
+    for setup_method, setup_url, *setup_body in case.setup:
+        client.request(setup_method, setup_url, json=setup_body[0] if setup_body else None)
+    # Warm the per-process caches, as in steady state
+    client.get("/challenges/")
+
+    with queries.budget(case.budget):
+        response = client.request(case.method, case.url, json=case.body)
+    assert response.status_code == case.status, response.text
+
+LIST_QUERIES = [
+    "/conversations/",
+    "/conversations/?status=OPEN",
+    "/conversations/?category=Testing",
+    "/conversations/?challenge_id=CHAL_001",
+    "/conversations/?sort=activity",
+    "/conversations/?sort=replies",
+    "/conversations/?status=OPEN&sort=activity",
+    "/conversations/?status=OPEN&sort=replies",
+    "/conversations/?sort=activity&active_since=2024-01-01T00:00:00&answered=false",
+    "/conversations/user",
+    "/inbox",
+    "/inbox?status=OPEN&status=IN_PROGRESS&assignee=unassigned&category=Testing",
+    "/inbox?challenge_id=CHAL_001",
+    "/challenges/CHAL_001/conversations",
+    "/conversations/1/posts",
+]
+
+@pytest.mark.parametrize("url", LIST_QUERIES)
+def test_list_queries_use_indexes(client: TestClient, session: Session, queries, url):
+    app.dependency_overrides[get_user] = lambda: support_user("testuser")
+    client.get("/challenges/")
+    with queries:
+        assert client.get(url).status_code == 200
+        cursor = client.get(url, params={"limit": 1}).json()["next_cursor"]
+        if cursor:
+            client.get(url, params={"limit": 1, "cursor": cursor})
+
+    connection = session.connection()
+    for statement, parameters in queries.statements:
+        plan = [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+        full_scans = [step for step in plan if re.fullmatch(r"SCAN \w+", step) or "TEMP B-TREE" in step]
+        assert not full_scans, f"{statement}\n" + "\n".join(plan)